@@ -0,0 +1,78 @@
+"""Move test data out of the testcases table into the test data store
+
+Revision ID: 002
+Revises: 001
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+import sqlalchemy as sa
+
+from alembic import op
+from core.testdata_store import TestDataStore
+
+# revision identifiers, used by Alembic.
+revision = '002'
+down_revision = '001'
+branch_labels = None
+depends_on = None
+
+KINDS = ('input', 'output')
+
+
+def upgrade() -> None:
+    for kind in KINDS:
+        op.add_column('testcases', sa.Column(f'{kind}_sha256', sa.String(length=64), nullable=True))
+        op.add_column('testcases', sa.Column(f'{kind}_size', sa.BigInteger(), nullable=True))
+        op.add_column('testcases', sa.Column(f'{kind}_preview', sa.String(), nullable=True))
+
+    # Copy every row's blobs into the store, one row at a time so large
+    # tests are never all in memory together
+    conn = op.get_bind()
+    store = TestDataStore.shared()
+    ids = [row.id for row in conn.execute(sa.text('SELECT id FROM testcases ORDER BY id'))]
+    for testcase_id in ids:
+        row = conn.execute(
+            sa.text('SELECT input_blob, output_blob FROM testcases WHERE id = :id'),
+            {'id': testcase_id}
+        ).one()
+        values = {'id': testcase_id}
+        for kind, data in zip(KINDS, row, strict=True):
+            blob = store.put(data)
+            values.update({f'{kind}_sha256': blob.sha256, f'{kind}_size': blob.size, f'{kind}_preview': blob.preview})
+        conn.execute(
+            sa.text(
+                'UPDATE testcases SET input_sha256 = :input_sha256, input_size = :input_size, '
+                'input_preview = :input_preview, output_sha256 = :output_sha256, '
+                'output_size = :output_size, output_preview = :output_preview WHERE id = :id'
+            ),
+            values
+        )
+
+    for kind in KINDS:
+        op.alter_column('testcases', f'{kind}_sha256', nullable=False)
+        op.alter_column('testcases', f'{kind}_size', nullable=False)
+        op.drop_column('testcases', f'{kind}_blob')
+
+
+def downgrade() -> None:
+    for kind in KINDS:
+        op.add_column('testcases', sa.Column(f'{kind}_blob', sa.Text(), nullable=True))
+
+    conn = op.get_bind()
+    store = TestDataStore.shared()
+    rows = conn.execute(sa.text('SELECT id, input_sha256, output_sha256 FROM testcases ORDER BY id')).all()
+    for testcase_id, input_sha256, output_sha256 in rows:
+        conn.execute(
+            sa.text('UPDATE testcases SET input_blob = :input_blob, output_blob = :output_blob WHERE id = :id'),
+            {
+                'id': testcase_id,
+                'input_blob': store.read_text(input_sha256),
+                'output_blob': store.read_text(output_sha256),
+            }
+        )
+
+    for kind in KINDS:
+        op.alter_column('testcases', f'{kind}_blob', nullable=False)
+        op.drop_column('testcases', f'{kind}_preview')
+        op.drop_column('testcases', f'{kind}_size')
+        op.drop_column('testcases', f'{kind}_sha256')
@@ -0,0 +1,24 @@
+"""Per-problem checker configuration
+
+Revision ID: 003
+Revises: 002
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '003'
+down_revision = '002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('problems', sa.Column('checker_config', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('problems', 'checker_config')
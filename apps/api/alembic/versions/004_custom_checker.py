@@ -0,0 +1,34 @@
+"""Custom checker source per problem
+
+Revision ID: 004
+Revises: 003
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '004'
+down_revision = '003'
+branch_labels = None
+depends_on = None
+
+# Created with the submissions table
+submission_language = postgresql.ENUM(
+    'PYTHON', 'CPP', 'JAVA', 'JAVASCRIPT', 'GO', 'RUST',
+    name='submissionlanguage',
+    create_type=False
+)
+
+
+def upgrade() -> None:
+    op.add_column('problems', sa.Column('checker_source', sa.Text(), nullable=True))
+    op.add_column('problems', sa.Column('checker_lang', submission_language, nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('problems', 'checker_lang')
+    op.drop_column('problems', 'checker_source')
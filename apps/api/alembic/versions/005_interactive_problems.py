@@ -0,0 +1,23 @@
+"""Interactive checker type
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '005'
+down_revision = '004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("ALTER TYPE checkertype ADD VALUE IF NOT EXISTS 'INTERACTIVE'")
+
+
+def downgrade() -> None:
+    # PostgreSQL cannot drop an enum value; fall back to the custom checker type
+    op.execute("UPDATE problems SET checker_type = 'CUSTOM' WHERE checker_type = 'INTERACTIVE'")
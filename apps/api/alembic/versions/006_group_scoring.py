@@ -0,0 +1,26 @@
+"""Submission score and per-group breakdown
+
+Revision ID: 006
+Revises: 005
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '006'
+down_revision = '005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('submissions', sa.Column('score', sa.Float(), nullable=True))
+    op.add_column('submissions', sa.Column('group_results', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('submissions', 'group_results')
+    op.drop_column('submissions', 'score')
@@ -0,0 +1,24 @@
+"""Flag submissions whose result was reused from an identical earlier one
+
+Revision ID: 007
+Revises: 006
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '007'
+down_revision = '006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('submissions', sa.Column('verdict_reused', sa.Integer(), server_default='0', nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('submissions', 'verdict_reused')
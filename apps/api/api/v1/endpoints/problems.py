@@ -1,10 +1,15 @@
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import Literal
+
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Query as OrmQuery
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
 from api.v1.endpoints.auth import get_current_user
 from core.database import get_db
-from models.problem import ProblemStatus, TestCase
+from models.problem import CheckerType, Problem, ProblemStatus, TestCase
 from models.user import User, UserRole
 from schemas.problem import (
     ProblemCreate,
@@ -14,10 +19,21 @@ from schemas.problem import (
     TestCaseCreate,
     TestCaseResponse,
 )
-from services.problem import create_problem, get_problem_by_slug, get_problems, update_problem
+from services.problem import (
+    create_problem,
+    create_testcase,
+    get_problem_by_slug,
+    get_problems,
+    iter_testcase_data,
+    update_problem,
+)
+from services.test_package import TestPackageError, import_test_package
 
 router = APIRouter()
 
+# Checker types judged by a program supplied with the problem
+PROGRAM_CHECKER_TYPES = (CheckerType.CUSTOM, CheckerType.INTERACTIVE)
+
 
 @router.get("", response_model=list[ProblemListResponse])
 async def list_problems(
@@ -61,6 +77,9 @@ async def create_new_problem(
     if existing:
         raise HTTPException(status_code=400, detail="Problem with this slug already exists")
 
+    if problem_data.checker_type in PROGRAM_CHECKER_TYPES and not problem_data.checker_source:
+        raise HTTPException(status_code=400, detail=f"Checker type {problem_data.checker_type.value} needs checker_source")
+
     problem = create_problem(db, problem_data, current_user.id)
     return ProblemResponse.model_validate(problem)
 
@@ -84,6 +103,10 @@ async def update_existing_problem(
     if problem.created_by != current_user.id and current_user.role != UserRole.ADMIN:
         raise HTTPException(status_code=403, detail="Can only edit own problems")
 
+    checker_type = problem_data.checker_type or problem.checker_type
+    if checker_type in PROGRAM_CHECKER_TYPES and not (problem_data.checker_source or problem.checker_source):
+        raise HTTPException(status_code=400, detail=f"Checker type {checker_type.value} needs checker_source")
+
     updated_problem = update_problem(db, problem, problem_data)
     return ProblemResponse.model_validate(updated_problem)
 
@@ -94,26 +117,39 @@ async def get_problem_testcases(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Get testcases for a problem (author/admin only, or samples for students)."""
+    """Get testcase metadata for a problem (author/admin only, or samples for students)."""
     problem = get_problem_by_slug(db, slug)
     if not problem:
         raise HTTPException(status_code=404, detail="Problem not found")
 
-    # Students can only see sample testcases
-    if current_user.role == UserRole.STUDENT:
-        testcases = db.query(TestCase).filter(
-            TestCase.problem_id == problem.id,
-            TestCase.is_sample == 1
-        ).all()
-    else:
-        # Authors/admins can see all testcases
-        if problem.created_by != current_user.id and current_user.role != UserRole.ADMIN:
-            raise HTTPException(status_code=403, detail="Cannot access testcases")
-        testcases = db.query(TestCase).filter(TestCase.problem_id == problem.id).all()
-
+    testcases = _accessible_testcases(db, problem, current_user).order_by(TestCase.group, TestCase.idx).all()
     return [TestCaseResponse.model_validate(tc) for tc in testcases]
 
 
+@router.get("/{slug}/testcases/{testcase_id}/{kind}")
+async def get_testcase_data(
+    slug: str,
+    testcase_id: int,
+    kind: Literal["input", "output"],
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Download a testcase's input or expected output from the test data store."""
+    problem = get_problem_by_slug(db, slug)
+    if not problem:
+        raise HTTPException(status_code=404, detail="Problem not found")
+
+    testcase = _accessible_testcases(db, problem, current_user).filter(TestCase.id == testcase_id).first()
+    if not testcase:
+        raise HTTPException(status_code=404, detail="Testcase not found")
+
+    return StreamingResponse(
+        iter_testcase_data(getattr(testcase, f"{kind}_sha256")),
+        media_type="text/plain; charset=utf-8",
+        headers={"Content-Length": str(getattr(testcase, f"{kind}_size"))}
+    )
+
+
 @router.post("/{slug}/testcases", response_model=TestCaseResponse)
 async def add_testcase(
     slug: str,
@@ -132,12 +168,48 @@ async def add_testcase(
     if problem.created_by != current_user.id and current_user.role != UserRole.ADMIN:
         raise HTTPException(status_code=403, detail="Can only edit own problems")
 
-    testcase = TestCase(
-        problem_id=problem.id,
-        **testcase_data.model_dump()
-    )
-    db.add(testcase)
-    db.commit()
-    db.refresh(testcase)
-
+    testcase = create_testcase(db, problem, testcase_data)
     return TestCaseResponse.model_validate(testcase)
+
+
+@router.post("/{slug}/testcases/package", response_model=list[TestCaseResponse])
+async def upload_test_package(
+    slug: str,
+    package: UploadFile = File(..., description="zip or tar(.gz) of NN.in / NN.out files, optional manifest.json"),
+    replace: bool = Query(False, description="Remove the problem's existing testcases first"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Add all tests of an archive in one transaction (author/admin only)."""
+    if current_user.role not in [UserRole.AUTHOR, UserRole.ADMIN]:
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+
+    problem = get_problem_by_slug(db, slug)
+    if not problem:
+        raise HTTPException(status_code=404, detail="Problem not found")
+
+    if problem.created_by != current_user.id and current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Can only edit own problems")
+
+    # The upload is spooled to disk; members are streamed into the store
+    try:
+        testcases = await run_in_threadpool(import_test_package, db, problem, package.file, replace)
+    except TestPackageError as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return [TestCaseResponse.model_validate(tc) for tc in testcases]
+
+
+def _accessible_testcases(db: Session, problem: Problem, current_user: User) -> OrmQuery:
+    """Testcases of a problem the user may see: samples for students, all for its author/admins."""
+    query = db.query(TestCase).filter(TestCase.problem_id == problem.id)
+
+    # Students can only see sample testcases
+    if current_user.role == UserRole.STUDENT:
+        return query.filter(TestCase.is_sample == 1)
+
+    # Authors/admins can see all testcases
+    if problem.created_by != current_user.id and current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Cannot access testcases")
+    return query
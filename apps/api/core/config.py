@@ -40,6 +40,18 @@ class Settings(BaseSettings):
     DEFAULT_MEMORY_LIMIT_MB: int = 256
     DEFAULT_OUTPUT_LIMIT_KB: int = 64
     MAX_TESTCASES: int = 100
+    MAX_TEST_PACKAGE_MB: int = 512  # Uncompressed size of an uploaded test package
+
+    # Content-addressed test data store, shared with the judge workers ("local" or "s3")
+    TESTDATA_STORE_BACKEND: str = "local"
+    TESTDATA_STORE_DIR: str = "/judge_data/testdata"
+    TESTDATA_STORE_COMPRESSION: str = ""  # "" or "zstd"
+    TESTDATA_S3_BUCKET: str = "judgelab-testdata"
+    TESTDATA_S3_PREFIX: str = ""
+    TESTDATA_S3_ENDPOINT_URL: str = ""  # e.g. http://minio:9000
+    TESTDATA_S3_ACCESS_KEY: str = ""
+    TESTDATA_S3_SECRET_KEY: str = ""
+    TESTDATA_S3_REGION: str = ""
 
     # Gamification
     BASE_XP_PER_PROBLEM: int = 100
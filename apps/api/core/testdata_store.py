@@ -0,0 +1,285 @@
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import threading
+from abc import ABC, abstractmethod
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import BinaryIO, NamedTuple
+
+from core.config import settings
+
+try:
+    import zstandard
+except ImportError:  # Only needed with TESTDATA_STORE_COMPRESSION=zstd
+    zstandard = None
+
+try:
+    import boto3
+    from botocore.exceptions import ClientError
+except ImportError:  # Only needed with TESTDATA_STORE_BACKEND=s3
+    boto3 = None
+    ClientError = Exception
+
+ZSTD_SUFFIX = ".zst"
+PREVIEW_CHARS = 100
+PREVIEW_HEAD_BYTES = 4 * PREVIEW_CHARS + 1  # UTF-8 is at most 4 bytes per character
+CHUNK_BYTES = 1024 * 1024
+
+
+class StoredBlob(NamedTuple):
+    """What the database keeps about a blob instead of its content."""
+    sha256: str
+    size: int
+    preview: str
+
+
+class StoreBackend(ABC):
+    """Flat object namespace the test data store writes blobs into."""
+
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        pass
+
+    @abstractmethod
+    def open(self, key: str) -> BinaryIO:
+        """Readable stream of an object. Raises FileNotFoundError if missing."""
+
+    @abstractmethod
+    def write(self, key: str, stream: BinaryIO) -> None:
+        """Store an object from a readable stream; readers never see it half written."""
+
+
+class LocalStoreBackend(StoreBackend):
+    """Objects as files under a directory (a volume shared by API and workers)."""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(os.path.join(self.root, key))
+
+    def open(self, key: str) -> BinaryIO:
+        return open(os.path.join(self.root, key), "rb")
+
+    def write(self, key: str, stream: BinaryIO) -> None:
+        path = os.path.join(self.root, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix=".tmp_", dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                shutil.copyfileobj(stream, f, CHUNK_BYTES)
+            os.chmod(tmp_path, 0o444)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+
+class S3StoreBackend(StoreBackend):
+    """Objects in an S3-compatible bucket (AWS S3, MinIO)."""
+
+    def __init__(
+        self,
+        bucket: str,
+        prefix: str = "",
+        endpoint_url: str | None = None,
+        access_key: str | None = None,
+        secret_key: str | None = None,
+        region: str | None = None
+    ):
+        if boto3 is None:
+            raise RuntimeError("The S3 test data store needs boto3 installed")
+        self.bucket = bucket
+        self.prefix = prefix
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url or None,
+            aws_access_key_id=access_key or None,
+            aws_secret_access_key=secret_key or None,
+            region_name=region or None
+        )
+
+    def exists(self, key: str) -> bool:
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self.prefix + key)
+            return True
+        except ClientError as e:
+            if self._missing(e):
+                return False
+            raise
+
+    def open(self, key: str) -> BinaryIO:
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=self.prefix + key)["Body"]
+        except ClientError as e:
+            if self._missing(e):
+                raise FileNotFoundError(key)
+            raise
+
+    def write(self, key: str, stream: BinaryIO) -> None:
+        # Multipart uploads only become visible once complete
+        self.client.upload_fileobj(stream, self.bucket, self.prefix + key)
+
+    @staticmethod
+    def _missing(error: Exception) -> bool:
+        code = getattr(error, "response", {}).get("Error", {}).get("Code")
+        return code in ("404", "NoSuchKey", "NotFound")
+
+
+class TestDataStore:
+    """
+    Content-addressed store for test inputs and expected outputs. Blobs are
+    named by the sha256 of their content, so identical tests are stored
+    once and a hash in the database is enough to find them. With
+    compression enabled new blobs are written zstd-compressed (".zst"
+    suffix); reads accept either form, so the setting can change at any
+    time. The API and the worker build separate images, so each ships a
+    copy of this module (apps/api/core/testdata_store.py and
+    worker/judge/testdata_store.py); a worker test fails if they differ in
+    anything but imports.
+    """
+
+    _shared: "TestDataStore | None" = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, backend: StoreBackend, compression: str = "", compression_level: int = 3):
+        if compression not in ("", "zstd"):
+            raise ValueError(f"Unsupported test data compression: {compression}")
+        if compression and zstandard is None:
+            raise RuntimeError("zstd test data compression needs zstandard installed")
+        self.backend = backend
+        self.compression = compression
+        self.compression_level = compression_level
+
+    @classmethod
+    def shared(cls) -> "TestDataStore":
+        """Store configured from settings, shared by the whole process."""
+        with cls._shared_lock:
+            if cls._shared is None:
+                if settings.TESTDATA_STORE_BACKEND == "s3":
+                    backend = S3StoreBackend(
+                        settings.TESTDATA_S3_BUCKET,
+                        prefix=settings.TESTDATA_S3_PREFIX,
+                        endpoint_url=settings.TESTDATA_S3_ENDPOINT_URL,
+                        access_key=settings.TESTDATA_S3_ACCESS_KEY,
+                        secret_key=settings.TESTDATA_S3_SECRET_KEY,
+                        region=settings.TESTDATA_S3_REGION
+                    )
+                else:
+                    backend = LocalStoreBackend(settings.TESTDATA_STORE_DIR)
+                cls._shared = cls(backend, settings.TESTDATA_STORE_COMPRESSION)
+            return cls._shared
+
+    def put(self, data: str | bytes) -> StoredBlob:
+        """Store a blob held in memory."""
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        sha256 = hashlib.sha256(data).hexdigest()
+        self._write(sha256, lambda: io.BytesIO(data))
+        return StoredBlob(sha256, len(data), make_preview(data[:PREVIEW_HEAD_BYTES]))
+
+    def put_stream(self, stream: BinaryIO) -> StoredBlob:
+        """Store a blob from a readable stream without holding it in memory."""
+        digest = hashlib.sha256()
+        size = 0
+        head = b""
+
+        # The name depends on the content, so spool it before writing
+        with tempfile.SpooledTemporaryFile(max_size=8 * CHUNK_BYTES) as spool:
+            while True:
+                chunk = stream.read(CHUNK_BYTES)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                if len(head) < PREVIEW_HEAD_BYTES:
+                    head += chunk[:PREVIEW_HEAD_BYTES - len(head)]
+                size += len(chunk)
+                spool.write(chunk)
+
+            def rewind():
+                spool.seek(0)
+                return spool
+
+            sha256 = digest.hexdigest()
+            self._write(sha256, rewind)
+
+        return StoredBlob(sha256, size, make_preview(head))
+
+    def exists(self, sha256: str) -> bool:
+        return any(self.backend.exists(key) for key in self._keys(sha256))
+
+    @contextmanager
+    def open(self, sha256: str) -> Iterator[BinaryIO]:
+        """Readable stream of a blob's original content."""
+        for key in self._keys(sha256):
+            try:
+                raw = self.backend.open(key)
+                break
+            except FileNotFoundError:
+                continue
+        else:
+            raise FileNotFoundError(f"Test data blob {sha256} not found")
+
+        try:
+            if key.endswith(ZSTD_SUFFIX):
+                if zstandard is None:
+                    raise RuntimeError(f"Test data blob {sha256} is zstd-compressed; install zstandard")
+                with zstandard.ZstdDecompressor().stream_reader(raw, closefd=False) as reader:
+                    yield reader
+            else:
+                yield raw
+        finally:
+            raw.close()
+
+    def read(self, sha256: str) -> bytes:
+        with self.open(sha256) as stream:
+            return stream.read()
+
+    def read_text(self, sha256: str) -> str:
+        return self.read(sha256).decode("utf-8")
+
+    def copy_to(self, sha256: str, path: str) -> int:
+        """Write a blob to a local file, streaming. Returns its size."""
+        size = 0
+        with self.open(sha256) as stream, open(path, "wb") as f:
+            while True:
+                chunk = stream.read(CHUNK_BYTES)
+                if not chunk:
+                    return size
+                f.write(chunk)
+                size += len(chunk)
+
+    def _write(self, sha256: str, reopen) -> None:
+        if self.exists(sha256):
+            return  # Same content, same name
+
+        stream = reopen()
+        if self.compression == "zstd":
+            compressor = zstandard.ZstdCompressor(level=self.compression_level)
+            with compressor.stream_reader(stream, closefd=False) as compressed:
+                self.backend.write(self._key(sha256, ZSTD_SUFFIX), compressed)
+        else:
+            self.backend.write(self._key(sha256), stream)
+
+    def _keys(self, sha256: str):
+        """Candidate object names, the configured format first."""
+        plain, compressed = self._key(sha256), self._key(sha256, ZSTD_SUFFIX)
+        return (compressed, plain) if self.compression else (plain, compressed)
+
+    @staticmethod
+    def _key(sha256: str, suffix: str = "") -> str:
+        if len(sha256) != 64 or any(c not in "0123456789abcdef" for c in sha256):
+            raise ValueError(f"Not a sha256 hex digest: {sha256!r}")
+        return f"{sha256[:2]}/{sha256}{suffix}"
+
+
+def make_preview(head: bytes) -> str:
+    """Short text preview kept in the database next to the hash."""
+    text = head.decode("utf-8", errors="replace")
+    return text[:PREVIEW_CHARS] + "..." if len(text) > PREVIEW_CHARS else text
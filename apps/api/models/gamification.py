@@ -24,7 +24,13 @@ class GamificationProfile(Base):
 
     # Relationships
     user = relationship("User")
-    badges = relationship("UserBadge", back_populates="profile")
+    # Both tables key on users.id rather than on each other; badges are written through UserBadge.user
+    badges = relationship(
+        "UserBadge",
+        back_populates="profile",
+        primaryjoin="GamificationProfile.user_id == foreign(UserBadge.user_id)",
+        viewonly=True
+    )
 
 
 class Badge(Base):
@@ -58,4 +64,9 @@ class UserBadge(Base):
     # Relationships
     user = relationship("User")
     badge = relationship("Badge", back_populates="user_badges")
-    profile = relationship("GamificationProfile", back_populates="badges")
+    profile = relationship(
+        "GamificationProfile",
+        back_populates="badges",
+        primaryjoin="GamificationProfile.user_id == foreign(UserBadge.user_id)",
+        viewonly=True
+    )
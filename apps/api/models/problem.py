@@ -1,10 +1,11 @@
 from enum import Enum as PyEnum
 
-from sqlalchemy import JSON, Column, DateTime, Enum, ForeignKey, Integer, String, Text
+from sqlalchemy import JSON, BigInteger, Column, DateTime, Enum, ForeignKey, Integer, String, Text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 
 from core.database import Base
+from models.submission import SubmissionLanguage
 
 
 class ProblemDifficulty(PyEnum):
@@ -26,6 +27,7 @@ class CheckerType(PyEnum):
     TOKEN = "token"
     FLOAT_EPS = "float_eps"
     CUSTOM = "custom"
+    INTERACTIVE = "interactive"  # checker_source is the interactor
 
 
 class AvailabilityPolicy(PyEnum):
@@ -43,6 +45,9 @@ class Problem(Base):
     tags = Column(JSON, default=[])
     difficulty = Column(Enum(ProblemDifficulty), default=ProblemDifficulty.EASY)
     checker_type = Column(Enum(CheckerType), default=CheckerType.DIFF)
+    checker_config = Column(JSON, nullable=True)  # See schemas.problem.CheckerConfig
+    checker_source = Column(Text, nullable=True)  # Custom checker or interactor program
+    checker_lang = Column(Enum(SubmissionLanguage), nullable=True)
 
     # Resource limits
     time_limit_ms = Column(Integer, default=2000)
@@ -80,10 +85,16 @@ class TestCase(Base):
     problem_id = Column(Integer, ForeignKey("problems.id"), nullable=False)
     group = Column(String, default="main")  # For test groups
     idx = Column(Integer, nullable=False)  # Order within group
-    input_blob = Column(Text, nullable=False)
-    output_blob = Column(Text, nullable=False)
+    # Content lives in the test data store, addressed by sha256
+    input_sha256 = Column(String(64), nullable=False)
+    input_size = Column(BigInteger, nullable=False)
+    input_preview = Column(String, nullable=True)
+    output_sha256 = Column(String(64), nullable=False)
+    output_size = Column(BigInteger, nullable=False)
+    output_preview = Column(String, nullable=True)
     points = Column(Integer, default=1)
     is_sample = Column(Integer, default=0)  # Boolean as integer
+    failures = Column(Integer, nullable=False, default=0)  # Judged submissions that failed this test
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     # Relationships
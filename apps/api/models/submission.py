@@ -1,6 +1,6 @@
 from enum import Enum as PyEnum
 
-from sqlalchemy import JSON, Column, DateTime, Enum, ForeignKey, Integer, String, Text
+from sqlalchemy import JSON, Column, DateTime, Enum, Float, ForeignKey, Integer, String, Text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 
@@ -48,6 +48,9 @@ class Submission(Base):
     compile_log = Column(Text, nullable=True)
     first_failed_test = Column(Integer, nullable=True)
     test_results = Column(JSON, nullable=True)  # Per-test results
+    score = Column(Float, nullable=True)  # Points earned over all test groups
+    group_results = Column(JSON, nullable=True)  # Per-group score breakdown
+    verdict_reused = Column(Integer, default=0)  # Result copied from an identical earlier submission
 
     # Integrity flags
     integrity_flagged = Column(Integer, default=0)  # Boolean as integer
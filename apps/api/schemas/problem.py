@@ -3,6 +3,9 @@ from datetime import datetime
 from pydantic import BaseModel, Field
 
 from models.problem import AvailabilityPolicy, CheckerType, ProblemDifficulty
+from models.submission import SubmissionLanguage
+
+MAX_CHECKER_SOURCE_CHARS = 256 * 1024
 
 
 class TestCaseCreate(BaseModel):
@@ -14,24 +17,45 @@ class TestCaseCreate(BaseModel):
     is_sample: bool = False
 
 
-class TestCaseResponse(TestCaseCreate):
+class TestCaseResponse(BaseModel):
+    """Test case metadata; the data itself is served from the test data store."""
     id: int
+    group: str = "main"
+    idx: int
+    points: int = 1
+    is_sample: bool = False
+    input_sha256: str
+    input_size: int
+    input_preview: str | None
+    output_sha256: str
+    output_size: int
+    output_preview: str | None
     created_at: datetime
 
     class Config:
         from_attributes = True
 
 
+class CheckerConfig(BaseModel):
+    """Per-problem checker options; unset values use the judge defaults."""
+    epsilon: float | None = Field(None, ge=0)  # float_eps: absolute tolerance
+    relative_epsilon: float | None = Field(None, ge=0)  # float_eps: tolerance relative to |expected|
+
+
 class ProblemBase(BaseModel):
     title: str = Field(..., min_length=1, max_length=200)
     statement_md: str = Field(..., min_length=1)
     tags: list[str] = []
     difficulty: ProblemDifficulty = ProblemDifficulty.EASY
     checker_type: CheckerType = CheckerType.DIFF
+    checker_config: CheckerConfig | None = None
 
 
 class ProblemCreate(ProblemBase):
     slug: str = Field(..., pattern=r"^[a-z0-9-]+$", max_length=100)
+    # Custom checker or interactor, never returned by the API (see worker/judge/custom_checker.py)
+    checker_source: str | None = Field(None, min_length=1, max_length=MAX_CHECKER_SOURCE_CHARS)
+    checker_lang: SubmissionLanguage = SubmissionLanguage.CPP
     time_limit_ms: int = Field(2000, gt=0, le=30000)
     memory_limit_mb: int = Field(256, gt=0, le=2048)
     output_limit_kb: int = Field(64, gt=0, le=1024)
@@ -50,6 +74,9 @@ class ProblemUpdate(BaseModel):
     tags: list[str] | None = None
     difficulty: ProblemDifficulty | None = None
     checker_type: CheckerType | None = None
+    checker_config: CheckerConfig | None = None
+    checker_source: str | None = Field(None, min_length=1, max_length=MAX_CHECKER_SOURCE_CHARS)
+    checker_lang: SubmissionLanguage | None = None
     time_limit_ms: int | None = Field(None, gt=0, le=30000)
     memory_limit_mb: int | None = Field(None, gt=0, le=2048)
     output_limit_kb: int | None = Field(None, gt=0, le=1024)
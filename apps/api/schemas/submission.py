@@ -14,6 +14,8 @@ class SubmissionCreate(BaseModel):
 class TestResult(BaseModel):
     test_id: int
     verdict: str
+    group: str | None = None
+    score: float | None = None
     time_ms: int | None = None
     memory_kb: int | None = None
     input_preview: str | None = None
@@ -21,6 +23,15 @@ class TestResult(BaseModel):
     expected_preview: str | None = None
 
 
+class GroupResult(BaseModel):
+    group: str
+    verdict: str
+    score: float
+    max_score: int
+    tests_run: int
+    tests_skipped: int
+
+
 class SubmissionResponse(BaseModel):
     id: int
     attempt_id: int
@@ -33,6 +44,9 @@ class SubmissionResponse(BaseModel):
     compile_log: str | None
     first_failed_test: int | None
     test_results: list[TestResult] | None
+    score: float | None = None
+    group_results: list[GroupResult] | None = None
+    verdict_reused: bool = False
     integrity_flagged: bool
     created_at: datetime
     judged_at: datetime | None
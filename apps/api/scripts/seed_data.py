@@ -16,6 +16,7 @@ from models.gamification import Badge, GamificationProfile
 from models.problem import Problem, ProblemDifficulty, ProblemStatus, TestCase
 from models.settings import PlatformSettings
 from models.user import User, UserRole
+from services.problem import store_testcase_data
 
 
 def create_users(db: Session):
@@ -208,8 +209,7 @@ Output:
                 testcase = TestCase(
                     problem_id=problem.id,
                     idx=i,
-                    input_blob=tc_data["input"],
-                    output_blob=tc_data["output"],
+                    **store_testcase_data(tc_data["input"], tc_data["output"]),
                     is_sample=1 if tc_data["is_sample"] else 0
                 )
                 db.add(testcase)
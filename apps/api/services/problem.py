@@ -1,8 +1,9 @@
 
 from sqlalchemy.orm import Session
 
-from models.problem import Problem, ProblemDifficulty, ProblemStatus
-from schemas.problem import ProblemCreate, ProblemUpdate
+from core.testdata_store import CHUNK_BYTES, StoredBlob, TestDataStore
+from models.problem import Problem, ProblemDifficulty, ProblemStatus, TestCase
+from schemas.problem import ProblemCreate, ProblemUpdate, TestCaseCreate
 
 
 def get_problems(
@@ -49,3 +50,39 @@ def update_problem(db: Session, problem: Problem, problem_data: ProblemUpdate) -
     db.commit()
     db.refresh(problem)
     return problem
+
+
+def store_testcase_data(input_data: str | bytes, output_data: str | bytes) -> dict:
+    """Write a test's input and expected output to the test data store; returns the TestCase columns."""
+    store = TestDataStore.shared()
+    return testcase_blob_columns(store.put(input_data), store.put(output_data))
+
+
+def testcase_blob_columns(input_blob: StoredBlob, output_blob: StoredBlob) -> dict:
+    columns = {}
+    for prefix, blob in (("input", input_blob), ("output", output_blob)):
+        columns[f"{prefix}_sha256"] = blob.sha256
+        columns[f"{prefix}_size"] = blob.size
+        columns[f"{prefix}_preview"] = blob.preview
+    return columns
+
+
+def create_testcase(db: Session, problem: Problem, testcase_data: TestCaseCreate) -> TestCase:
+    data = testcase_data.model_dump()
+    testcase = TestCase(
+        problem_id=problem.id,
+        **store_testcase_data(data.pop("input_blob"), data.pop("output_blob")),
+        **data
+    )
+    db.add(testcase)
+    problem.version += 1  # Judge workers cache test data per problem version
+    db.commit()
+    db.refresh(testcase)
+    return testcase
+
+
+def iter_testcase_data(sha256: str):
+    """Stream a blob from the test data store in chunks."""
+    with TestDataStore.shared().open(sha256) as stream:
+        while chunk := stream.read(CHUNK_BYTES):
+            yield chunk
@@ -0,0 +1,176 @@
+"""Import test packages: zip or tar archives of NN.in / NN.out files."""
+
+import json
+import lzma
+import posixpath
+import re
+import tarfile
+import zipfile
+import zlib
+from collections.abc import Iterator
+from typing import BinaryIO
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from core.testdata_store import StoredBlob, TestDataStore
+from models.problem import Problem, TestCase
+from services.problem import testcase_blob_columns
+
+MANIFEST_NAME = "manifest.json"
+TEST_FILE_PATTERN = re.compile(r"^(\d+)\.(in|out)$")
+MANIFEST_FIELDS = {"group", "points", "is_sample"}
+MAX_MANIFEST_BYTES = 1024 * 1024
+
+# Raised by zipfile/tarfile and their decompressors on corrupt, truncated or
+# unsupported (e.g. encrypted) input; OSError covers gzip and bz2
+ARCHIVE_ERRORS = (
+    zipfile.BadZipFile, tarfile.TarError, zlib.error, lzma.LZMAError, EOFError, OSError, NotImplementedError, RuntimeError
+)
+
+
+class TestPackageError(ValueError):
+    """The uploaded archive is not a valid test package."""
+
+
+class _LimitedReader:
+    """Counts bytes read from archive members against the package's size budget."""
+
+    def __init__(self, stream: BinaryIO, budget: list[int]):
+        self._stream = stream
+        self._budget = budget
+
+    def read(self, size: int = -1) -> bytes:
+        try:
+            chunk = self._stream.read(size)
+        except ARCHIVE_ERRORS as e:
+            raise TestPackageError(f"Package is corrupt: {e}")
+        self._budget[0] -= len(chunk)
+        if self._budget[0] < 0:
+            raise TestPackageError(f"Package exceeds {settings.MAX_TEST_PACKAGE_MB} MB uncompressed")
+        return chunk
+
+
+def import_test_package(db: Session, problem: Problem, archive: BinaryIO, replace: bool = False) -> list[TestCase]:
+    """
+    Stream every test of an archive into the test data store, then insert
+    their rows in a single transaction and bump the problem version once.
+
+    Tests are NN.in / NN.out pairs anywhere in the archive, ordered by NN.
+    An optional manifest.json maps NN to {"group", "points", "is_sample"}.
+    With replace=True the problem's existing tests are removed first.
+    """
+    store = TestDataStore.shared()
+    blobs: dict[int, dict[str, StoredBlob]] = {}
+    manifest: dict = {}
+    budget = [settings.MAX_TEST_PACKAGE_MB * 1024 * 1024]
+
+    for name, stream in _iter_members(archive):
+        if name == MANIFEST_NAME:
+            data = _LimitedReader(stream, budget).read(MAX_MANIFEST_BYTES + 1)
+            if len(data) > MAX_MANIFEST_BYTES:
+                raise TestPackageError(f"{MANIFEST_NAME} exceeds {MAX_MANIFEST_BYTES // 1024} KB")
+            manifest = _parse_manifest(data)
+            continue
+
+        match = TEST_FILE_PATTERN.match(name)
+        if not match:
+            continue
+        number, kind = int(match.group(1)), match.group(2)
+        if kind in blobs.get(number, {}):
+            raise TestPackageError(f"Duplicate test file {name}")
+        blobs.setdefault(number, {})[kind] = store.put_stream(_LimitedReader(stream, budget))
+
+    if not blobs:
+        raise TestPackageError("Package contains no NN.in / NN.out files")
+    incomplete = sorted(number for number, files in blobs.items() if len(files) != 2)
+    if incomplete:
+        raise TestPackageError(f"Tests without both .in and .out files: {incomplete}")
+    unknown = sorted(set(manifest) - set(blobs))
+    if unknown:
+        raise TestPackageError(f"Manifest describes missing tests: {unknown}")
+
+    query = db.query(TestCase).filter(TestCase.problem_id == problem.id)
+    if replace:
+        query.delete(synchronize_session=False)
+        next_idx: dict[str, int] = {}
+        existing = 0
+    else:
+        next_idx = dict(query.with_entities(TestCase.group, func.max(TestCase.idx) + 1).group_by(TestCase.group).all())
+        existing = query.count()
+
+    if existing + len(blobs) > settings.MAX_TESTCASES:
+        raise TestPackageError(f"A problem can have at most {settings.MAX_TESTCASES} tests")
+
+    testcases = []
+    for number in sorted(blobs):
+        meta = manifest.get(number, {})
+        group = meta.get("group", "main")
+        idx = next_idx.get(group, 0)
+        next_idx[group] = idx + 1
+
+        testcases.append(TestCase(
+            problem_id=problem.id,
+            group=group,
+            idx=idx,
+            points=meta.get("points", 1),
+            is_sample=1 if meta.get("is_sample") else 0,
+            **testcase_blob_columns(blobs[number]["in"], blobs[number]["out"])
+        ))
+
+    # Rows are batched into multi-row INSERTs on flush
+    db.add_all(testcases)
+    problem.version += 1  # Judge workers cache test data per problem version
+    db.commit()
+    for testcase in testcases:
+        db.refresh(testcase)
+    return testcases
+
+
+def _iter_members(archive: BinaryIO) -> Iterator[tuple[str, BinaryIO]]:
+    """Yield (base name, stream) for each regular file, without extracting the archive."""
+    if zipfile.is_zipfile(archive):
+        archive.seek(0)
+        try:
+            with zipfile.ZipFile(archive) as zf:
+                for info in zf.infolist():
+                    if not info.is_dir():
+                        with zf.open(info) as stream:
+                            yield posixpath.basename(info.filename), stream
+        except ARCHIVE_ERRORS as e:
+            raise TestPackageError(f"Package is corrupt: {e}")
+        return
+
+    archive.seek(0)
+    try:
+        # Stream mode reads members in order and never seeks back
+        with tarfile.open(fileobj=archive, mode="r|*") as tf:
+            for member in tf:
+                if member.isfile():
+                    yield posixpath.basename(member.name), tf.extractfile(member)
+    except tarfile.ReadError:
+        raise TestPackageError("Package must be a zip or tar archive")
+    except ARCHIVE_ERRORS as e:
+        raise TestPackageError(f"Package is corrupt: {e}")
+
+
+def _parse_manifest(data: bytes) -> dict[int, dict]:
+    try:
+        raw = json.loads(data)
+        manifest = {int(number): meta for number, meta in raw.items()}
+    except (ValueError, AttributeError):
+        raise TestPackageError(f"{MANIFEST_NAME} must be an object keyed by test number")
+
+    for number, meta in manifest.items():
+        if not isinstance(meta, dict) or set(meta) - MANIFEST_FIELDS:
+            raise TestPackageError(f"{MANIFEST_NAME}: test {number} may only set {sorted(MANIFEST_FIELDS)}")
+        points = meta.get("points", 0)
+        # bool is an int subclass; "points": true is a mistake, not 1 point
+        if isinstance(points, bool) or not isinstance(points, int) or points < 0:
+            raise TestPackageError(f"{MANIFEST_NAME}: test {number} points must be a non-negative integer")
+        if "group" in meta and not isinstance(meta["group"], str):
+            raise TestPackageError(f"{MANIFEST_NAME}: test {number} group must be a string")
+        if "is_sample" in meta and not isinstance(meta["is_sample"], bool):
+            raise TestPackageError(f"{MANIFEST_NAME}: test {number} is_sample must be true or false")
+    return manifest
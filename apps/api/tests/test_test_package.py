@@ -0,0 +1,256 @@
+import io
+import json
+import tarfile
+import zipfile
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import models  # noqa: F401 (registers every table)
+from core import testdata_store
+from core.config import settings
+from core.database import Base, get_db
+from models import problem as problem_models
+from models.user import User, UserRole
+from services import test_package
+from services.test_package import MAX_MANIFEST_BYTES, import_test_package
+
+
+def zip_package(files: dict[str, str | bytes], compression: int = zipfile.ZIP_DEFLATED) -> io.BytesIO:
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w", compression) as zf:
+        for name, data in files.items():
+            zf.writestr(name, data)
+    archive.seek(0)
+    return archive
+
+
+def tar_package(files: dict[str, str | bytes], mode: str = "w:gz") -> io.BytesIO:
+    archive = io.BytesIO()
+    with tarfile.open(fileobj=archive, mode=mode) as tf:
+        for name, data in files.items():
+            data = data.encode() if isinstance(data, str) else data
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tf.addfile(info, io.BytesIO(data))
+    archive.seek(0)
+    return archive
+
+
+def corrupt_zip() -> io.BytesIO:
+    """A zip whose first member no longer matches its CRC."""
+    data = zip_package(tests_of(1), zipfile.ZIP_STORED).getvalue()
+    return io.BytesIO(data.replace(b"1 1\n", b"9 9\n"))
+
+
+def tests_of(count: int, prefix: str = "") -> dict[str, str]:
+    files = {}
+    for number in range(1, count + 1):
+        files[f"{prefix}{number:02d}.in"] = f"{number} {number}\n"
+        files[f"{prefix}{number:02d}.out"] = f"{2 * number}\n"
+    return files
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = testdata_store.TestDataStore(testdata_store.LocalStoreBackend(str(tmp_path / "testdata")))
+    with patch.object(testdata_store.TestDataStore, "shared", return_value=store):
+        yield store
+
+
+@pytest.fixture
+def author(db):
+    user = User(email="author@example.com", display_name="Author", hashed_password="x", role=UserRole.AUTHOR)
+    db.add(user)
+    db.commit()
+    return user
+
+
+@pytest.fixture
+def problem(db, author):
+    problem = problem_models.Problem(slug="a-plus-b", title="A + B", statement_md="Add.", created_by=author.id, version=1)
+    db.add(problem)
+    db.commit()
+    return problem
+
+
+def stored_tests(db, problem) -> list[tuple[str, int, int, int]]:
+    testcase = problem_models.TestCase
+    testcases = db.query(testcase).filter(testcase.problem_id == problem.id).order_by(testcase.id)
+    return [(tc.group, tc.idx, tc.points, tc.is_sample) for tc in testcases]
+
+
+class TestImportTestPackage:
+
+    def test_zip_with_nested_dirs(self, db, store, problem):
+        """Test NN.in / NN.out pairs are found anywhere in a zip and ordered by NN."""
+        files = {**tests_of(1, "tests/deep/"), "02.in": "7 8\n", "02.out": "15\n", "tests/README.md": "ignored"}
+
+        testcases = import_test_package(db, problem, zip_package(files))
+
+        assert [(tc.group, tc.idx) for tc in testcases] == [("main", 0), ("main", 1)]
+        assert store.read_text(testcases[0].input_sha256) == "1 1\n"
+        assert store.read_text(testcases[1].output_sha256) == "15\n"
+
+    @pytest.mark.parametrize("mode", ["w", "w:gz"])
+    def test_tar_archives(self, db, store, problem, mode):
+        """Test plain and gzipped tar archives, including nested directories."""
+        testcases = import_test_package(db, problem, tar_package(tests_of(3, "pkg/tests/"), mode))
+
+        assert [store.read_text(tc.output_sha256) for tc in testcases] == ["2\n", "4\n", "6\n"]
+
+    def test_manifest_maps_group_points_and_samples(self, db, store, problem):
+        """Test manifest.json sets each test's group, points and sample flag."""
+        manifest = {"1": {"group": "samples", "is_sample": True, "points": 0}, "3": {"points": 5}}
+        files = {**tests_of(3), "manifest.json": json.dumps(manifest)}
+
+        import_test_package(db, problem, zip_package(files))
+
+        assert stored_tests(db, problem) == [("samples", 0, 0, 1), ("main", 0, 1, 0), ("main", 1, 5, 0)]
+
+    def test_idx_continues_per_existing_group(self, db, store, problem):
+        """Test appended tests are numbered after the existing tests of their group."""
+        manifest = {"1": {"group": "samples"}}
+        import_test_package(db, problem, zip_package({**tests_of(2), "manifest.json": json.dumps(manifest)}))
+
+        manifest = {"1": {"group": "samples"}, "2": {"group": "large"}}
+        import_test_package(db, problem, zip_package({**tests_of(3), "manifest.json": json.dumps(manifest)}))
+
+        assert stored_tests(db, problem)[2:] == [("samples", 1, 1, 0), ("large", 0, 1, 0), ("main", 1, 1, 0)]
+
+    def test_replace_removes_existing_tests(self, db, store, problem):
+        """Test replace=True drops the problem's tests and numbers the new ones from 0."""
+        import_test_package(db, problem, zip_package(tests_of(3)))
+
+        testcases = import_test_package(db, problem, zip_package(tests_of(1)), replace=True)
+
+        assert stored_tests(db, problem) == [("main", 0, 1, 0)]
+        assert testcases[0].idx == 0
+
+    def test_version_bumped_once(self, db, store, problem):
+        """Test a package bumps the problem version once, however many tests it has."""
+        import_test_package(db, problem, zip_package(tests_of(5)))
+
+        db.refresh(problem)
+        assert problem.version == 2
+
+    def test_rejected_package_changes_nothing(self, db, store, problem):
+        """Test a rejected package neither adds tests nor bumps the version."""
+        with pytest.raises(test_package.TestPackageError):
+            import_test_package(db, problem, zip_package({**tests_of(2), "03.in": "x"}))
+        db.rollback()
+
+        assert stored_tests(db, problem) == []
+        assert problem.version == 1
+
+    def test_duplicate_basenames(self, db, store, problem):
+        """Test the same NN.in in two directories is rejected, not silently overwritten."""
+        files = {**tests_of(1, "a/"), "b/01.in": "other\n"}
+
+        with pytest.raises(test_package.TestPackageError, match="Duplicate test file 01.in"):
+            import_test_package(db, problem, zip_package(files))
+
+    @pytest.mark.parametrize("missing", ["02.in", "02.out"])
+    def test_test_without_input_or_output(self, db, store, problem, missing):
+        """Test every test needs both its .in and .out file."""
+        files = tests_of(2)
+        del files[missing]
+
+        with pytest.raises(test_package.TestPackageError, match=r"without both .in and .out files: \[2\]"):
+            import_test_package(db, problem, zip_package(files))
+
+    def test_manifest_entry_without_test(self, db, store, problem):
+        """Test the manifest may only describe tests that are in the package."""
+        files = {**tests_of(1), "manifest.json": json.dumps({"2": {"points": 3}})}
+
+        with pytest.raises(test_package.TestPackageError, match=r"missing tests: \[2\]"):
+            import_test_package(db, problem, zip_package(files))
+
+    @pytest.mark.parametrize("meta", [
+        {"points": True},
+        {"points": -1},
+        {"points": "3"},
+        {"is_sample": "yes"},
+        {"is_sample": 1},
+        {"group": 3},
+        {"weight": 2},
+    ])
+    def test_invalid_manifest_entries(self, db, store, problem, meta):
+        """Test manifest fields are type-checked; booleans are not points."""
+        files = {**tests_of(1), "manifest.json": json.dumps({"1": meta})}
+
+        with pytest.raises(test_package.TestPackageError, match="manifest.json: test 1"):
+            import_test_package(db, problem, zip_package(files))
+
+    def test_package_size_budget(self, db, store, problem):
+        """Test the uncompressed size of all tests is capped by MAX_TEST_PACKAGE_MB."""
+        files = {"01.in": b"0" * (1024 * 1024), "01.out": b"1" * 16}
+
+        with patch.object(settings, "MAX_TEST_PACKAGE_MB", 1), pytest.raises(test_package.TestPackageError, match="exceeds 1 MB"):
+            import_test_package(db, problem, zip_package(files))
+
+    def test_manifest_size_cap(self, db, store, problem):
+        """Test manifest.json is read up to MAX_MANIFEST_BYTES, not whole."""
+        manifest = " " * MAX_MANIFEST_BYTES + "{}"
+
+        with pytest.raises(test_package.TestPackageError, match="manifest.json exceeds"):
+            import_test_package(db, problem, zip_package({**tests_of(1), "manifest.json": manifest}))
+
+    @pytest.mark.parametrize("archive", [
+        lambda: io.BytesIO(b"not an archive"),
+        lambda: io.BytesIO(tar_package(tests_of(50)).getvalue()[:200]),
+        corrupt_zip,
+    ], ids=["garbage", "truncated-tar-gz", "bad-zip-crc"])
+    def test_corrupt_archives(self, db, store, problem, archive):
+        """Test unreadable or corrupt archives are a TestPackageError, not an internal error."""
+        with pytest.raises(test_package.TestPackageError):
+            import_test_package(db, problem, archive())
+
+
+class TestUploadTestPackage:
+
+    @pytest.fixture
+    def client(self, db, author):
+        testclient = pytest.importorskip("fastapi.testclient")
+        from api.v1.endpoints.auth import get_current_user
+        from main import app
+
+        overrides = {get_db: lambda: db, get_current_user: lambda: author}
+        app.dependency_overrides.update(overrides)
+        with testclient.TestClient(app) as client:
+            yield client
+        for dependency in overrides:
+            app.dependency_overrides.pop(dependency, None)
+
+    def upload(self, client, problem, archive: io.BytesIO, **params):
+        return client.post(
+            f"/api/v1/problems/{problem.slug}/testcases/package",
+            files={"package": ("tests.zip", archive, "application/octet-stream")},
+            params=params
+        )
+
+    def test_upload_adds_tests(self, client, store, problem):
+        """Test the endpoint returns the created tests."""
+        response = self.upload(client, problem, zip_package(tests_of(2)))
+
+        assert response.status_code == 200
+        assert [tc["idx"] for tc in response.json()] == [0, 1]
+
+    def test_corrupt_archive_is_a_bad_request(self, client, store, problem):
+        """Test a corrupt archive is answered with 400 and leaves the problem unchanged."""
+        response = self.upload(client, problem, corrupt_zip())
+
+        assert response.status_code == 400
+        assert "corrupt" in response.json()["detail"]
@@ -0,0 +1,30 @@
+#!/bin/sh
+# Export a judge image as a read-only rootfs for the worker's native sandbox
+# backend (EXECUTOR_BACKEND=native).
+#
+#   infra/docker/export-rootfs.sh <image> <dest>
+#   e.g. infra/docker/export-rootfs.sh gcc:13 /judge_rootfs/cpp
+set -eu
+
+image="$1"
+dest="$2"
+
+container=$(docker create "$image" true)
+trap 'docker rm -f "$container" >/dev/null' EXIT
+
+rm -rf "$dest.tmp"
+mkdir -p "$dest.tmp"
+docker export "$container" | tar -x -C "$dest.tmp"
+
+# Mount points the sandbox fills in at run time
+mkdir -p "$dest.tmp/workspace" "$dest.tmp/tmp" "$dest.tmp/proc" "$dest.tmp/dev"
+for dev in null zero random urandom; do
+    rm -f "$dest.tmp/dev/$dev"
+    touch "$dest.tmp/dev/$dev"
+done
+
+# Image identity, part of compile cache keys
+docker image inspect --format '{{.Id}}' "$image" > "$dest.tmp/.judgelab-image"
+
+rm -rf "$dest"
+mv "$dest.tmp" "$dest"
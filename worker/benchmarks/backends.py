@@ -0,0 +1,81 @@
+"""
+Run throughput of the Docker executor backend versus the native sandbox.
+
+Needs a reachable Docker daemon and judge images for the docker backend, and
+root, a delegated cgroup v2 subtree and exported rootfs trees (make
+native-rootfs) for the native one. Run from worker/:
+
+    python -m benchmarks.backends --runs 200 --jobs 4 --language cpp
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.container_pool import SOURCES  # noqa: E402
+from judge.executor import DockerExecutor  # noqa: E402
+from judge.native import NativeExecutor  # noqa: E402
+
+BACKENDS = {
+    "docker": DockerExecutor,
+    "native": NativeExecutor,
+}
+
+
+def measure(backend: str, language: str, runs: int, jobs: int) -> dict:
+    executor = BACKENDS[backend]()
+
+    compiled = executor.compile(language, SOURCES[language], memory_limit_mb=256)
+    if not compiled.success:
+        raise SystemExit(f"Compilation failed: {compiled.error}")
+
+    def run_once(_):
+        result = executor.run(compiled, "1 2\n", time_limit_ms=2000, memory_limit_mb=256, output_limit_kb=64)
+        if result.verdict != "OK" or result.output.strip() != "3":
+            raise SystemExit(f"Unexpected result: {result}")
+        return result.wall_time_ms
+
+    try:
+        # Warm-up (pool containers, page cache)
+        run_once(None)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            wall_times = sorted(pool.map(run_once, range(runs)))
+        elapsed = time.perf_counter() - start
+    finally:
+        executor.cleanup(compiled)
+
+    return {
+        "backend": backend,
+        "runs": runs,
+        "jobs": jobs,
+        "runs_per_sec": round(runs / elapsed, 1),
+        "p50_wall_ms": wall_times[len(wall_times) // 2],
+        "p95_wall_ms": wall_times[int(len(wall_times) * 0.95) - 1],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--language", default="python", choices=sorted(SOURCES))
+    parser.add_argument("--runs", type=int, default=100)
+    parser.add_argument("--jobs", type=int, default=1)
+    parser.add_argument("--backend", action="append", choices=sorted(BACKENDS))
+    args = parser.parse_args()
+
+    results = [
+        measure(backend, args.language, args.runs, args.jobs)
+        for backend in args.backend or sorted(BACKENDS)
+    ]
+    print(json.dumps({"language": args.language, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Per-test latency of the cold container path versus the warm sandbox pool.
+
+Requires a reachable Docker daemon and the judge images. Run from worker/:
+
+    python -m benchmarks.container_pool --runs 50 --language cpp
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import settings  # noqa: E402
+from judge.container_pool import ContainerPool  # noqa: E402
+from judge.executor import DockerExecutor  # noqa: E402
+
+SOURCES = {
+    "python": "a, b = map(int, input().split())\nprint(a + b)\n",
+    "cpp": "#include <cstdio>\nint main() { int a, b; scanf(\"%d %d\", &a, &b); printf(\"%d\\n\", a + b); }\n",
+}
+
+
+def measure(language: str, runs: int, pool_size: int) -> dict:
+    settings.SANDBOX_POOL_SIZE = pool_size
+    ContainerPool._shared = None
+    executor = DockerExecutor()
+
+    compiled = executor.compile(language, SOURCES[language], memory_limit_mb=256)
+    if not compiled.success:
+        raise SystemExit(f"Compilation failed: {compiled.error}")
+
+    latencies = []
+    try:
+        # One untimed run so the pool (if any) is warm, as it is in steady state
+        executor.run(compiled, "1 2\n", time_limit_ms=2000, memory_limit_mb=256, output_limit_kb=64)
+
+        for _ in range(runs):
+            start = time.perf_counter()
+            result = executor.run(compiled, "1 2\n", time_limit_ms=2000, memory_limit_mb=256, output_limit_kb=64)
+            latencies.append((time.perf_counter() - start) * 1000)
+            if result.verdict != "OK" or result.output.strip() != "3":
+                raise SystemExit(f"Unexpected result: {result}")
+    finally:
+        executor.cleanup(compiled)
+        if executor.pool:
+            executor.pool.close()
+
+    latencies.sort()
+    return {
+        "mode": "pool" if pool_size else "cold",
+        "runs": runs,
+        "mean_ms": round(statistics.mean(latencies), 1),
+        "p50_ms": round(latencies[len(latencies) // 2], 1),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1], 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--language", default="python", choices=sorted(SOURCES))
+    parser.add_argument("--runs", type=int, default=30)
+    parser.add_argument("--pool-size", type=int, default=2)
+    args = parser.parse_args()
+
+    results = [
+        measure(args.language, args.runs, pool_size=0),
+        measure(args.language, args.runs, pool_size=args.pool_size),
+    ]
+    print(json.dumps({"language": args.language, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
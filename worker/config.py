@@ -8,9 +8,59 @@ class Settings(BaseSettings):
     # Judge settings
     JUDGE_WORK_DIR: str = "/judge_work"
     ARTIFACT_RETENTION_DAYS: int = 30
-    MAX_CONCURRENT_JOBS: int = 2
+    MAX_CONCURRENT_JOBS: int = 2  # Tests of a submission kept in flight at once; 1 = one after another
+    FAIL_FAST_ORDER: bool = False  # Run the tests that failed most often first
     DOCKER_TIMEOUT_SEC: int = 60
     
+    # Judge engine budgets shared by all submissions of a worker process
+    JUDGE_CPU_SLOTS: int = 0  # Concurrent sandbox runs; 0 = available cores
+    JUDGE_MEMORY_BUDGET_MB: int = 0  # Sum of admitted memory limits; 0 = 80% of RAM
+    JUDGE_DISK_RESERVE_MB: int = 1024  # Free space in JUDGE_WORK_DIR never promised to runs
+    JUDGE_QUEUE_LIMIT: int = 64  # Calls waiting for admission before new submissions are rejected; 0 = no limit
+    JUDGE_ADMISSION_AGING_MS: int = 5000  # Waiting this long stops later, smaller calls from going ahead
+    JUDGE_REJECT_RETRY_SEC: int = 5  # Rejected submissions go back to the broker for this long
+    
+    # Compiled artifact cache (shared volume)
+    COMPILE_CACHE_ENABLED: bool = True
+    COMPILE_CACHE_DIR: str = "/judge_cache/compile"
+    COMPILE_CACHE_MAX_MB: int = 2048
+    
+    # Judged results reused for identical resubmissions (shared volume)
+    VERDICT_CACHE_ENABLED: bool = True
+    VERDICT_CACHE_DIR: str = "/judge_cache/verdicts"
+    VERDICT_CACHE_MAX_PER_VERSION: int = 2000  # Distinct sources kept per problem version
+    
+    # Content-addressed test data store, shared with the API ("local" or "s3")
+    TESTDATA_STORE_BACKEND: str = "local"
+    TESTDATA_STORE_DIR: str = "/judge_data/testdata"
+    TESTDATA_STORE_COMPRESSION: str = ""  # "" or "zstd"
+    TESTDATA_S3_BUCKET: str = "judgelab-testdata"
+    TESTDATA_S3_PREFIX: str = ""
+    TESTDATA_S3_ENDPOINT_URL: str = ""  # e.g. http://minio:9000
+    TESTDATA_S3_ACCESS_KEY: str = ""
+    TESTDATA_S3_SECRET_KEY: str = ""
+    TESTDATA_S3_REGION: str = ""
+    
+    # Test data cache, keyed by problem version (same filesystem as JUDGE_WORK_DIR
+    # so inputs are hard-linked into sandboxes)
+    TESTDATA_CACHE_ENABLED: bool = True
+    TESTDATA_CACHE_DIR: str = "/judge_work/testdata"
+    TESTDATA_CACHE_MAX_MB: int = 4096
+    TESTDATA_PREFETCH_WINDOW: int = 2  # Uncached tests loaded ahead of the running ones
+    
+    # Host cgroup tree used for CPU time / peak memory accounting
+    CGROUP_ROOT: str = "/sys/fs/cgroup"
+    
+    # Warm sandbox pool (containers kept idle per language image, 0 disables)
+    SANDBOX_POOL_SIZE: int = 0
+    SANDBOX_POOL_MAX_USES: int = 50
+    
+    # Sandbox backend: "docker", or "native" (namespaces + cgroup v2 on the host)
+    EXECUTOR_BACKEND: str = "docker"
+    NATIVE_ROOTFS_DIR: str = "/judge_rootfs"  # One exported judge image per language
+    NATIVE_CGROUP_ROOT: str = "/sys/fs/cgroup/judgelab"  # Delegated cgroup v2 subtree
+    NATIVE_SUBID_BASE: int = 100000  # Host uid/gid that sandbox uid/gid 0 maps to
+    
     # Language configurations
     PYTHON_IMAGE: str = "python:3.12-slim"
     CPP_IMAGE: str = "gcc:13"
@@ -20,6 +70,24 @@ class Settings(BaseSettings):
     DEFAULT_MEMORY_LIMIT_MB: int = 256
     DEFAULT_OUTPUT_LIMIT_KB: int = 64
     
+    # float_eps checker tolerances when the problem's checker_config sets none
+    DEFAULT_FLOAT_EPSILON: float = 1e-6
+    DEFAULT_FLOAT_RELATIVE_EPSILON: float = 0.0
+    
+    # Custom checkers and interactors: compiled once per problem version; checkers
+    # are kept running per submission
+    CUSTOM_CHECKER_TIME_LIMIT_MS: int = 5000  # Checker: wall time per test; interactor: CPU time
+    CUSTOM_CHECKER_MEMORY_LIMIT_MB: int = 256
+    CUSTOM_CHECKER_CACHE_SIZE: int = 32  # Compiled programs kept per worker process
+    INTERACTIVE_IDLE_MS: int = 1000  # Neither side of an interaction using CPU this long = deadlock
+    
+    # Run watchdog: kill at the CPU limit, or once wall time exceeds this multiple of it
+    WALL_TIME_LIMIT_MULTIPLIER: float = 2.0
+    WATCHDOG_POLL_MS: int = 10
+    
+    # Prometheus metrics endpoint of each worker (0 disables)
+    METRICS_PORT: int = 9100
+    
     # Security settings
     ENABLE_NETWORK: bool = False
     ENABLE_SECCOMP: bool = True
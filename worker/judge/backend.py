@@ -0,0 +1,873 @@
+import contextvars
+import errno
+import os
+import select
+import shutil
+import threading
+import time
+import tempfile
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, NamedTuple, Optional, Set, Tuple
+
+import structlog
+from config import settings
+from judge.cgroup import CgroupMonitor
+from judge.compile_cache import CompileCache, source_sha256
+
+logger = structlog.get_logger()
+
+# Stdout kept in memory on ExecutionResult.output; the rest stays in output_path
+OUTPUT_PREVIEW_BYTES = 64 * 1024
+STDERR_MAX_BYTES = 64 * 1024
+
+# Watchdog rules recorded on killed runs
+LIMIT_RULE_CPU = "cpu_time"
+LIMIT_RULE_WALL = "wall_time"
+LIMIT_RULE_OUTPUT = "output"
+LIMIT_RULE_IDLE = "idle"  # Interaction where both sides stopped running (deadlock)
+
+COMPILE_TIME_LIMIT_MS = 10000
+
+# run_key of the run() or run_interactive() call in progress, so that the
+# sandboxes it starts can be cancelled on their own (cancel_run)
+_current_run_key: contextvars.ContextVar[Optional[Any]] = contextvars.ContextVar("sandbox_run_key", default=None)
+
+# FIFOs a started program reads and writes, created in its sandbox's /workspace
+STDIN_FIFO = "stdin.fifo"
+STDOUT_FIFO = "stdout.fifo"
+# Test files an interactor finds in its /workspace
+INTERACTOR_INPUT = "input.txt"
+INTERACTOR_ANSWER = "answer.txt"
+PROCESS_START_TIMEOUT_SEC = 10
+PROCESS_MAX_LINE_BYTES = 64 * 1024
+
+
+@dataclass
+class ExecutionResult:
+    verdict: str
+    time_ms: int
+    memory_kb: int
+    output: str
+    error: str
+    exit_code: int
+    wall_time_ms: int = 0
+    limit_rule: Optional[str] = None  # Watchdog rule that killed the run
+    output_path: Optional[str] = None  # Full stdout, capped at the output limit (+1 block)
+    output_bytes: int = 0
+    system_error: bool = False  # The judge failed or cancelled the run; says nothing about the program
+
+
+class InteractiveResult(NamedTuple):
+    solution: ExecutionResult  # Verdict assigned as by run()
+    interactor: ExecutionResult  # Raw: verdict "OK", exit_code is the interactor's answer
+
+
+@dataclass
+class CompileResult:
+    success: bool
+    language: str
+    work_dir: str
+    time_ms: int
+    error: str
+    exit_code: int
+    cached: bool = False
+    system_error: bool = False  # The judge failed, not the compiler
+
+
+class SandboxProcess(ABC):
+    """
+    A program left running in a sandbox (e.g. a custom checker serving every
+    test of a submission). Its stdin and stdout are FIFOs in workspace, the
+    host directory mounted at the sandbox's /workspace; ExecutorBackend.start()
+    opens them. Backends provide kill/finished and release the sandbox.
+    """
+
+    def __init__(self, workspace: str, cgroup: Optional[CgroupMonitor] = None, cpu_before_usec: int = 0):
+        self.workspace = workspace
+        self.cgroup = cgroup  # For accounting; None when the sandbox's cgroup is not visible
+        self.cpu_before_usec = cpu_before_usec
+        self._stdin_fd: Optional[int] = None
+        self._stdout_fd: Optional[int] = None
+        self._buffer = b""
+
+    @abstractmethod
+    def kill(self) -> None:
+        pass
+
+    @abstractmethod
+    def finished(self, timeout: float) -> bool:
+        pass
+
+    @abstractmethod
+    def exit_code(self) -> int:
+        """Exit status once finished (128 + signal number if killed)."""
+
+    def cpu_usec(self) -> Optional[int]:
+        """CPU time used by the program so far, if measurable."""
+        if self.cgroup is None:
+            return None
+        try:
+            return self.cgroup.cpu_usec() - self.cpu_before_usec
+        except OSError:
+            return None
+
+    def memory_kb(self) -> int:
+        return self.cgroup.memory_peak_bytes() // 1024 if self.cgroup else 0
+
+    @abstractmethod
+    def _release(self) -> None:
+        """Free the sandbox once the program is gone."""
+
+    def open_pipes(self, timeout_sec: float = PROCESS_START_TIMEOUT_SEC) -> None:
+        """Connect to the program's FIFOs once it has opened them."""
+        # A non-blocking read end opens at once, so the program's open of
+        # stdout never waits for us
+        self._stdout_fd = os.open(os.path.join(self.workspace, STDOUT_FIFO), os.O_RDONLY | os.O_NONBLOCK)
+
+        deadline = time.monotonic() + timeout_sec
+        while self._stdin_fd is None:
+            try:
+                self._stdin_fd = os.open(os.path.join(self.workspace, STDIN_FIFO), os.O_WRONLY | os.O_NONBLOCK)
+            except OSError as e:
+                # ENXIO until the program has opened its stdin
+                if e.errno != errno.ENXIO:
+                    raise
+                if self.finished(0) or time.monotonic() > deadline:
+                    raise RuntimeError("Sandboxed program did not open its stdin")
+                time.sleep(0.005)
+        os.set_blocking(self._stdin_fd, True)
+
+    def write(self, data: bytes) -> None:
+        """Send data to the program's stdin. Raises BrokenPipeError once it has exited."""
+        view = memoryview(data)
+        while view:
+            view = view[os.write(self._stdin_fd, view):]
+
+    def readline(self, timeout_sec: float) -> bytes:
+        """
+        Next line of the program's stdout, without the newline. Returns what
+        is left (maybe b"") at end of output; raises TimeoutError if no full
+        line arrives in time.
+        """
+        deadline = time.monotonic() + timeout_sec
+        while b"\n" not in self._buffer:
+            if len(self._buffer) > PROCESS_MAX_LINE_BYTES:
+                raise ValueError(f"Sandboxed program wrote a line over {PROCESS_MAX_LINE_BYTES} bytes")
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError("Sandboxed program did not answer in time")
+            ready, _, _ = select.select([self._stdout_fd], [], [], remaining)
+            if ready:
+                chunk = os.read(self._stdout_fd, PROCESS_MAX_LINE_BYTES)
+                if not chunk:
+                    line, self._buffer = self._buffer, b""
+                    return line
+                self._buffer += chunk
+
+        line, self._buffer = self._buffer.split(b"\n", 1)
+        return line
+
+    def close(self) -> None:
+        """Stop the program and release its sandbox."""
+        for fd in (self._stdin_fd, self._stdout_fd):
+            if fd is not None:
+                os.close(fd)
+        self._stdin_fd = self._stdout_fd = None
+
+        try:
+            # Closing stdin lets a well-behaved program exit on its own
+            if not self.finished(0.1):
+                self.kill()
+                self.finished(5)
+        finally:
+            if self.cgroup:
+                self.cgroup.close()
+            self._release()
+
+
+class ExecutorBackend(ABC):
+    """
+    Sandbox-independent part of an executor: per-submission workspaces, the
+    compile cache, verdict rules, the run watchdog and cancellation.
+    Backends only provide the sandbox itself (compile and run one command).
+    """
+
+    def __init__(self):
+        self.compile_cache = None
+        if settings.COMPILE_CACHE_ENABLED:
+            self.compile_cache = CompileCache(
+                settings.COMPILE_CACHE_DIR,
+                settings.COMPILE_CACHE_MAX_MB * 1024 * 1024
+            )
+        self._active_runs: Dict[str, Set[Any]] = {}
+        self._cancelled: Set[str] = set()
+        self._keyed_runs: Dict[Tuple[str, Any], Set[Any]] = {}  # (work_dir, run_key) -> sandboxes
+        self._cancelled_runs: Set[Tuple[str, Any]] = set()
+        self._runs_lock = threading.Lock()
+
+    @abstractmethod
+    def _toolchain_digest(self, lang_config: Dict[str, Any]) -> str:
+        """Identity of the compiler environment, part of compile cache keys."""
+
+    @abstractmethod
+    def _compile_sandboxed(
+        self,
+        work_dir: str,
+        lang_config: Dict[str, Any],
+        memory_limit_mb: int
+    ) -> ExecutionResult:
+        """Run the language's compile command in work_dir."""
+
+    @abstractmethod
+    def _run_sandboxed(
+        self,
+        work_dir: str,
+        lang_config: Dict[str, Any],
+        input_path: str,
+        output_path: str,
+        time_limit_ms: int,
+        memory_limit_mb: int,
+        output_limit_kb: int
+    ) -> ExecutionResult:
+        """
+        Run the compiled solution with stdin from input_path, leaving stdout
+        in output_path. Returns raw measurements; run() assigns the verdict.
+        """
+
+    @abstractmethod
+    def _start_sandboxed(
+        self,
+        work_dir: str,
+        lang_config: Dict[str, Any],
+        time_limit_ms: int,
+        memory_limit_mb: int,
+        files: Optional[Dict[str, str]] = None,
+        stdout_first: bool = False
+    ) -> SandboxProcess:
+        """
+        Start the compiled program in a sandbox with stdin and stdout
+        redirected from/to STDIN_FIFO and STDOUT_FIFO in its workspace.
+        _stage_files() links in files (workspace name -> host path), which
+        may replace those FIFOs, and makes the FIFOs not given.
+        With stdout_first the program opens its stdout before its stdin.
+        time_limit_ms is a CPU time backstop for the program's whole life.
+        """
+
+    def execute(
+        self,
+        language: str,
+        source_code: str,
+        input_data: str,
+        time_limit_ms: int,
+        memory_limit_mb: int,
+        output_limit_kb: int
+    ) -> ExecutionResult:
+        """Compile and run code against a single input (one-shot helper)."""
+
+        compiled = self.compile(language, source_code, memory_limit_mb)
+        try:
+            if not compiled.success:
+                return ExecutionResult(
+                    verdict="CE",
+                    time_ms=0,
+                    memory_kb=0,
+                    output="",
+                    error=compiled.error,
+                    exit_code=compiled.exit_code
+                )
+
+            return self.run(
+                compiled,
+                input_data,
+                time_limit_ms=time_limit_ms,
+                memory_limit_mb=memory_limit_mb,
+                output_limit_kb=output_limit_kb
+            )
+        finally:
+            self.cleanup(compiled)
+
+    def compile(
+        self,
+        language: str,
+        source_code: str,
+        memory_limit_mb: int,
+        source_hash: Optional[str] = None
+    ) -> CompileResult:
+        """
+        Prepare a per-submission workspace and compile the source once.
+        The workspace outlives this call so every test case can reuse the
+        produced artifact; release it with cleanup().
+        """
+
+        work_dir = tempfile.mkdtemp(prefix="submission_", dir=settings.JUDGE_WORK_DIR)
+        os.chmod(work_dir, 0o777)  # Sandbox user must be able to write the artifact
+
+        try:
+            self._prepare_source(work_dir, language, source_code)
+            lang_config = self._get_language_config(language)
+
+            if not lang_config.get("compile_cmd"):
+                return CompileResult(
+                    success=True,
+                    language=language,
+                    work_dir=work_dir,
+                    time_ms=0,
+                    error="",
+                    exit_code=0
+                )
+
+            cache_key = None
+            if self.compile_cache:
+                cache_key = CompileCache.make_key(
+                    language,
+                    self._toolchain_digest(lang_config),
+                    lang_config["compile_cmd"],
+                    source_hash or source_sha256(source_code)
+                )
+                if self.compile_cache.fetch(cache_key, work_dir, lang_config["artifacts"]):
+                    logger.debug("Compile cache hit", language=language, key=cache_key)
+                    return CompileResult(
+                        success=True,
+                        language=language,
+                        work_dir=work_dir,
+                        time_ms=0,
+                        error="",
+                        exit_code=0,
+                        cached=True
+                    )
+
+            start_time = time.time()
+            compile_result = self._compile_sandboxed(
+                work_dir,
+                lang_config,
+                memory_limit_mb=memory_limit_mb * 2  # More memory for compilation
+            )
+            compile_time_ms = int((time.time() - start_time) * 1000)
+
+            if cache_key and compile_result.exit_code == 0:
+                self.compile_cache.store(cache_key, work_dir, lang_config["artifacts"])
+
+            return CompileResult(
+                success=compile_result.exit_code == 0,
+                language=language,
+                work_dir=work_dir,
+                time_ms=compile_time_ms,
+                error=compile_result.error,
+                exit_code=compile_result.exit_code,
+                system_error=compile_result.system_error
+            )
+
+        except Exception as e:
+            logger.error("Compilation failed", error=str(e))
+            return CompileResult(
+                success=False,
+                language=language,
+                work_dir=work_dir,
+                time_ms=0,
+                error=f"System error: {str(e)}",
+                exit_code=1,
+                system_error=True
+            )
+
+    def run(
+        self,
+        compiled: CompileResult,
+        input_data: Optional[str],
+        time_limit_ms: int,
+        memory_limit_mb: int,
+        output_limit_kb: int,
+        input_path: Optional[str] = None,
+        run_key: Any = None
+    ) -> ExecutionResult:
+        """
+        Run a compiled solution against one input in a sandbox.
+        The input is either input_data or an existing file at input_path
+        (e.g. from the test data cache; linked into the sandbox, not copied).
+        Stdout is left in the file at result.output_path (inside the
+        workspace) for the checker to read. A run given a run_key can be
+        cancelled by itself with cancel_run().
+        """
+
+        if self._run_cancelled(compiled.work_dir, run_key):
+            return ExecutionResult(
+                verdict="RE",
+                time_ms=0,
+                memory_kb=0,
+                output="",
+                error="Run cancelled",
+                exit_code=1,
+                system_error=True
+            )
+
+        owned_input = None
+        key_token = _current_run_key.set(run_key)
+
+        try:
+            if input_path is None:
+                input_fd, owned_input = tempfile.mkstemp(prefix="input_", suffix=".txt", dir=compiled.work_dir)
+                with os.fdopen(input_fd, 'w', encoding='utf-8') as f:
+                    f.write(input_data)
+                input_path = owned_input
+
+            output_fd, output_path = tempfile.mkstemp(prefix="output_", suffix=".txt", dir=compiled.work_dir)
+            os.close(output_fd)
+
+            lang_config = self._get_language_config(compiled.language)
+
+            result = self._run_sandboxed(
+                compiled.work_dir,
+                lang_config,
+                input_path,
+                output_path,
+                time_limit_ms=time_limit_ms,
+                memory_limit_mb=memory_limit_mb,
+                output_limit_kb=output_limit_kb
+            )
+
+            return ExecutionResult(
+                verdict=self._verdict(result, time_limit_ms, memory_limit_mb, output_limit_kb),
+                time_ms=result.time_ms,
+                memory_kb=result.memory_kb,
+                output=result.output,
+                error=result.error,
+                exit_code=result.exit_code,
+                wall_time_ms=result.wall_time_ms,
+                limit_rule=result.limit_rule,
+                output_path=result.output_path,
+                output_bytes=result.output_bytes,
+                system_error=result.system_error
+            )
+
+        except Exception as e:
+            logger.error("Execution failed", error=str(e))
+            return ExecutionResult(
+                verdict="RE",
+                time_ms=0,
+                memory_kb=0,
+                output="",
+                error=f"System error: {str(e)}",
+                exit_code=1,
+                system_error=True
+            )
+
+        finally:
+            _current_run_key.reset(key_token)
+            if owned_input:
+                try:
+                    os.remove(owned_input)
+                except OSError:
+                    pass
+
+    def start(self, compiled: CompileResult, time_limit_ms: int, memory_limit_mb: int) -> SandboxProcess:
+        """
+        Start a compiled program that keeps running to serve requests over
+        its stdin/stdout; stop it with close(). The workspace stays usable
+        by the caller, e.g. to place files the program is asked to read.
+        """
+        lang_config = self._get_language_config(compiled.language)
+        process = self._start_sandboxed(compiled.work_dir, lang_config, time_limit_ms, memory_limit_mb)
+        try:
+            process.open_pipes()
+        except BaseException:
+            process.close()
+            raise
+        return process
+
+    def run_interactive(
+        self,
+        compiled: CompileResult,
+        interactor: CompileResult,
+        input_data: Optional[str],
+        answer_data: Optional[str],
+        time_limit_ms: int,
+        memory_limit_mb: int,
+        interactor_time_limit_ms: int,
+        interactor_memory_limit_mb: int,
+        input_path: Optional[str] = None,
+        answer_path: Optional[str] = None,
+        run_key: Any = None
+    ) -> InteractiveResult:
+        """
+        Run a compiled solution against a problem's interactor. Both run in
+        their own sandbox, with the solution's stdout feeding the
+        interactor's stdin and the other way round through a pair of FIFOs,
+        so the exchange never passes through the worker. The interactor
+        reads the test from INTERACTOR_INPUT and INTERACTOR_ANSWER in its
+        workspace (from the *_path files or the *_data text). run_key is
+        as for run().
+        """
+
+        if self._run_cancelled(compiled.work_dir, run_key):
+            cancelled = ExecutionResult(
+                verdict="RE", time_ms=0, memory_kb=0, output="", error="Run cancelled", exit_code=1, system_error=True
+            )
+            return InteractiveResult(cancelled, cancelled)
+
+        channel_dir = tempfile.mkdtemp(prefix="channel_", dir=compiled.work_dir)
+        to_solution = os.path.join(channel_dir, "to_solution.fifo")
+        to_interactor = os.path.join(channel_dir, "to_interactor.fifo")
+        processes = []
+        key_token = _current_run_key.set(run_key)
+
+        try:
+            for path in (to_solution, to_interactor):
+                os.mkfifo(path)
+                os.chmod(path, 0o666)
+            test_files = {}
+            for name, path, data in (
+                (INTERACTOR_INPUT, input_path, input_data),
+                (INTERACTOR_ANSWER, answer_path, answer_data)
+            ):
+                if path is None:
+                    path = os.path.join(channel_dir, name)
+                    with open(path, "w", encoding="utf-8") as f:
+                        f.write(data)
+                test_files[name] = path
+
+            processes.append(self._start_sandboxed(
+                interactor.work_dir,
+                self._get_language_config(interactor.language),
+                interactor_time_limit_ms,
+                interactor_memory_limit_mb,
+                files={STDIN_FIFO: to_interactor, STDOUT_FIFO: to_solution, **test_files}
+            ))
+            # The interactor opens its stdin first, so the solution opens its
+            # stdout first; the opposite order would block both in open()
+            processes.append(self._start_sandboxed(
+                compiled.work_dir,
+                self._get_language_config(compiled.language),
+                time_limit_ms,
+                memory_limit_mb,
+                files={STDIN_FIFO: to_solution, STDOUT_FIFO: to_interactor},
+                stdout_first=True
+            ))
+            interactor_process, solution_process = processes
+            for process in processes:
+                self._track_run(compiled.work_dir, process)
+
+            solution_rule, interactor_rule = self._watch_interaction(
+                solution_process,
+                interactor_process,
+                time_limit_ms,
+                interactor_time_limit_ms
+            )
+
+            solution = self._process_result(solution_process, solution_rule)
+            return InteractiveResult(
+                ExecutionResult(
+                    verdict=self._verdict(solution, time_limit_ms, memory_limit_mb),
+                    time_ms=solution.time_ms,
+                    memory_kb=solution.memory_kb,
+                    output=solution.output,
+                    error=solution.error,
+                    exit_code=solution.exit_code,
+                    wall_time_ms=solution.wall_time_ms,
+                    limit_rule=solution.limit_rule
+                ),
+                self._process_result(interactor_process, interactor_rule)
+            )
+
+        finally:
+            for process in processes:
+                self._untrack_run(compiled.work_dir, process)
+                process.close()
+            _current_run_key.reset(key_token)
+            shutil.rmtree(channel_dir, ignore_errors=True)
+
+    def cancel(self, compiled: CompileResult) -> None:
+        """Kill in-flight runs of a submission and refuse new ones."""
+        with self._runs_lock:
+            self._cancelled.add(compiled.work_dir)
+            sandboxes = list(self._active_runs.get(compiled.work_dir, ()))
+
+        for sandbox in sandboxes:
+            try:
+                sandbox.kill()
+            except Exception:
+                # Already exited
+                pass
+
+    def cancel_run(self, compiled: CompileResult, run_key: Any) -> None:
+        """Kill the sandboxes of the run given run_key, or refuse it if it has not started."""
+        key = (compiled.work_dir, run_key)
+        with self._runs_lock:
+            self._cancelled_runs.add(key)
+            sandboxes = list(self._keyed_runs.get(key, ()))
+
+        for sandbox in sandboxes:
+            try:
+                sandbox.kill()
+            except Exception:
+                # Already exited
+                pass
+
+    def resume(self, compiled: CompileResult) -> None:
+        """Accept runs again after cancel(), once the cancelled runs have settled."""
+        with self._runs_lock:
+            self._cancelled.discard(compiled.work_dir)
+
+    def toolchain_digest(self, language: str) -> str:
+        """Identity of the image a language compiles and runs in."""
+        return self._toolchain_digest(self._get_language_config(language))
+
+    def cleanup(self, compiled: CompileResult) -> None:
+        """Remove the per-submission workspace."""
+        with self._runs_lock:
+            self._cancelled.discard(compiled.work_dir)
+            self._cancelled_runs = {key for key in self._cancelled_runs if key[0] != compiled.work_dir}
+        shutil.rmtree(compiled.work_dir, ignore_errors=True)
+
+    def _prepare_source(self, work_dir: str, language: str, source_code: str) -> str:
+        """Prepare source code file."""
+        extensions = {
+            "python": "py",
+            "cpp": "cpp",
+            "java": "java",
+            "javascript": "js",
+            "go": "go",
+            "rust": "rs"
+        }
+
+        ext = extensions.get(language, "txt")
+        source_file = os.path.join(work_dir, f"solution.{ext}")
+
+        with open(source_file, 'w', encoding='utf-8') as f:
+            f.write(source_code)
+
+        return source_file
+
+    def _get_language_config(self, language: str) -> Dict[str, Any]:
+        """Get configuration for a programming language."""
+        configs = {
+            "python": {
+                "image": settings.PYTHON_IMAGE,
+                "rootfs": "python",
+                "compile_cmd": None,
+                "run_cmd": ["python3", "solution.py"],
+                "artifacts": ["solution.py"]
+            },
+            "cpp": {
+                "image": settings.CPP_IMAGE,
+                "rootfs": "cpp",
+                "compile_cmd": ["g++", "-std=c++17", "-O2", "-o", "solution", "solution.cpp"],
+                "run_cmd": ["./solution"],
+                "artifacts": ["solution"]
+            },
+            # TODO: Add more languages
+        }
+
+        return configs.get(language, configs["python"])
+
+    @staticmethod
+    def _verdict(
+        result: ExecutionResult,
+        time_limit_ms: int,
+        memory_limit_mb: int,
+        output_limit_kb: Optional[int] = None
+    ) -> str:
+        """
+        Verdict from cgroup CPU time and peak memory; a run killed for
+        exceeding a limit also exits non-zero, so limits go first.
+        """
+        if result.limit_rule == LIMIT_RULE_OUTPUT:
+            return "OLE"
+        if result.limit_rule or result.time_ms > time_limit_ms:
+            return "TLE"
+        if result.memory_kb >= memory_limit_mb * 1024:
+            return "MLE"
+        if output_limit_kb is not None and result.output_bytes > output_limit_kb * 1024:
+            return "OLE"
+        if result.exit_code != 0:
+            return "RE"
+        return "OK"  # Will be checked against expected output
+
+    def _watch_interaction(
+        self,
+        solution: SandboxProcess,
+        interactor: SandboxProcess,
+        time_limit_ms: int,
+        interactor_time_limit_ms: int
+    ) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Watchdog for an interaction; returns the rule that killed each side.
+        Either side is killed at its CPU limit or at WALL_TIME_LIMIT_MULTIPLIER
+        times it. While both run, neither using any CPU for
+        INTERACTIVE_IDLE_MS means both are blocked reading each other:
+        both are killed and the solution gets LIMIT_RULE_IDLE.
+        """
+
+        sides = ((solution, time_limit_ms), (interactor, interactor_time_limit_ms))
+        rules = [None, None]
+        poll_sec = settings.WATCHDOG_POLL_MS / 1000
+        idle_sec = settings.INTERACTIVE_IDLE_MS / 1000
+        last_cpu = None
+        idle_since = start_time = time.time()
+
+        while True:
+            running = [not process.finished(0) for process, _ in sides]
+            if not any(running):
+                return rules[0], rules[1]
+
+            now = time.time()
+            cpu = tuple(process.cpu_usec() for process, _ in sides)
+            for i, (process, limit_ms) in enumerate(sides):
+                if not running[i] or rules[i]:
+                    continue
+                if cpu[i] is not None and cpu[i] > limit_ms * 1000:
+                    rules[i] = LIMIT_RULE_CPU
+                elif now - start_time > limit_ms * settings.WALL_TIME_LIMIT_MULTIPLIER / 1000:
+                    rules[i] = LIMIT_RULE_WALL
+                if rules[i]:
+                    process.kill()
+
+            if all(running) and not any(rules) and None not in cpu:
+                if cpu != last_cpu:
+                    last_cpu, idle_since = cpu, now
+                elif now - idle_since > idle_sec:
+                    rules[0] = LIMIT_RULE_IDLE
+                    for process, _ in sides:
+                        process.kill()
+
+            time.sleep(poll_sec)
+
+    def _process_result(self, process: SandboxProcess, limit_rule: Optional[str]) -> ExecutionResult:
+        """Measurements of a finished started program."""
+        cpu_usec = process.cpu_usec()
+        return ExecutionResult(
+            verdict="OK",
+            time_ms=(cpu_usec or 0) // 1000,
+            memory_kb=process.memory_kb(),
+            output="",
+            error=self._read_text(os.path.join(process.workspace, "stderr.txt"), STDERR_MAX_BYTES),
+            exit_code=124 if limit_rule else process.exit_code(),
+            limit_rule=limit_rule
+        )
+
+    def _watch(
+        self,
+        wait: Callable[[float], bool],
+        kill: Callable[[], None],
+        stdout_path: str,
+        time_limit_ms: int,
+        cgroup: Optional[CgroupMonitor] = None,
+        cpu_before_usec: int = 0,
+        output_limit_bytes: Optional[int] = None
+    ) -> Optional[str]:
+        """
+        Watchdog loop shared by the backends. wait(timeout) returns True once
+        the program has finished. The sandbox is killed as soon as its CPU
+        time crosses time_limit_ms, as soon as stdout_path grows past
+        output_limit_bytes, or once wall time exceeds
+        WALL_TIME_LIMIT_MULTIPLIER times the limit (a program blocked on
+        input or sleeping). Returns the rule that fired, if any.
+        """
+
+        cpu_limit_usec = time_limit_ms * 1000
+        wall_limit_sec = time_limit_ms * settings.WALL_TIME_LIMIT_MULTIPLIER / 1000
+        poll_sec = settings.WATCHDOG_POLL_MS / 1000
+        limit_rule = None
+
+        start_time = time.time()
+        while not wait(poll_sec):
+            try:
+                # A runaway writer that survives RLIMIT_FSIZE (e.g. ignores
+                # SIGXFSZ and retries) is stopped here instead of at the time limit
+                if output_limit_bytes is not None and os.stat(stdout_path).st_size > output_limit_bytes:
+                    limit_rule = LIMIT_RULE_OUTPUT
+            except FileNotFoundError:
+                pass
+
+            try:
+                if limit_rule is None and cgroup and cgroup.cpu_usec() - cpu_before_usec > cpu_limit_usec:
+                    limit_rule = LIMIT_RULE_CPU
+            except OSError:
+                # cgroup vanished with the sandbox
+                pass
+
+            if limit_rule is None and time.time() - start_time > wall_limit_sec:
+                limit_rule = LIMIT_RULE_WALL
+
+            if limit_rule:
+                kill()
+                wait(5)
+                break
+
+        return limit_rule
+
+    def _track_run(self, work_dir: str, sandbox) -> None:
+        """Register a running sandbox (anything with kill()) so cancel() and cancel_run() can reach it."""
+        key = (work_dir, _current_run_key.get())
+        with self._runs_lock:
+            self._active_runs.setdefault(work_dir, set()).add(sandbox)
+            if key[1] is not None:
+                self._keyed_runs.setdefault(key, set()).add(sandbox)
+            cancelled = work_dir in self._cancelled or key in self._cancelled_runs
+
+        if cancelled:
+            sandbox.kill()
+
+    def _untrack_run(self, work_dir: str, sandbox) -> None:
+        key = (work_dir, _current_run_key.get())
+        with self._runs_lock:
+            for runs, run in ((self._active_runs, work_dir), (self._keyed_runs, key)):
+                active = runs.get(run, set())
+                active.discard(sandbox)
+                if not active:
+                    runs.pop(run, None)
+
+    def _run_cancelled(self, work_dir: str, run_key: Any) -> bool:
+        with self._runs_lock:
+            return work_dir in self._cancelled or (work_dir, run_key) in self._cancelled_runs
+
+    @staticmethod
+    def _link_or_copy(src: str, dst: str) -> None:
+        try:
+            os.link(src, dst)
+        except OSError:
+            shutil.copy2(src, dst)
+
+    @classmethod
+    def _stage_files(cls, workspace: str, files: Optional[Dict[str, str]]) -> None:
+        """Link files into a started program's workspace and make the FIFOs not given."""
+        files = files or {}
+        for name, path in files.items():
+            cls._link_or_copy(path, os.path.join(workspace, name))
+
+        for name in (STDIN_FIFO, STDOUT_FIFO):
+            if name not in files:
+                path = os.path.join(workspace, name)
+                os.mkfifo(path)
+                os.chmod(path, 0o666)  # The sandbox user opens them
+
+    @staticmethod
+    def _read_text(path: str, max_bytes: int) -> str:
+        """Read up to max_bytes of a program output file as text."""
+        try:
+            with open(path, 'rb') as f:
+                return f.read(max_bytes).decode('utf-8', errors='replace')
+        except FileNotFoundError:
+            return ""
+
+    @staticmethod
+    def _decode_output(raw: bytes, output_limit_kb: int) -> str:
+        """Decode program output, truncating it to the output limit."""
+        output = raw.decode('utf-8', errors='replace')
+
+        # Truncate output if too long
+        max_output_bytes = output_limit_kb * 1024
+        if len(output.encode('utf-8')) > max_output_bytes:
+            output = output.encode('utf-8')[:max_output_bytes].decode('utf-8', errors='replace')
+            output += "\n[Output truncated]"
+
+        return output
+
+
+def create_executor() -> ExecutorBackend:
+    """Executor for the configured EXECUTOR_BACKEND ("docker" or "native")."""
+    if settings.EXECUTOR_BACKEND == "native":
+        from judge.native import NativeExecutor
+        return NativeExecutor()
+
+    from judge.executor import DockerExecutor
+    return DockerExecutor()
@@ -0,0 +1,102 @@
+import os
+from typing import Optional
+
+import structlog
+from config import settings
+
+logger = structlog.get_logger()
+
+
+class CgroupMonitor:
+    """
+    Reads CPU time and peak memory of one container straight from its cgroup.
+    Supports the unified (v2) hierarchy and falls back to v1 cpuacct/memory
+    controllers. The worker needs the host cgroup tree mounted at CGROUP_ROOT.
+    """
+
+    def __init__(self, cpu_dir: str, memory_dir: str, unified: bool):
+        self.cpu_dir = cpu_dir
+        self.memory_dir = memory_dir
+        self.unified = unified
+        self._peak_fd: Optional[int] = None
+        self._peak_reset = False
+
+    @classmethod
+    def for_container(cls, container_id: str) -> Optional["CgroupMonitor"]:
+        """Locate a running container's cgroup. Returns None if it is not visible."""
+        root = settings.CGROUP_ROOT
+        # systemd and cgroupfs driver layouts
+        parents = (
+            os.path.join("system.slice", f"docker-{container_id}.scope"),
+            os.path.join("docker", container_id),
+        )
+
+        # cgroup v2
+        for parent in parents:
+            path = os.path.join(root, parent)
+            if os.path.exists(os.path.join(path, "cpu.stat")):
+                return cls(path, path, unified=True)
+
+        # cgroup v1
+        for parent in parents:
+            cpu_dir = os.path.join(root, "cpuacct", parent)
+            if os.path.exists(os.path.join(cpu_dir, "cpuacct.usage")):
+                return cls(cpu_dir, os.path.join(root, "memory", parent), unified=False)
+
+        return None
+
+    def cpu_usec(self) -> int:
+        """User+system CPU time consumed by the cgroup so far."""
+        if self.unified:
+            with open(os.path.join(self.cpu_dir, "cpu.stat")) as f:
+                for line in f:
+                    key, value = line.split()
+                    if key == "usage_usec":
+                        return int(value)
+            return 0
+
+        with open(os.path.join(self.cpu_dir, "cpuacct.usage")) as f:
+            return int(f.read()) // 1000  # nanoseconds
+
+    def reset_peak(self) -> None:
+        """
+        Start a fresh peak-memory window so reused containers report only the
+        current run. Kernels without resettable memory.peak report the
+        container's lifetime peak instead.
+        """
+        self.close()
+
+        try:
+            if self.unified:
+                # Since Linux 6.12 writing to memory.peak resets it for this fd
+                self._peak_fd = os.open(os.path.join(self.memory_dir, "memory.peak"), os.O_RDWR)
+                os.write(self._peak_fd, b"0\n")
+            else:
+                with open(os.path.join(self.memory_dir, "memory.max_usage_in_bytes"), "w") as f:
+                    f.write("0")
+            self._peak_reset = True
+        except OSError:
+            self.close()
+            self._peak_reset = False
+
+    @property
+    def peak_is_per_run(self) -> bool:
+        """Whether memory_peak_bytes() covers only the run since reset_peak()."""
+        return self._peak_reset
+
+    def memory_peak_bytes(self) -> int:
+        """Peak memory usage since reset_peak() (or since container start)."""
+        try:
+            if self._peak_fd is not None and self._peak_reset:
+                return int(os.pread(self._peak_fd, 64, 0))
+
+            name = "memory.peak" if self.unified else "memory.max_usage_in_bytes"
+            with open(os.path.join(self.memory_dir, name)) as f:
+                return int(f.read())
+        except (OSError, ValueError):
+            return 0
+
+    def close(self) -> None:
+        if self._peak_fd is not None:
+            os.close(self._peak_fd)
+            self._peak_fd = None
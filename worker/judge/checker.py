@@ -1,6 +1,26 @@
-from typing import Tuple
+import codecs
+import hashlib
+import mmap
+import os
+import re
+from itertools import chain
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
 from enum import Enum
 
+import numpy as np
+
+# Output files above this size are memory-mapped instead of read()
+MMAP_THRESHOLD_BYTES = 1024 * 1024
+
+# Streaming checkers read outputs in chunks of this size, so memory does not
+# grow with the output
+CHUNK_BYTES = 1024 * 1024
+
+# Longest token quoted in a mismatch message
+TOKEN_PREVIEW_CHARS = 32
+
+_TOKEN = re.compile(r"\S+")
+
 
 class CheckerResult(Enum):
     AC = "AC"  # Accepted
@@ -8,77 +28,442 @@ class CheckerResult(Enum):
     PE = "PE"  # Presentation Error
 
 
+class ExpectedDigest(NamedTuple):
+    """Normalized forms of a test's expected output, computed once per test."""
+    diff_sha256: str  # Output without trailing whitespace
+    token_sha256: str  # Whitespace-separated tokens joined by single spaces
+    token_count: int
+
+
+class OutputFile:
+    """An output on disk, read in chunks by the checkers instead of loaded whole."""
+    
+    def __init__(self, path: str):
+        self.path = path
+    
+    def __repr__(self) -> str:
+        return f"OutputFile({self.path!r})"
+
+
+# What the checkers compare: in-memory text or bytes, or a file
+OutputSource = Union[str, bytes, OutputFile]
+
+
+def _chunks(source: OutputSource) -> Iterator[bytes]:
+    """Raw bytes of a source in CHUNK_BYTES pieces (same offsets for every source)."""
+    if isinstance(source, OutputFile):
+        with open(source.path, 'rb') as f:
+            while True:
+                chunk = f.read(CHUNK_BYTES)
+                if not chunk:
+                    return
+                yield chunk
+    else:
+        data = source.encode('utf-8') if isinstance(source, str) else source
+        for start in range(0, len(data), CHUNK_BYTES):
+            yield data[start:start + CHUNK_BYTES]
+
+
+def _text_chunks(source: OutputSource) -> Iterator[str]:
+    """Decoded text of a source, chunk by chunk (invalid UTF-8 becomes U+FFFD)."""
+    return _decode(_chunks(source))
+
+
+def _decode(chunks: Iterable[bytes]) -> Iterator[str]:
+    decoder = codecs.getincrementaldecoder('utf-8')('replace')
+    for chunk in chunks:
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+def _is_blank(texts: Iterator[str]) -> bool:
+    return all(not text.strip() for text in texts)
+
+
+def _clip(token: str) -> str:
+    return repr(token if len(token) <= TOKEN_PREVIEW_CHARS else token[:TOKEN_PREVIEW_CHARS] + "...")
+
+
+class _TokenReader:
+    """
+    Incremental whitespace tokenizer. Text is consumed a chunk at a time and
+    cut after its last whitespace, so every batch holds whole tokens and
+    str.split() semantics are preserved; memory stays within a chunk plus
+    the longest token.
+    """
+    
+    def __init__(self, source: OutputSource, track_lines: bool = False):
+        self._texts: Optional[Iterator[str]] = _text_chunks(source)
+        self._track_lines = track_lines
+        self._carry = ""
+        self._text = ""
+        self._line = 1  # Line number where self._text starts
+        self._consumed = 0  # Tokens in batches before the current one
+        self.batch: List[str] = []
+        self.lines: Optional[np.ndarray] = None  # Line of each batch token (track_lines)
+        self.pos = 0  # Next token in the batch
+    
+    @property
+    def index(self) -> int:
+        """Number of tokens consumed so far."""
+        return self._consumed + self.pos
+    
+    def fill(self) -> bool:
+        """Buffer at least one unconsumed token. False at the end of the output."""
+        while self.pos >= len(self.batch):
+            if self._texts is None:
+                return False
+            
+            text = next(self._texts, None)
+            if text is None:
+                self._texts = None
+                text, self._carry = self._carry, ""
+            else:
+                text = self._carry + text
+                self._carry = ""
+                if not text[-1].isspace():
+                    # The last token may continue in the next chunk
+                    self._carry = text.rsplit(None, 1)[-1]
+                    text = text[:-len(self._carry)]
+            
+            self._consumed += len(self.batch)
+            self._line += self._text.count("\n")
+            self._text = text
+            self.pos = 0
+            if self._track_lines:
+                self._split_lines(text)
+            else:
+                self.batch = text.split()
+        return True
+    
+    def _split_lines(self, text: str) -> None:
+        segments = [segment.split() for segment in text.split("\n")]
+        counts = list(map(len, segments))
+        self.batch = list(chain.from_iterable(segments))
+        self.lines = np.repeat(np.arange(self._line, self._line + len(counts)), counts)
+    
+    def line(self) -> int:
+        """Line number of the next token (only called to report a mismatch)."""
+        for i, match in enumerate(_TOKEN.finditer(self._text)):
+            if i == self.pos:
+                return self._line + self._text.count("\n", 0, match.start())
+        return self._line + self._text.count("\n")
+
+
+def _digest_chunks(chunks: Iterator[bytes], diff: bool = True, tokens: bool = True) -> Tuple[str, str, int]:
+    """
+    Hashes of the byte-normalized output in one pass: the output without
+    trailing whitespace, and its tokens joined by single spaces.
+    """
+    diff_hash = hashlib.sha256()
+    token_hash = hashlib.sha256()
+    token_count = 0
+    pending_space = b""  # Whitespace that only counts if more output follows
+    carry = b""  # Token cut by the chunk boundary
+    
+    for chunk in chunks:
+        if diff:
+            stripped = chunk.rstrip()
+            if stripped:
+                diff_hash.update(pending_space)
+                diff_hash.update(stripped)
+                pending_space = chunk[len(stripped):]
+            else:
+                pending_space += chunk
+        
+        if tokens:
+            data = carry + chunk
+            parts = data.split()
+            carry = parts.pop() if parts and not data[-1:].isspace() else b""
+            if parts:
+                if token_count:
+                    token_hash.update(b" ")
+                token_hash.update(b" ".join(parts))
+                token_count += len(parts)
+    
+    if carry:
+        if token_count:
+            token_hash.update(b" ")
+        token_hash.update(carry)
+        token_count += 1
+    
+    return diff_hash.hexdigest(), token_hash.hexdigest(), token_count
+
+
+class _FloatComparison:
+    """State of a streaming float_eps comparison (see Checker.check_float_eps)."""
+    
+    def __init__(self, epsilon: float, relative_epsilon: float):
+        self.epsilon = epsilon
+        self.relative_epsilon = relative_epsilon
+        self.first_lines: Optional[Tuple[int, int]] = None  # Line of each output's first token
+        self.last_line = -1  # Relative line of the last compared token
+        self.last_line_tokens = 0  # Tokens compared on that line
+    
+    def run(self, exp: _TokenReader, act: _TokenReader) -> Tuple[CheckerResult, str]:
+        while True:
+            has_expected, has_actual = exp.fill(), act.fill()
+            if not has_expected or not has_actual:
+                if has_expected == has_actual:
+                    return CheckerResult.AC, "Accepted"
+                return self._extra_tokens(exp if has_expected else act, 0 if has_expected else 1)
+            
+            if self.first_lines is None:
+                self.first_lines = (int(exp.lines[exp.pos]), int(act.lines[act.pos]))
+            
+            count = min(len(exp.batch) - exp.pos, len(act.batch) - act.pos)
+            window = slice(exp.pos, exp.pos + count), slice(act.pos, act.pos + count)
+            result = self._compare(
+                exp.batch[window[0]], act.batch[window[1]],
+                exp.lines[window[0]] - self.first_lines[0], act.lines[window[1]] - self.first_lines[1]
+            )
+            if result:
+                return result
+            exp.pos += count
+            act.pos += count
+    
+    def _compare(self, exp_tokens: List[str], act_tokens: List[str], exp_lines: np.ndarray, act_lines: np.ndarray):
+        """First mismatch in a window of aligned tokens, or None."""
+        # A token on a different line means some line before it has a different token count
+        line_mismatch = np.flatnonzero(exp_lines != act_lines)
+        first_line_mismatch = line_mismatch[0] if len(line_mismatch) else len(exp_tokens)
+        
+        exp_values, exp_numeric = _parse_floats(exp_tokens)
+        act_values, act_numeric = _parse_floats(act_tokens)
+        numeric = exp_numeric & act_numeric
+        
+        with np.errstate(invalid="ignore", over="ignore"):
+            tolerance = np.full(len(exp_values), self.epsilon)
+            if self.relative_epsilon:
+                finite = np.isfinite(exp_values)
+                tolerance[finite] = np.maximum(tolerance[finite], self.relative_epsilon * np.abs(exp_values[finite]))
+            # NaN differences compare False, as with the scalar float() comparison
+            bad = numeric & (np.abs(exp_values - act_values) > tolerance)
+        
+        # Non-numeric tokens must match exactly
+        for i in np.flatnonzero(~numeric):
+            if exp_tokens[i] != act_tokens[i]:
+                bad[i] = True
+                break
+        value_mismatch = np.flatnonzero(bad)
+        first_value_mismatch = value_mismatch[0] if len(value_mismatch) else len(exp_tokens)
+        
+        if first_line_mismatch < len(exp_tokens) and first_line_mismatch <= first_value_mismatch:
+            line = min(exp_lines[first_line_mismatch], act_lines[first_line_mismatch])
+            return CheckerResult.WA, f"Different number of tokens on line {line + 1}"
+        
+        if first_value_mismatch < len(exp_tokens):
+            i = first_value_mismatch
+            line = int(exp_lines[i])
+            token = int(np.count_nonzero(exp_lines[:i + 1] == line))
+            if line == self.last_line:
+                token += self.last_line_tokens
+            kind = "Value" if numeric[i] else "Token"
+            return CheckerResult.WA, f"{kind} mismatch at line {line + 1}, token {token}"
+        
+        if len(exp_lines):
+            line = int(exp_lines[-1])
+            on_line = int(np.count_nonzero(exp_lines == line))
+            self.last_line_tokens = on_line + (self.last_line_tokens if line == self.last_line else 0)
+            self.last_line = line
+        return None
+    
+    def _extra_tokens(self, longer: _TokenReader, side: int) -> Tuple[CheckerResult, str]:
+        """One output has tokens left after the other ended."""
+        line = int(longer.lines[longer.pos]) - self.first_lines[side] if self.first_lines else 0
+        if line > max(self.last_line, 0):
+            return CheckerResult.WA, "Different number of lines"
+        return CheckerResult.WA, f"Different number of tokens on line {line + 1}"
+
+
+def _parse_floats(tokens: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """Tokens as float64 (parsed like float()) and a mask of the numeric ones."""
+    try:
+        values = np.array(tokens, dtype=np.float64)
+        return values, np.ones(len(tokens), dtype=bool)
+    except ValueError:
+        pass
+    
+    # Some token is not a number: parse one at a time
+    values = np.zeros(len(tokens), dtype=np.float64)
+    numeric = np.zeros(len(tokens), dtype=bool)
+    for i, token in enumerate(tokens):
+        try:
+            values[i] = float(token)
+            numeric[i] = True
+        except ValueError:
+            pass
+    return values, numeric
+
+
 class Checker:
-    """Output checking utilities."""
+    """
+    Output checking utilities. Outputs may be given as str, bytes or an
+    OutputFile; every strategy streams them in chunks and stops at the first
+    mismatch, so checking a large output needs no more memory than a chunk.
+    """
     
     @staticmethod
-    def check_diff(expected: str, actual: str) -> Tuple[CheckerResult, str]:
-        """Exact string comparison (ignoring trailing whitespace)."""
-        expected_clean = expected.rstrip()
-        actual_clean = actual.rstrip()
-        
-        if expected_clean == actual_clean:
-            return CheckerResult.AC, "Accepted"
-        else:
-            return CheckerResult.WA, "Output doesn't match expected"
+    def digest(expected: OutputSource) -> ExpectedDigest:
+        """Normalize an expected output for matches_digest()."""
+        return ExpectedDigest(*_digest_chunks(_chunks(expected)))
     
     @staticmethod
-    def check_token(expected: str, actual: str) -> Tuple[CheckerResult, str]:
-        """Token-based comparison (whitespace-insensitive)."""
-        expected_tokens = expected.split()
-        actual_tokens = actual.split()
+    def matches_digest(checker_type: str, digest: Optional[ExpectedDigest], actual: OutputSource) -> bool:
+        """
+        Fast path: compare a hash of the normalized actual output with the
+        precomputed expected one. True means Accepted; False only means the
+        full checker has to decide (and explain the mismatch).
         
-        if expected_tokens == actual_tokens:
-            return CheckerResult.AC, "Accepted"
-        else:
-            return CheckerResult.WA, "Tokens don't match expected"
+        Byte-level normalization strips ASCII whitespace only, which never
+        occurs inside a UTF-8 sequence, so a match here is always a match
+        for the str-based checkers too.
+        """
+        if digest is None:
+            return False
+        
+        if checker_type == "diff":
+            diff_sha256, _, _ = _digest_chunks(_chunks(actual), tokens=False)
+            return diff_sha256 == digest.diff_sha256
+        elif checker_type == "token":
+            _, token_sha256, token_count = _digest_chunks(_chunks(actual), diff=False)
+            return token_count == digest.token_count and token_sha256 == digest.token_sha256
+        
+        # Float and custom checkers accept outputs that differ from the expected text
+        return False
     
     @staticmethod
-    def check_float_eps(expected: str, actual: str, epsilon: float = 1e-6) -> Tuple[CheckerResult, str]:
-        """Floating-point comparison with epsilon tolerance."""
-        try:
-            expected_lines = expected.strip().split('\n')
-            actual_lines = actual.strip().split('\n')
+    def check_diff(expected: OutputSource, actual: OutputSource) -> Tuple[CheckerResult, str]:
+        """Exact comparison (ignoring trailing whitespace)."""
+        expected_chunks = _chunks(expected)
+        actual_chunks = _chunks(actual)
+        previous = b""  # End of the last (identical) chunk pair
+        line = 1
+        
+        while True:
+            exp = next(expected_chunks, b"")
+            act = next(actual_chunks, b"")
+            if exp == act:
+                if not exp:
+                    return CheckerResult.AC, "Accepted"
+                line += exp.count(b"\n")
+                previous = exp[-3:]
+                continue
             
-            if len(expected_lines) != len(actual_lines):
-                return CheckerResult.WA, "Different number of lines"
+            # Chunks start at the same offsets, so the outputs first differ in this pair
+            lo, hi = 0, min(len(exp), len(act))
+            while lo < hi:
+                mid = (lo + hi + 1) // 2
+                if exp[:mid] == act[:mid]:
+                    lo = mid
+                else:
+                    hi = mid - 1
+            line += exp.count(b"\n", 0, lo)
             
-            for i, (exp_line, act_line) in enumerate(zip(expected_lines, actual_lines)):
-                exp_tokens = exp_line.split()
-                act_tokens = act_line.split()
-                
-                if len(exp_tokens) != len(act_tokens):
-                    return CheckerResult.WA, f"Different number of tokens on line {i+1}"
-                
-                for j, (exp_token, act_token) in enumerate(zip(exp_tokens, act_tokens)):
-                    try:
-                        exp_val = float(exp_token)
-                        act_val = float(act_token)
-                        
-                        if abs(exp_val - act_val) > epsilon:
-                            return CheckerResult.WA, f"Value mismatch at line {i+1}, token {j+1}"
-                    except ValueError:
-                        # Non-numeric tokens must match exactly
-                        if exp_token != act_token:
-                            return CheckerResult.WA, f"Token mismatch at line {i+1}, token {j+1}"
+            # Equal once trailing whitespace is removed iff both remainders are
+            # whitespace; back up to a character boundary before decoding them
+            exp, act, split = previous + exp, previous + act, len(previous) + lo
+            while split > 0 and any(0x80 <= data[split] < 0xC0 for data in (exp, act) if split < len(data)):
+                split -= 1
             
-            return CheckerResult.AC, "Accepted"
+            expected_rest = _decode(chain([exp[split:]], expected_chunks))
+            actual_rest = _decode(chain([act[split:]], actual_chunks))
+            if _is_blank(expected_rest) and _is_blank(actual_rest):
+                return CheckerResult.AC, "Accepted"
+            return CheckerResult.WA, f"Output doesn't match expected at line {line}"
+    
+    @staticmethod
+    def check_token(expected: OutputSource, actual: OutputSource) -> Tuple[CheckerResult, str]:
+        """Token-based comparison (whitespace-insensitive)."""
+        exp = _TokenReader(expected)
+        act = _TokenReader(actual)
+        
+        while True:
+            has_expected, has_actual = exp.fill(), act.fill()
+            if not has_expected or not has_actual:
+                if has_expected == has_actual:
+                    return CheckerResult.AC, "Accepted"
+                if has_actual:
+                    return CheckerResult.WA, (
+                        f"Tokens don't match expected: extra output at token {act.index + 1} (line {act.line()})"
+                    )
+                return CheckerResult.WA, (
+                    f"Tokens don't match expected: output ended after {act.index} tokens, expected more"
+                )
             
+            # Compare the overlap of both batches in one go
+            count = min(len(exp.batch) - exp.pos, len(act.batch) - act.pos)
+            if exp.batch[exp.pos:exp.pos + count] != act.batch[act.pos:act.pos + count]:
+                while exp.batch[exp.pos] == act.batch[act.pos]:
+                    exp.pos += 1
+                    act.pos += 1
+                return CheckerResult.WA, (
+                    f"Tokens don't match expected at token {act.index + 1} (line {act.line()}): "
+                    f"expected {_clip(exp.batch[exp.pos])}, got {_clip(act.batch[act.pos])}"
+                )
+            exp.pos += count
+            act.pos += count
+    
+    @staticmethod
+    def check_float_eps(
+        expected: OutputSource,
+        actual: OutputSource,
+        epsilon: float = 1e-6,
+        relative_epsilon: float = 0.0
+    ) -> Tuple[CheckerResult, str]:
+        """
+        Floating-point comparison: numbers match when they differ by at most
+        max(epsilon, relative_epsilon * |expected|); other tokens must be
+        identical. Outputs must have the same lines (ignoring leading and
+        trailing blank ones) with the same number of tokens each.
+        
+        Tokens are compared in windows parsed into NumPy arrays in bulk, so
+        the per-token cost is in C rather than a float() call each.
+        """
+        try:
+            return _FloatComparison(epsilon, relative_epsilon).run(
+                _TokenReader(expected, track_lines=True),
+                _TokenReader(actual, track_lines=True)
+            )
         except Exception as e:
             return CheckerResult.WA, f"Error checking floats: {str(e)}"
     
     @staticmethod
-    def check_custom(expected: str, actual: str, checker_code: str) -> Tuple[CheckerResult, str]:
-        """Custom checker (placeholder - requires sandboxed execution)."""
-        # TODO: Implement custom checker execution in sandbox
-        return CheckerResult.WA, "Custom checkers not yet implemented"
+    def check_custom(
+        expected: OutputSource,
+        actual: OutputSource,
+        checker,
+        input_data: OutputSource = ""
+    ) -> Tuple[CheckerResult, str]:
+        """Problem-supplied checker, run by a judge.custom_checker.CustomCheckerSession."""
+        if checker is None:
+            return CheckerResult.WA, "Custom checker not available"
+        verdict = checker.check(input_data, expected, actual)
+        return verdict.result, verdict.message
+    
+    @staticmethod
+    def read_output(path: str) -> str:
+        """Load a program's output file, memory-mapping large outputs."""
+        size = os.path.getsize(path)
+        
+        with open(path, 'rb') as f:
+            if size < MMAP_THRESHOLD_BYTES:
+                return f.read().decode('utf-8', errors='replace')
+            
+            # Decode straight from the page cache without an intermediate bytes copy
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                return codecs.decode(mapped, 'utf-8', 'replace')
     
     @classmethod
     def check_output(
         self,
         checker_type: str,
-        expected: str,
-        actual: str,
+        expected: OutputSource,
+        actual: OutputSource,
         **kwargs
     ) -> Tuple[CheckerResult, str]:
         """Main checking function."""
@@ -88,11 +473,19 @@ class Checker:
         elif checker_type == "token":
             return self.check_token(expected, actual)
         elif checker_type == "float_eps":
-            epsilon = kwargs.get("epsilon", 1e-6)
-            return self.check_float_eps(expected, actual, epsilon)
+            return self.check_float_eps(
+                expected,
+                actual,
+                epsilon=kwargs.get("epsilon", 1e-6),
+                relative_epsilon=kwargs.get("relative_epsilon", 0.0)
+            )
         elif checker_type == "custom":
-            checker_code = kwargs.get("checker_code", "")
-            return self.check_custom(expected, actual, checker_code)
+            return self.check_custom(
+                expected,
+                actual,
+                kwargs.get("custom_checker"),
+                input_data=kwargs.get("input_data", "")
+            )
         else:
             # Default to diff
-            return self.check_diff(expected, actual)
\ No newline at end of file
+            return self.check_diff(expected, actual)
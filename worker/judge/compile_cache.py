@@ -0,0 +1,139 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+from typing import Dict, List
+
+import structlog
+from judge import metrics
+
+logger = structlog.get_logger()
+
+
+class CompileCache:
+    """
+    Content-addressed cache of compiled artifacts.
+    Lives on a volume shared by all workers; entries are published with an
+    atomic rename, so concurrent writers of the same key are harmless.
+    """
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Size of the cache as of the last scan plus what this process stored
+        # since; other workers' entries are only counted by the next scan
+        self._total_bytes = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(language: str, image_digest: str, compile_cmd: List[str], source_hash: str) -> str:
+        """Build the cache key for a (language, image, flags, source) tuple."""
+        material = "\0".join([language, image_digest, " ".join(compile_cmd), source_hash])
+        return hashlib.sha256(material.encode()).hexdigest()
+
+    def fetch(self, key: str, work_dir: str, artifacts: List[str]) -> bool:
+        """Copy cached artifacts into work_dir. Returns False on a miss."""
+        entry_dir = self._entry_dir(key)
+
+        try:
+            for name in artifacts:
+                shutil.copy2(os.path.join(entry_dir, name), os.path.join(work_dir, name))
+            # Bump mtime so eviction treats the entry as recently used
+            os.utime(entry_dir)
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            metrics.CACHE_LOOKUPS.labels("compile", "miss").inc()
+            return False
+
+        with self._lock:
+            self.hits += 1
+        metrics.CACHE_LOOKUPS.labels("compile", "hit").inc()
+        return True
+
+    def store(self, key: str, work_dir: str, artifacts: List[str]) -> None:
+        """Publish freshly compiled artifacts under key."""
+        entry_dir = self._entry_dir(key)
+        if os.path.isdir(entry_dir):
+            return
+
+        size = 0
+        try:
+            os.makedirs(os.path.dirname(entry_dir), exist_ok=True)
+            staging_dir = tempfile.mkdtemp(prefix=".staging_", dir=self.root)
+            try:
+                for name in artifacts:
+                    shutil.copy2(os.path.join(work_dir, name), os.path.join(staging_dir, name))
+                    size += os.path.getsize(os.path.join(staging_dir, name))
+                os.rename(staging_dir, entry_dir)
+            except OSError:
+                shutil.rmtree(staging_dir, ignore_errors=True)
+                if os.path.isdir(entry_dir):
+                    # Another worker published the same key first
+                    return
+                raise
+
+        except OSError as e:
+            logger.warning("Failed to store compiled artifacts", key=key, error=str(e))
+            return
+
+        with self._lock:
+            if self._total_bytes is not None:
+                self._total_bytes += size
+                if self._total_bytes <= self.max_bytes:
+                    return
+        # Only scan the cache when it may have grown past its budget
+        self.evict()
+
+    def evict(self) -> None:
+        """Remove least recently used entries until the cache fits in max_bytes."""
+        entries = []
+        total_bytes = 0
+
+        for shard in self._scandir(self.root):
+            if not shard.is_dir() or shard.name.startswith("."):
+                continue
+            for entry in self._scandir(shard.path):
+                try:
+                    size = sum(f.stat().st_size for f in os.scandir(entry.path))
+                    entries.append((entry.stat().st_mtime, size, entry.path))
+                except OSError:
+                    continue
+                total_bytes += size
+
+        entries.sort()
+        for _, size, path in entries:
+            if total_bytes <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total_bytes -= size
+            with self._lock:
+                self.evictions += 1
+            metrics.CACHE_EVICTIONS.labels("compile").inc()
+
+        with self._lock:
+            self._total_bytes = total_bytes
+
+    def stats(self) -> Dict[str, int]:
+        """Counters for this process."""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+    def _entry_dir(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key)
+
+    @staticmethod
+    def _scandir(path: str):
+        try:
+            return list(os.scandir(path))
+        except OSError:
+            return []
+
+
+def source_sha256(source_code: str) -> str:
+    """Hash used to identify a submission's source everywhere in the worker."""
+    return hashlib.sha256(source_code.encode()).hexdigest()
@@ -0,0 +1,172 @@
+import atexit
+import os
+import shutil
+import threading
+import uuid
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+import structlog
+
+logger = structlog.get_logger()
+
+POOL_LABEL = "judgelab.pool"
+
+
+@dataclass
+class PooledContainer:
+    container: Any
+    image: str
+    slot_dir: str  # Host directory bind-mounted at /workspace
+    memory_limit_mb: int
+    uses: int = 0
+
+
+class ContainerPool:
+    """
+    Warm, pre-created sandbox containers per language image.
+    Containers idle on `sleep` and judged programs are started with exec, so a
+    lease skips container create/start/remove. Every container has a private
+    slot directory that is wiped between leases, and it is destroyed after
+    max_uses leases or whenever a lease ends abnormally.
+    """
+
+    _shared: Optional["ContainerPool"] = None
+    _shared_lock = threading.Lock()
+
+    def __init__(
+        self,
+        client,
+        size: int,
+        max_uses: int,
+        slot_root: str,
+        container_config: Callable[..., Dict[str, Any]]
+    ):
+        self.client = client
+        self.size = size
+        self.max_uses = max_uses
+        self.slot_root = slot_root
+        self.container_config = container_config
+        self._idle: Dict[str, List[PooledContainer]] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def shared(cls, client, **kwargs) -> "ContainerPool":
+        """Process-wide pool so containers stay warm across submissions."""
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls(client, **kwargs)
+                atexit.register(cls._shared.close)
+            return cls._shared
+
+    def warm(self, image: str, memory_limit_mb: int) -> None:
+        """Pre-create containers for image until `size` are idle."""
+        while True:
+            with self._lock:
+                if len(self._idle.setdefault(image, [])) >= self.size:
+                    return
+            pooled = self._create(image, memory_limit_mb)
+            with self._lock:
+                self._idle[image].append(pooled)
+
+    def lease(self, image: str, memory_limit_mb: int) -> PooledContainer:
+        """Take an idle container for image, creating one if none is idle."""
+        with self._lock:
+            first_use = image not in self._idle
+            idle = self._idle.setdefault(image, [])
+            pooled = idle.pop() if idle else None
+
+        if pooled is None:
+            if first_use:
+                self.warm(image, memory_limit_mb)
+                return self.lease(image, memory_limit_mb)
+            pooled = self._create(image, memory_limit_mb)
+
+        if pooled.memory_limit_mb != memory_limit_mb:
+            try:
+                pooled.container.update(
+                    mem_limit=f"{memory_limit_mb}m",
+                    memswap_limit=f"{memory_limit_mb}m"
+                )
+            except Exception:
+                # It left the idle list, so nothing else would ever remove it
+                self._destroy(pooled)
+                raise
+            pooled.memory_limit_mb = memory_limit_mb
+
+        pooled.uses += 1
+        return pooled
+
+    def release(self, pooled: PooledContainer, healthy: bool = True) -> None:
+        """Return a container after a run; unhealthy or worn-out ones are destroyed."""
+        if healthy and pooled.uses < self.max_uses:
+            healthy = self._reset(pooled)
+        else:
+            healthy = False
+
+        with self._lock:
+            idle = self._idle.setdefault(pooled.image, [])
+            if healthy and len(idle) < self.size:
+                idle.append(pooled)
+                return
+
+        self._destroy(pooled)
+
+    def close(self) -> None:
+        """Destroy every idle container."""
+        with self._lock:
+            idle = [pooled for containers in self._idle.values() for pooled in containers]
+            self._idle = {}
+
+        for pooled in idle:
+            self._destroy(pooled)
+
+    def _create(self, image: str, memory_limit_mb: int) -> PooledContainer:
+        name = f"judge_pool_{uuid.uuid4().hex[:12]}"
+        slot_dir = os.path.join(self.slot_root, name)
+        os.makedirs(slot_dir)
+        os.chmod(slot_dir, 0o777)  # Sandbox user must be able to write outputs
+
+        config = self.container_config(slot_dir, image, ["sleep", "infinity"], memory_limit_mb, name)
+        config["labels"] = {POOL_LABEL: "1"}
+
+        try:
+            container = self.client.containers.run(detach=True, **config)
+        except Exception:
+            shutil.rmtree(slot_dir, ignore_errors=True)
+            raise
+
+        logger.debug("Created pooled container", image=image, container_name=name)
+        return PooledContainer(
+            container=container,
+            image=image,
+            slot_dir=slot_dir,
+            memory_limit_mb=memory_limit_mb
+        )
+
+    def _reset(self, pooled: PooledContainer) -> bool:
+        """Kill leftover processes and wipe all writable state. Returns False if unusable."""
+        try:
+            for entry in os.scandir(pooled.slot_dir):
+                if entry.is_dir(follow_symlinks=False):
+                    shutil.rmtree(entry.path)
+                else:
+                    os.remove(entry.path)
+
+            # kill -1 signals everything except PID 1 (sleep) and the shell itself
+            exit_code, _ = pooled.container.exec_run(
+                ["sh", "-c", "kill -9 -1; find /tmp -mindepth 1 -delete"],
+                user="nobody:nogroup"
+            )
+            return exit_code == 0
+
+        except Exception as e:
+            logger.warning("Failed to reset pooled container", error=str(e))
+            return False
+
+    def _destroy(self, pooled: PooledContainer) -> None:
+        try:
+            pooled.container.remove(force=True)
+        except Exception as e:
+            logger.warning("Failed to remove pooled container", error=str(e))
+        shutil.rmtree(pooled.slot_dir, ignore_errors=True)
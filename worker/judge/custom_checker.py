@@ -0,0 +1,331 @@
+"""
+Custom checkers: programs supplied with a problem that judge each test.
+
+A checker is compiled once per problem version (CheckerCache) and runs in
+the same sandbox as solutions. It is started once per submission and kept
+running for all of its tests (CustomCheckerSession), answering one request
+per test on its stdin/stdout:
+
+    request:  "<input> <expected> <output>\\n"  names of files in its working directory
+    response: "<verdict>[ <score>[ <message>]]\\n"
+
+verdict is one of ok, wa, pe (presentation error) or fail (the checker
+itself failed, as in testlib). score is in [0, 1] and defaults to 1 for ok
+and 0 otherwise. Output flushed after each response is all a checker needs
+to stay warm; reading requests until end of input lets it exit cleanly.
+
+Interactive problems supply an interactor instead, compiled and cached the
+same way. It runs once per test (ExecutorBackend.run_interactive), talks to
+the solution over its stdin/stdout, reads the test from input.txt and
+answer.txt, and answers with testlib's exit codes: 0 ok, 1 wa, 2 pe, and
+anything else for a failure.
+"""
+
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+import structlog
+from config import settings
+from judge.backend import CompileResult, ExecutionResult, ExecutorBackend, InteractiveResult, SandboxProcess
+from judge.checker import CheckerResult, OutputFile
+
+logger = structlog.get_logger()
+
+RESPONSE_VERDICTS = {
+    "ok": CheckerResult.AC,
+    "wa": CheckerResult.WA,
+    "pe": CheckerResult.PE,
+}
+INTERACTOR_EXIT_CODES = {
+    0: CheckerResult.AC,
+    1: CheckerResult.WA,
+    2: CheckerResult.PE,
+}
+STDERR_TAIL_BYTES = 1024
+
+# A test file handed to the checker: text or a file on disk
+CheckerInput = Union[str, OutputFile]
+
+
+class CheckerError(RuntimeError):
+    """The custom checker could not judge a test (a judge failure, not a verdict)."""
+
+
+class CheckerVerdict(NamedTuple):
+    result: CheckerResult
+    score: float
+    message: str
+
+
+class _CacheEntry:
+    def __init__(self):
+        self.lock = threading.Lock()  # Held while compiling
+        self.compiled: Optional[CompileResult] = None
+        self.cleanup: Optional[Callable[[CompileResult], None]] = None
+        self.users = 0
+
+
+class CheckerCache:
+    """
+    Compiled custom checkers of this worker process, one per (problem,
+    version). Concurrent submissions of a problem wait for a single
+    compilation; least recently used entries not in use are removed
+    beyond max_entries, and older versions as soon as they are unused.
+    """
+
+    _shared: Optional["CheckerCache"] = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.compiles = 0
+        self._entries: "OrderedDict[Tuple[int, int], _CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def shared(cls) -> "CheckerCache":
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls(settings.CUSTOM_CHECKER_CACHE_SIZE)
+            return cls._shared
+
+    @contextmanager
+    def lease(
+        self,
+        problem_id: int,
+        version: int,
+        compile_checker: Callable[[], CompileResult],
+        cleanup: Callable[[CompileResult], None]
+    ) -> Iterator[CompileResult]:
+        """
+        The compiled checker for a problem version, compiling it with
+        compile_checker() on a miss. cleanup(compiled) removes it once evicted.
+        Raises CheckerError if the checker does not compile.
+        """
+        key = (problem_id, version)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = _CacheEntry()
+            self._entries.move_to_end(key)
+            entry.users += 1
+
+        try:
+            with entry.lock:
+                if entry.compiled is None:
+                    compiled = compile_checker()
+                    if not compiled.success:
+                        cleanup(compiled)
+                        raise CheckerError(f"Custom checker failed to compile: {compiled.error}")
+                    entry.compiled, entry.cleanup = compiled, cleanup
+                    with self._lock:
+                        self.compiles += 1
+                    logger.info("Compiled custom checker", problem_id=problem_id, version=version)
+            yield entry.compiled
+        finally:
+            with self._lock:
+                entry.users -= 1
+            self._evict()
+
+    def _evict(self) -> None:
+        with self._lock:
+            latest = {}
+            for problem_id, version in self._entries:
+                latest[problem_id] = max(version, latest.get(problem_id, version))
+
+            unused = [key for key, entry in self._entries.items() if not entry.users]
+            stale = [key for key in unused if key[1] < latest[key[0]]]
+            excess = len(self._entries) - len(stale) - self.max_entries
+            doomed = stale + [key for key in unused if key not in stale][:max(excess, 0)]
+            removed = [self._entries.pop(key) for key in doomed]
+
+        for entry in removed:
+            if entry.compiled is not None:
+                entry.cleanup(entry.compiled)
+
+
+class CustomCheckerSession:
+    """
+    Warm checker processes serving one submission. A process is started
+    the first time a test needs one and no idle process is left, at most
+    max_processes of them (one per test in flight), and is reused for
+    every later test. A process that times out or breaks the protocol is
+    killed and replaced.
+    """
+
+    def __init__(
+        self,
+        executor: ExecutorBackend,
+        compiled: CompileResult,
+        max_processes: int,
+        time_limit_ms: int,
+        memory_limit_mb: int,
+        lifetime_limit_ms: int
+    ):
+        self.executor = executor
+        self.compiled = compiled
+        self.max_processes = max(max_processes, 1)
+        self.time_limit_ms = time_limit_ms  # Wall time for one response
+        self.memory_limit_mb = memory_limit_mb
+        self.lifetime_limit_ms = lifetime_limit_ms  # CPU time of a process over the session
+        self.started = 0
+        self._idle: List[SandboxProcess] = []
+        self._running = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def check(self, input_data: CheckerInput, expected: CheckerInput, actual: CheckerInput) -> CheckerVerdict:
+        """Judge one test. Raises CheckerError if the checker fails."""
+        process = self._acquire()
+        healthy = False
+        names = []
+
+        try:
+            token = uuid.uuid4().hex[:12]
+            for kind, source in (("in", input_data), ("ans", expected), ("out", actual)):
+                name = f"{token}.{kind}"
+                names.append(name)
+                _place(source, os.path.join(process.workspace, name))
+
+            process.write(" ".join(names).encode() + b"\n")
+            line = process.readline(self.time_limit_ms / 1000)
+            if not line:
+                raise CheckerError(f"Custom checker exited without an answer{_stderr_tail(process)}")
+            verdict = _parse_response(line.decode("utf-8", errors="replace"))
+            healthy = True
+            return verdict
+
+        except OSError as e:
+            # Broken pipe, timeout, or the test files could not be staged
+            raise CheckerError(f"Custom checker failed: {e}{_stderr_tail(process)}") from e
+
+        except ValueError as e:
+            raise CheckerError(f"Custom checker failed: {e}") from e
+
+        finally:
+            for name in names:
+                try:
+                    os.remove(os.path.join(process.workspace, name))
+                except OSError:
+                    pass
+            self._release(process, healthy)
+
+    def close(self) -> None:
+        """Stop the idle processes; busy ones stop when their test is done."""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._running -= len(idle)
+            self._cond.notify_all()
+
+        for process in idle:
+            process.close()
+
+    def _acquire(self) -> SandboxProcess:
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise CheckerError("Custom checker session is closed")
+                if self._idle:
+                    return self._idle.pop()
+                if self._running < self.max_processes:
+                    self._running += 1
+                    break
+                self._cond.wait()
+
+        try:
+            process = self.executor.start(self.compiled, self.lifetime_limit_ms, self.memory_limit_mb)
+        except Exception as e:
+            with self._cond:
+                self._running -= 1
+                self._cond.notify()
+            raise CheckerError(f"Custom checker failed to start: {e}") from e
+
+        with self._cond:
+            self.started += 1
+        return process
+
+    def _release(self, process: SandboxProcess, healthy: bool) -> None:
+        with self._cond:
+            if healthy and not self._closed:
+                self._idle.append(process)
+                self._cond.notify()
+                return
+
+        process.close()
+        with self._cond:
+            self._running -= 1
+            self._cond.notify()
+
+
+def interaction_verdict(result: InteractiveResult) -> Tuple[str, float]:
+    """
+    Test verdict and score of an interaction: the solution's resource
+    limits come first, then the interactor's judgement, then the
+    solution's exit status (a crash often makes the interactor fail too).
+    Raises CheckerError when the interactor itself failed.
+    """
+    solution, interactor = result
+    if solution.verdict in ("TLE", "MLE", "OLE"):
+        return solution.verdict, 0.0
+
+    judged = None if interactor.limit_rule else INTERACTOR_EXIT_CODES.get(interactor.exit_code)
+    if judged in (CheckerResult.WA, CheckerResult.PE):
+        return "WA", 0.0
+    if solution.verdict != "OK":
+        return solution.verdict, 0.0
+    if judged is None:
+        raise CheckerError(_interactor_failure(interactor))
+    return "AC", 1.0
+
+
+def _interactor_failure(interactor: ExecutionResult) -> str:
+    reason = f"killed ({interactor.limit_rule})" if interactor.limit_rule else f"exit code {interactor.exit_code}"
+    error = interactor.error.strip()[-STDERR_TAIL_BYTES:]
+    return f"Interactor failed, {reason}" + (f": {error}" if error else "")
+
+
+def _place(source: CheckerInput, path: str) -> None:
+    """Make a test file readable by the checker under path."""
+    if isinstance(source, OutputFile):
+        ExecutorBackend._link_or_copy(source.path, path)
+    else:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(source)
+    os.chmod(path, 0o444)  # Readable by the sandbox user
+
+
+def _parse_response(line: str) -> CheckerVerdict:
+    parts = line.strip().split(None, 2)
+    if not parts:
+        raise ValueError("empty answer")
+
+    word = parts[0].lower()
+    if word == "fail":
+        raise CheckerError(f"Custom checker reported failure: {' '.join(parts[1:])}")
+    if word not in RESPONSE_VERDICTS:
+        raise ValueError(f"unknown verdict {parts[0]!r}")
+
+    result = RESPONSE_VERDICTS[word]
+    score = 1.0 if result == CheckerResult.AC else 0.0
+    if len(parts) > 1:
+        score = float(parts[1])
+        if not 0.0 <= score <= 1.0:
+            raise ValueError(f"score {parts[1]} is outside [0, 1]")
+    message = parts[2] if len(parts) > 2 else ("Accepted" if result == CheckerResult.AC else "Wrong answer")
+    return CheckerVerdict(result, score, message)
+
+
+def _stderr_tail(process: SandboxProcess) -> str:
+    """End of the checker's stderr, to show authors why it failed."""
+    try:
+        with open(os.path.join(process.workspace, "stderr.txt"), "rb") as f:
+            f.seek(max(os.fstat(f.fileno()).st_size - STDERR_TAIL_BYTES, 0))
+            tail = f.read().decode("utf-8", errors="replace").strip()
+    except OSError:
+        return ""
+    return f": {tail}" if tail else ""
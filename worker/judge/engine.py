@@ -0,0 +1,335 @@
+import asyncio
+import atexit
+import concurrent.futures
+import contextvars
+import functools
+import os
+import shutil
+import sys
+import threading
+import time
+from typing import Any, Callable, List, Optional
+
+import structlog
+from config import settings
+from judge import metrics
+
+logger = structlog.get_logger()
+
+
+class AdmissionRejected(RuntimeError):
+    """The host is too busy to take a new submission; it should be judged elsewhere."""
+
+    def __init__(self, reason: str):
+        super().__init__(f"Judge host is busy ({reason})")
+        self.reason = reason
+
+
+class ResourceLimiter:
+    """Budget of one host resource (CPU slots, memory MB), used on the engine loop only."""
+
+    def __init__(self, name: str, capacity: int):
+        self.name = name
+        self.capacity = capacity
+        self.available = capacity
+
+    def fits(self, amount: int) -> bool:
+        return self.available >= amount
+
+    def take(self, amount: int) -> None:
+        self.available -= amount
+
+    def give(self, amount: int) -> None:
+        self.available += amount
+
+
+class _Request:
+    """A call waiting for, or holding, its resources."""
+
+    def __init__(self, memory_mb: int, disk_mb: int, admitted: asyncio.Future, queued_at: float):
+        self.memory_mb = memory_mb
+        self.disk_mb = disk_mb
+        self.admitted = admitted
+        self.queued_at = queued_at
+
+
+class AdmissionScheduler:
+    """
+    Admits calls once a CPU slot, their memory limit and their disk
+    estimate are all free at the same time, so a call never holds one
+    resource while waiting for another. Disk is the free space of
+    JUDGE_WORK_DIR, minus a reserve and what admitted calls may still
+    write; when nothing is running a call is admitted regardless, as
+    only running calls free space.
+
+    Waiting calls are admitted in arrival order, except that later calls
+    that fit go ahead of earlier ones that do not (small runs are not
+    stuck behind a large one), until the oldest has waited aging_sec.
+
+    Calls that may be rejected (the first call of a submission) are
+    refused outright when queue_limit calls are already waiting or the
+    disk is short, so the submission can go back to the broker instead.
+    """
+
+    def __init__(
+        self,
+        cpu_slots: int,
+        memory_budget_mb: int,
+        work_dir: Optional[str] = None,
+        disk_reserve_mb: int = 0,
+        queue_limit: int = 0,
+        aging_sec: float = 5.0
+    ):
+        self.cores = ResourceLimiter("cores", cpu_slots)
+        self.memory = ResourceLimiter("memory_mb", memory_budget_mb)
+        self.work_dir = work_dir
+        self.disk_reserve_mb = disk_reserve_mb
+        self.disk_held_mb = 0
+        self.queue_limit = queue_limit
+        self.aging_sec = aging_sec
+        self.waiting: List[_Request] = []
+        self.running = 0
+
+    async def admit(self, memory_mb: int, disk_mb: int = 0, reject_if_busy: bool = False) -> _Request:
+        """
+        Wait until the call's resources are free and take them; give them
+        back with release(). Raises AdmissionRejected for reject_if_busy
+        calls the host cannot queue.
+        """
+        # A request larger than the whole budget would never be admitted
+        memory_mb = min(memory_mb, self.memory.capacity)
+        if reject_if_busy:
+            if self.queue_limit and len(self.waiting) >= self.queue_limit:
+                self._reject("queue_full")
+            if self.running and self.free_disk_mb() < disk_mb:
+                self._reject("disk")
+
+        loop = asyncio.get_running_loop()
+        request = _Request(memory_mb, disk_mb, loop.create_future(), loop.time())
+        self.waiting.append(request)
+        metrics.ENGINE_WAITING.inc()
+        self._dispatch()
+
+        try:
+            await request.admitted
+        except asyncio.CancelledError:
+            if request in self.waiting:
+                self.waiting.remove(request)
+                metrics.ENGINE_WAITING.dec()
+                self._dispatch()  # Later calls may fit now
+            elif request.admitted.done() and not request.admitted.cancelled():
+                self.release(request)
+            raise
+        return request
+
+    def release(self, request: _Request) -> None:
+        self.cores.give(1)
+        self.memory.give(request.memory_mb)
+        self.disk_held_mb -= request.disk_mb
+        self.running -= 1
+        self._dispatch()
+
+    def free_disk_mb(self) -> int:
+        """Space admitted calls may still use (unbounded without a work_dir)."""
+        if not self.work_dir:
+            return sys.maxsize
+        try:
+            free_mb = shutil.disk_usage(self.work_dir).free // (1024 * 1024)
+        except OSError:
+            return sys.maxsize
+        return free_mb - self.disk_reserve_mb - self.disk_held_mb
+
+    def _dispatch(self) -> None:
+        if not self.waiting:
+            return
+
+        now = asyncio.get_running_loop().time()
+        free_disk_mb = self.free_disk_mb()
+        passed_over = False
+        for request in list(self.waiting):
+            if request.admitted.cancelled():
+                continue  # Removed once its caller resumes
+            fits = (
+                self.cores.fits(1)
+                and self.memory.fits(request.memory_mb)
+                and (free_disk_mb >= request.disk_mb or not self.running)
+            )
+            if not fits:
+                if now - request.queued_at >= self.aging_sec:
+                    break  # Resources freed from now on are kept for it
+                passed_over = True
+                continue
+
+            self.waiting.remove(request)
+            self.cores.take(1)
+            self.memory.take(request.memory_mb)
+            self.disk_held_mb += request.disk_mb
+            free_disk_mb -= request.disk_mb
+            self.running += 1
+            request.admitted.set_result(None)
+
+            waited = now - request.queued_at
+            reason = "backfill" if passed_over else ("waited" if waited else "immediate")
+            metrics.ENGINE_WAITING.dec()
+            metrics.ADMISSIONS.labels("admitted", reason).inc()
+            metrics.ADMISSION_WAIT_SECONDS.observe(waited)
+
+    @staticmethod
+    def _reject(reason: str) -> None:
+        metrics.ADMISSIONS.labels("rejected", reason).inc()
+        raise AdmissionRejected(reason)
+
+
+class EngineJob:
+    """Handle to a call scheduled on the engine."""
+
+    def __init__(self, future: concurrent.futures.Future, settled: threading.Event):
+        self.future = future
+        self.settled = settled  # Set once the call has returned and released its resources
+
+    def result(self, timeout: Optional[float] = None) -> Any:
+        return self.future.result(timeout)
+
+    def cancel(self) -> None:
+        """Drop a queued call; a running call keeps going until the sandbox is killed."""
+        self.future.cancel()
+
+
+class JudgeEngine:
+    """
+    Process-wide asyncio engine that admits sandbox work against host
+    resource budgets: one CPU slot per run plus its memory limit and disk
+    estimate (AdmissionScheduler). The event loop lives in a background
+    thread, so synchronous code (Celery tasks) submits blocking executor
+    calls and gets a job handle back. Admitted calls run on a thread pool
+    sized to the CPU budget; everything waiting for admission is just a
+    coroutine.
+    """
+
+    _shared: Optional["JudgeEngine"] = None
+    _shared_lock = threading.Lock()
+
+    def __init__(
+        self,
+        cpu_slots: int,
+        memory_budget_mb: int,
+        work_dir: Optional[str] = None,
+        disk_reserve_mb: int = 0,
+        queue_limit: int = 0,
+        aging_sec: float = 5.0
+    ):
+        self.loop = asyncio.new_event_loop()
+        self._runners = concurrent.futures.ThreadPoolExecutor(
+            max_workers=cpu_slots,
+            thread_name_prefix="judge-run"
+        )
+        self._thread = threading.Thread(target=self.loop.run_forever, name="judge-engine", daemon=True)
+        self._thread.start()
+
+        self.scheduler = AdmissionScheduler(
+            cpu_slots, memory_budget_mb, work_dir, disk_reserve_mb, queue_limit, aging_sec
+        )
+        self.cores = self.scheduler.cores
+        self.memory = self.scheduler.memory
+
+    @classmethod
+    def shared(cls) -> "JudgeEngine":
+        """Engine for this worker process, sized from settings or the host."""
+        with cls._shared_lock:
+            if cls._shared is None:
+                cpu_slots = settings.JUDGE_CPU_SLOTS or len(os.sched_getaffinity(0))
+                memory_budget_mb = settings.JUDGE_MEMORY_BUDGET_MB or host_memory_mb() * 8 // 10
+                cls._shared = cls(
+                    cpu_slots,
+                    memory_budget_mb,
+                    work_dir=settings.JUDGE_WORK_DIR,
+                    disk_reserve_mb=settings.JUDGE_DISK_RESERVE_MB,
+                    queue_limit=settings.JUDGE_QUEUE_LIMIT,
+                    aging_sec=settings.JUDGE_ADMISSION_AGING_MS / 1000
+                )
+                atexit.register(cls._shared.close)
+                logger.info(
+                    "Judge engine started",
+                    cpu_slots=cpu_slots,
+                    memory_budget_mb=memory_budget_mb,
+                    disk_reserve_mb=settings.JUDGE_DISK_RESERVE_MB,
+                    queue_limit=settings.JUDGE_QUEUE_LIMIT
+                )
+            return cls._shared
+
+    def submit(
+        self,
+        fn: Callable[..., Any],
+        *args,
+        memory_mb: int,
+        disk_mb: int = 0,
+        reject_if_busy: bool = False,
+        **kwargs
+    ) -> EngineJob:
+        """
+        Schedule fn(*args, **kwargs) once a CPU slot, memory_mb and disk_mb
+        are free. With reject_if_busy the job fails with AdmissionRejected
+        instead of queueing when the host is saturated.
+        It runs in a copy of the caller's context, so its metrics phases
+        count towards the caller's submission.
+        """
+        settled = threading.Event()
+        call = functools.partial(contextvars.copy_context().run, fn, *args, **kwargs)
+        future = asyncio.run_coroutine_threadsafe(
+            self._run(call, memory_mb, disk_mb, reject_if_busy, settled, metrics.current_timer()),
+            self.loop
+        )
+        return EngineJob(future, settled)
+
+    def call(
+        self,
+        fn: Callable[..., Any],
+        *args,
+        memory_mb: int,
+        disk_mb: int = 0,
+        reject_if_busy: bool = False,
+        **kwargs
+    ) -> Any:
+        """submit() and wait for the result."""
+        return self.submit(
+            fn, *args, memory_mb=memory_mb, disk_mb=disk_mb, reject_if_busy=reject_if_busy, **kwargs
+        ).result()
+
+    def close(self) -> None:
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(5)
+        self._runners.shutdown(wait=False, cancel_futures=True)
+
+    async def _run(
+        self,
+        call: Callable[[], Any],
+        memory_mb: int,
+        disk_mb: int,
+        reject_if_busy: bool,
+        settled: threading.Event,
+        timer: Optional[metrics.PhaseTimer] = None
+    ) -> Any:
+        queued_at = time.perf_counter()
+        try:
+            request = await self.scheduler.admit(memory_mb, disk_mb, reject_if_busy)
+            try:
+                metrics.record_phase("admission", time.perf_counter() - queued_at, timer)
+                running = self.loop.run_in_executor(self._runners, call)
+                try:
+                    with metrics.ENGINE_RUNNING.track_inprogress():
+                        return await asyncio.shield(running)
+                finally:
+                    if not running.done():
+                        # Cancelled mid-run: the thread still occupies the
+                        # slot until the caller kills the sandbox
+                        await asyncio.wait([running])
+                        if not running.cancelled():
+                            running.exception()  # Nobody awaits it any more
+            finally:
+                self.scheduler.release(request)
+        finally:
+            settled.set()
+
+
+def host_memory_mb() -> int:
+    return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") // (1024 * 1024)
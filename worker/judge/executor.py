@@ -1,168 +1,133 @@
 import os
+import threading
 import time
-import tempfile
 from typing import Dict, Any, List, Optional
-from dataclasses import dataclass
 
 import docker
 import structlog
 from config import settings
+from judge import metrics
+from judge.backend import (  # noqa: F401 (re-exported)
+    COMPILE_TIME_LIMIT_MS,
+    LIMIT_RULE_CPU,
+    LIMIT_RULE_OUTPUT,
+    LIMIT_RULE_WALL,
+    OUTPUT_PREVIEW_BYTES,
+    STDERR_MAX_BYTES,
+    STDIN_FIFO,
+    STDOUT_FIFO,
+    CompileResult,
+    ExecutionResult,
+    ExecutorBackend,
+    SandboxProcess,
+)
+from judge.cgroup import CgroupMonitor
+from judge.container_pool import ContainerPool, PooledContainer
 
 logger = structlog.get_logger()
 
+OOM_KILLED_EXIT_CODE = 137  # 128 + SIGKILL, as the OOM killer leaves it
+_peak_warning = threading.Event()
 
-@dataclass
-class ExecutionResult:
-    verdict: str
-    time_ms: int
-    memory_kb: int
-    output: str
-    error: str
-    exit_code: int
+
+class DockerProcess(SandboxProcess):
+    """A started program exec'd in a pooled container, which is recycled afterwards."""
+    
+    def __init__(
+        self,
+        client,
+        pool: ContainerPool,
+        pooled: PooledContainer,
+        exec_id: str,
+        waiter: threading.Thread,
+        cgroup: Optional[CgroupMonitor],
+        cpu_before_usec: int
+    ):
+        super().__init__(pooled.slot_dir, cgroup, cpu_before_usec)
+        self._client = client
+        self._pool = pool
+        self._pooled = pooled
+        self._exec_id = exec_id
+        self._waiter = waiter
+    
+    def kill(self) -> None:
+        self._pooled.container.kill()
+    
+    def finished(self, timeout: float) -> bool:
+        self._waiter.join(timeout)
+        return not self._waiter.is_alive()
+    
+    def exit_code(self) -> int:
+        try:
+            return self._client.api.exec_inspect(self._exec_id)["ExitCode"]
+        except Exception:
+            # The container was killed along with the exec
+            return OOM_KILLED_EXIT_CODE
+    
+    def _release(self) -> None:
+        # The program may have left processes behind; never reuse the container
+        self._pool.release(self._pooled, healthy=False)
 
 
-class DockerExecutor:
+def _warn_peak_not_reset() -> None:
+    if not _peak_warning.is_set():
+        _peak_warning.set()
+        logger.warning("Kernel cannot reset memory.peak; pooled containers are used for one run only")
+
+
+class DockerExecutor(ExecutorBackend):
     """Secure Docker-based code execution."""
     
     def __init__(self):
+        super().__init__()
         self.client = docker.from_env()
-        
-    def execute(
+        self._image_digests: Dict[str, str] = {}
+        # With SANDBOX_POOL_SIZE=0 every run gets a fresh container that is
+        # destroyed afterwards; otherwise containers are kept warm
+        self.pool = ContainerPool.shared(
+            self.client,
+            size=settings.SANDBOX_POOL_SIZE,
+            max_uses=settings.SANDBOX_POOL_MAX_USES,
+            slot_root=os.path.join(settings.JUDGE_WORK_DIR, "pool"),
+            container_config=self._container_config
+        )
+    
+    def _toolchain_digest(self, lang_config: Dict[str, Any]) -> str:
+        return self._image_digest(lang_config["image"])
+    
+    def _compile_sandboxed(
         self,
-        language: str,
-        source_code: str,
-        input_data: str,
-        time_limit_ms: int,
-        memory_limit_mb: int,
-        output_limit_kb: int
+        work_dir: str,
+        lang_config: Dict[str, Any],
+        memory_limit_mb: int
     ) -> ExecutionResult:
-        """Execute code in a secure Docker container."""
-        
-        # Create temporary directory for this execution
-        with tempfile.TemporaryDirectory(dir=settings.JUDGE_WORK_DIR) as work_dir:
+        return self._run_container(
+            work_dir,
+            lang_config["image"],
+            lang_config["compile_cmd"],
+            time_limit_ms=COMPILE_TIME_LIMIT_MS,
+            memory_limit_mb=memory_limit_mb
+        )
+    
+    def _image_digest(self, image: str) -> str:
+        """Resolve an image tag to its content digest so cache keys change with the image."""
+        if image not in self._image_digests:
             try:
-                # Write source code and input  
-                self._prepare_source(work_dir, language, source_code)
-                input_file = os.path.join(work_dir, "input.txt")
-                with open(input_file, 'w', encoding='utf-8') as f:
-                    f.write(input_data)
-                
-                # Get language configuration
-                lang_config = self._get_language_config(language)
-                
-                # Compile if needed
-                if lang_config.get("compile_cmd"):
-                    compile_result = self._run_container(
-                        work_dir, 
-                        lang_config["image"],
-                        lang_config["compile_cmd"],
-                        time_limit_ms=10000,  # 10s compile timeout
-                        memory_limit_mb=memory_limit_mb * 2,  # More memory for compilation
-                    )
-                    
-                    if compile_result.exit_code != 0:
-                        return ExecutionResult(
-                            verdict="CE",
-                            time_ms=0,
-                            memory_kb=0,
-                            output="",
-                            error=compile_result.error,
-                            exit_code=compile_result.exit_code
-                        )
-                
-                # Execute
-                result = self._run_container(
-                    work_dir,
-                    lang_config["image"], 
-                    lang_config["run_cmd"],
-                    input_file="input.txt",
-                    time_limit_ms=time_limit_ms,
-                    memory_limit_mb=memory_limit_mb,
-                    output_limit_kb=output_limit_kb
-                )
-                
-                # Determine verdict
-                if result.exit_code != 0:
-                    verdict = "RE"
-                elif result.time_ms > time_limit_ms:
-                    verdict = "TLE" 
-                elif result.memory_kb > memory_limit_mb * 1024:
-                    verdict = "MLE"
-                elif len(result.output.encode('utf-8')) > output_limit_kb * 1024:
-                    verdict = "OLE"
-                else:
-                    verdict = "OK"  # Will be checked against expected output
-                
-                return ExecutionResult(
-                    verdict=verdict,
-                    time_ms=result.time_ms,
-                    memory_kb=result.memory_kb,
-                    output=result.output,
-                    error=result.error,
-                    exit_code=result.exit_code
-                )
-                
+                self._image_digests[image] = self.client.images.get(image).id
             except Exception as e:
-                logger.error("Execution failed", error=str(e))
-                return ExecutionResult(
-                    verdict="RE",
-                    time_ms=0,
-                    memory_kb=0,
-                    output="",
-                    error=f"System error: {str(e)}",
-                    exit_code=1
-                )
-    
-    def _prepare_source(self, work_dir: str, language: str, source_code: str) -> str:
-        """Prepare source code file."""
-        extensions = {
-            "python": "py",
-            "cpp": "cpp", 
-            "java": "java",
-            "javascript": "js",
-            "go": "go",
-            "rust": "rs"
-        }
-        
-        ext = extensions.get(language, "txt")
-        source_file = os.path.join(work_dir, f"solution.{ext}")
-        
-        with open(source_file, 'w', encoding='utf-8') as f:
-            f.write(source_code)
-            
-        return source_file
-    
-    def _get_language_config(self, language: str) -> Dict[str, Any]:
-        """Get configuration for a programming language."""
-        configs = {
-            "python": {
-                "image": settings.PYTHON_IMAGE,
-                "compile_cmd": None,
-                "run_cmd": ["python3", "solution.py"]
-            },
-            "cpp": {
-                "image": settings.CPP_IMAGE,
-                "compile_cmd": ["g++", "-std=c++17", "-O2", "-o", "solution", "solution.cpp"],
-                "run_cmd": ["./solution"]
-            },
-            # TODO: Add more languages
-        }
-        
-        return configs.get(language, configs["python"])
+                logger.warning("Failed to resolve image digest", image=image, error=str(e))
+                return image
+        return self._image_digests[image]
     
-    def _run_container(
+    def _container_config(
         self,
         work_dir: str,
         image: str,
         command: List[str],
-        input_file: Optional[str] = None,
-        time_limit_ms: int = 2000,
-        memory_limit_mb: int = 256,
-        output_limit_kb: int = 64
-    ) -> ExecutionResult:
-        """Run a command in a secure Docker container."""
-        
-        container_name = f"judge_{int(time.time() * 1000000)}"
+        memory_limit_mb: int,
+        name: str
+    ) -> Dict[str, Any]:
+        """Locked-down container settings shared by one-off and pooled sandboxes."""
         
         # Security configuration
         security_opt = []
@@ -171,7 +136,7 @@ class DockerExecutor:
         if settings.ENABLE_APPARMOR:
             security_opt.append("apparmor:unconfined")  # TODO: Use custom AppArmor profile
             
-        container_config = {
+        return {
             "image": image,
             "command": command,
             "working_dir": "/workspace",
@@ -186,71 +151,64 @@ class DockerExecutor:
             "read_only": True,
             "tmpfs": {"/tmp": "size=100m,noexec"},
             "pids_limit": 100,
-            "remove": True,
-            "name": container_name,
+            "name": name,
             "user": "nobody:nogroup",
         }
+    
+    def _run_container(
+        self,
+        work_dir: str,
+        image: str,
+        command: List[str],
+        time_limit_ms: int = 2000,
+        memory_limit_mb: int = 256,
+        output_limit_kb: int = 64
+    ) -> ExecutionResult:
+        """Run a one-off command (e.g. compilation) in a secure Docker container."""
+        
+        container_name = f"judge_{int(time.time() * 1000000)}"
+        container_config = self._container_config(work_dir, image, command, memory_limit_mb, container_name)
+        container_config["remove"] = True
+        container = None
         
         try:
             start_time = time.time()
             
             # Start container
-            container = self.client.containers.run(
-                detach=True,
-                stdin_open=bool(input_file),
-                **container_config
-            )
-            
-            # Send input if provided
-            if input_file:
-                input_path = os.path.join(work_dir, input_file)
-                if os.path.exists(input_path):
-                    with open(input_path, 'rb') as f:
-                        input_data = f.read()
-                        container.stdin.write(input_data)
-                        container.stdin.close()
+            with metrics.phase("container_create"):
+                container = self.client.containers.run(
+                    detach=True,
+                    **container_config
+                )
+            self._track_run(work_dir, container)
             
             # Wait for completion with timeout
             timeout_sec = (time_limit_ms + 1000) / 1000  # Add 1s buffer
-            try:
-                result = container.wait(timeout=timeout_sec)
-                exit_code = result["StatusCode"]
-            except Exception:
-                # Timeout or other error - kill container
-                container.kill()
-                exit_code = 124  # Timeout exit code
+            with metrics.phase("container_wait"):
+                try:
+                    result = container.wait(timeout=timeout_sec)
+                    exit_code = result["StatusCode"]
+                except Exception:
+                    # Timeout or other error - kill container
+                    container.kill()
+                    exit_code = 124  # Timeout exit code
             
             end_time = time.time()
             execution_time_ms = int((end_time - start_time) * 1000)
             
-            # Get output and stats
-            try:
-                output = container.logs(stdout=True, stderr=False).decode('utf-8', errors='replace')
-                error = container.logs(stdout=False, stderr=True).decode('utf-8', errors='replace')
-                
-                # Truncate output if too long
-                max_output_bytes = output_limit_kb * 1024
-                if len(output.encode('utf-8')) > max_output_bytes:
-                    output = output.encode('utf-8')[:max_output_bytes].decode('utf-8', errors='replace')
-                    output += "\n[Output truncated]"
-                    
-            except Exception as e:
-                output = ""
-                error = f"Failed to get container output: {str(e)}"
-            
-            # Get memory usage (approximate)
-            memory_kb = 0
-            try:
-                stats = container.stats(stream=False)
-                memory_usage = stats["memory_stats"].get("usage", 0)
-                memory_kb = int(memory_usage / 1024)
-            except Exception:
-                pass
+            # Get output
+            with metrics.phase("log_fetch"):
+                try:
+                    output = self._decode_output(container.logs(stdout=True, stderr=False), output_limit_kb)
+                    error = container.logs(stdout=False, stderr=True).decode('utf-8', errors='replace')
+                except Exception as e:
+                    output = ""
+                    error = f"Failed to get container output: {str(e)}"
             
             return ExecutionResult(
                 verdict="OK" if exit_code == 0 else "RE",
                 time_ms=execution_time_ms,
-                memory_kb=memory_kb,
+                memory_kb=0,
                 output=output,
                 error=error,
                 exit_code=exit_code
@@ -264,18 +222,240 @@ class DockerExecutor:
                 memory_kb=0,
                 output="",
                 error=f"Container error: {str(e)}",
-                exit_code=1
+                exit_code=1,
+                system_error=True
             )
             
         finally:
+            if container is not None:
+                self._untrack_run(work_dir, container)
+            
             # Cleanup container if it still exists
-            try:
-                container = self.client.containers.get(container_name)
-                if container:
-                    container.remove(force=True)
-                    logger.debug("Cleaned up container", container_name=container_name)
-            except docker.errors.NotFound:
-                # Container already removed
-                pass
-            except Exception as e:
-                logger.warning("Failed to cleanup container", container_name=container_name, error=str(e))
\ No newline at end of file
+            with metrics.phase("container_remove"):
+                try:
+                    container = self.client.containers.get(container_name)
+                    if container:
+                        container.remove(force=True)
+                        logger.debug("Cleaned up container", container_name=container_name)
+                except docker.errors.NotFound:
+                    # Container already removed
+                    pass
+                except Exception as e:
+                    logger.warning("Failed to cleanup container", container_name=container_name, error=str(e))
+    
+    def _run_sandboxed(
+        self,
+        work_dir: str,
+        lang_config: Dict[str, Any],
+        input_path: str,
+        output_path: str,
+        time_limit_ms: int,
+        memory_limit_mb: int,
+        output_limit_kb: int
+    ) -> ExecutionResult:
+        """
+        Run the compiled solution via exec in a sandbox container leased from
+        the pool. Time is the cgroup's user+sys CPU time and memory its peak
+        usage, both read while the container is still alive.
+        
+        Stdin is redirected from the bind-mounted input file and stdout/stderr
+        go to files in the slot (capped with RLIMIT_FSIZE), so test I/O never
+        passes through the Docker daemon. Stdout is moved to output_path
+        before the slot is wiped.
+        """
+        
+        with metrics.phase("sandbox_lease"):
+            pooled = self.pool.lease(lang_config["image"], memory_limit_mb)
+        healthy = True
+        cgroup = None
+        
+        try:
+            self._track_run(work_dir, pooled.container)
+            
+            # Stage artifacts and input into the container's private slot
+            for name in lang_config["artifacts"]:
+                self._link_or_copy(os.path.join(work_dir, name), os.path.join(pooled.slot_dir, name))
+            self._link_or_copy(input_path, os.path.join(pooled.slot_dir, "input.txt"))
+            
+            # One 512-byte block over the limit, so exceeding it is observable
+            fsize_blocks = output_limit_kb * 2 + 1
+            command = [
+                "sh", "-c",
+                f'ulimit -f {fsize_blocks}; exec "$@" < input.txt > stdout.txt 2> stderr.txt',
+                "sh"
+            ] + lang_config["run_cmd"]
+            
+            cgroup = CgroupMonitor.for_container(pooled.container.id)
+            cpu_before_usec = 0
+            if cgroup:
+                cgroup.reset_peak()
+                cpu_before_usec = cgroup.cpu_usec()
+            else:
+                logger.warning("Container cgroup not found, falling back to wall time", container_id=pooled.container.id)
+            
+            start_time = time.time()
+            with metrics.phase("exec"):
+                exit_code, limit_rule = self._exec(
+                    pooled,
+                    command,
+                    time_limit_ms,
+                    cgroup=cgroup,
+                    cpu_before_usec=cpu_before_usec,
+                    output_limit_bytes=output_limit_kb * 1024
+                )
+            wall_time_ms = int((time.time() - start_time) * 1000)
+            
+            if limit_rule:
+                healthy = False
+            
+            with metrics.phase("stats_fetch"):
+                if cgroup:
+                    time_ms = (cgroup.cpu_usec() - cpu_before_usec) // 1000
+                    memory_kb = cgroup.memory_peak_bytes() // 1024
+                else:
+                    time_ms = wall_time_ms
+                    memory_kb = 0
+            
+            if cgroup and not cgroup.peak_is_per_run:
+                # Kernels before 6.12 cannot reset memory.peak: the next run
+                # would report this run's peak as its own
+                _warn_peak_not_reset()
+                healthy = False
+            if exit_code == OOM_KILLED_EXIT_CODE or memory_kb >= memory_limit_mb * 1024:
+                # Killed by (or at) the memory limit: the container's peak and
+                # state are not trustworthy for another submission
+                healthy = False
+            
+            with metrics.phase("log_fetch"):
+                stdout_path = os.path.join(pooled.slot_dir, "stdout.txt")
+                if os.path.exists(stdout_path):
+                    os.replace(stdout_path, output_path)
+                else:
+                    open(output_path, "wb").close()
+                output = self._read_text(output_path, OUTPUT_PREVIEW_BYTES)
+                error = self._read_text(os.path.join(pooled.slot_dir, "stderr.txt"), STDERR_MAX_BYTES)
+            
+            return ExecutionResult(
+                verdict="OK" if exit_code == 0 else "RE",
+                time_ms=time_ms,
+                memory_kb=memory_kb,
+                output=output,
+                error=error,
+                exit_code=exit_code,
+                wall_time_ms=wall_time_ms,
+                limit_rule=limit_rule,
+                output_path=output_path,
+                output_bytes=os.path.getsize(output_path)
+            )
+            
+        except Exception:
+            healthy = False
+            raise
+            
+        finally:
+            if cgroup:
+                cgroup.close()
+            self._untrack_run(work_dir, pooled.container)
+            if work_dir in self._cancelled:
+                healthy = False
+            self.pool.release(pooled, healthy=healthy)
+    
+    def _start_sandboxed(
+        self,
+        work_dir: str,
+        lang_config: Dict[str, Any],
+        time_limit_ms: int,
+        memory_limit_mb: int,
+        files: Optional[Dict[str, str]] = None,
+        stdout_first: bool = False
+    ) -> SandboxProcess:
+        """Exec the program in a leased container, talking over FIFOs in its slot."""
+        
+        pooled = self.pool.lease(lang_config["image"], memory_limit_mb)
+        
+        try:
+            for name in lang_config["artifacts"]:
+                self._link_or_copy(os.path.join(work_dir, name), os.path.join(pooled.slot_dir, name))
+            self._stage_files(pooled.slot_dir, files)
+            
+            cgroup = CgroupMonitor.for_container(pooled.container.id)
+            cpu_before_usec = 0
+            if cgroup:
+                cgroup.reset_peak()
+                cpu_before_usec = cgroup.cpu_usec()
+            
+            # The shell opens redirections left to right
+            redirects = [f"< {STDIN_FIFO}", f"> {STDOUT_FIFO}"]
+            if stdout_first:
+                redirects.reverse()
+            command = [
+                "sh", "-c",
+                f'ulimit -t {time_limit_ms // 1000 + 2}; exec "$@" {" ".join(redirects)} 2> stderr.txt',
+                "sh"
+            ] + lang_config["run_cmd"]
+            api = self.client.api
+            exec_id = api.exec_create(
+                pooled.container.id,
+                command,
+                workdir="/workspace",
+                user="nobody:nogroup"
+            )["Id"]
+            waiter = threading.Thread(target=api.exec_start, args=(exec_id,), daemon=True)
+            waiter.start()
+        except BaseException:
+            self.pool.release(pooled, healthy=False)
+            raise
+        
+        return DockerProcess(self.client, self.pool, pooled, exec_id, waiter, cgroup, cpu_before_usec)
+    
+    def _exec(
+        self,
+        pooled: PooledContainer,
+        command: List[str],
+        time_limit_ms: int,
+        cgroup: Optional[CgroupMonitor] = None,
+        cpu_before_usec: int = 0,
+        output_limit_bytes: Optional[int] = None
+    ):
+        """
+        Exec command in a sandbox container under the watchdog (see
+        ExecutorBackend._watch). Returns (exit_code, limit_rule) where
+        limit_rule names the rule that fired, if any.
+        """
+        
+        api = self.client.api
+        exec_id = api.exec_create(
+            pooled.container.id,
+            command,
+            workdir="/workspace",
+            user="nobody:nogroup"
+        )["Id"]
+        
+        def consume():
+            # Program I/O goes to files; this only waits for the exec to end
+            api.exec_start(exec_id)
+        
+        reader = threading.Thread(target=consume, daemon=True)
+        reader.start()
+        
+        def finished(timeout: float) -> bool:
+            reader.join(timeout)
+            return not reader.is_alive()
+        
+        # Killing the container closes the exec stream; the container is recycled
+        limit_rule = self._watch(
+            finished,
+            pooled.container.kill,
+            os.path.join(pooled.slot_dir, "stdout.txt"),
+            time_limit_ms,
+            cgroup=cgroup,
+            cpu_before_usec=cpu_before_usec,
+            output_limit_bytes=output_limit_bytes
+        )
+        
+        if limit_rule:
+            exit_code = 124  # Timeout exit code
+        else:
+            exit_code = api.exec_inspect(exec_id)["ExitCode"]
+        
+        return exit_code, limit_rule
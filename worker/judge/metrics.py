@@ -0,0 +1,206 @@
+"""
+Prometheus metrics of the judge pipeline, served by each worker process on
+METRICS_PORT.
+
+Every phase of judging a submission is timed into a PhaseTimer bound to the
+context that judges it. The judge engine runs sandbox calls in the context
+that submitted them, so phases timed deep inside an executor (container
+create, log fetch, ...) are attributed to their submission too. When the
+submission is done, all of its phases are observed with its language,
+problem and verdict as labels.
+"""
+
+import contextvars
+import functools
+import math
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Iterator, List, Optional, Tuple
+
+import redis
+import structlog
+
+try:
+    import prometheus_client
+except ImportError:  # Metrics are disabled without prometheus-client
+    prometheus_client = None
+
+logger = structlog.get_logger()
+
+PHASE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+UNKNOWN = "unknown"
+REJECTED = "rejected"  # Verdict of an attempt handed back to the broker unjudged
+
+
+class _NoopMetric:
+    """Stands in for every metric when prometheus-client is not installed."""
+
+    def labels(self, *args, **kwargs) -> "_NoopMetric":
+        return self
+
+    def observe(self, value: float) -> None:
+        pass
+
+    def inc(self, amount: float = 1) -> None:
+        pass
+
+    def dec(self, amount: float = 1) -> None:
+        pass
+
+    def set_function(self, fn) -> None:
+        pass
+
+    def track_inprogress(self):
+        return nullcontext()
+
+
+def _metric(kind: str, name: str, documentation: str, labelnames: Tuple[str, ...] = (), **kwargs):
+    if prometheus_client is None:
+        return _NoopMetric()
+    return getattr(prometheus_client, kind)(name, documentation, labelnames, **kwargs)
+
+
+PHASE_SECONDS = _metric(
+    "Histogram",
+    "judgelab_judge_phase_seconds",
+    "Time spent in each phase of judging a submission",
+    ("phase", "language", "problem", "verdict"),
+    buckets=PHASE_BUCKETS
+)
+SUBMISSIONS = _metric(
+    "Counter",
+    "judgelab_submissions_judged_total",
+    "Submissions judged by this worker",
+    ("language", "problem", "verdict")
+)
+SUBMISSIONS_REJECTED = _metric(
+    "Counter",
+    "judgelab_submissions_rejected_total",
+    "Judging attempts requeued because this worker was too busy",
+    ("language", "problem")
+)
+SUBMISSIONS_IN_FLIGHT = _metric("Gauge", "judgelab_submissions_in_flight", "Submissions being judged")
+ENGINE_WAITING = _metric("Gauge", "judgelab_engine_waiting", "Sandbox calls waiting for a CPU slot, memory and disk")
+ENGINE_RUNNING = _metric("Gauge", "judgelab_engine_running", "Sandbox calls running")
+ADMISSIONS = _metric(
+    "Counter",
+    "judgelab_engine_admissions_total",
+    "Admission decisions on sandbox calls (reason: immediate, waited, backfill, queue_full, disk)",
+    ("decision", "reason")
+)
+ADMISSION_WAIT_SECONDS = _metric(
+    "Histogram",
+    "judgelab_engine_admission_wait_seconds",
+    "Time sandbox calls waited for a CPU slot, memory and disk",
+    buckets=PHASE_BUCKETS
+)
+CACHE_LOOKUPS = _metric(
+    "Counter",
+    "judgelab_cache_lookups_total",
+    "Lookups in the worker's on-disk caches (cache: compile, testdata, verdict; result: hit, miss)",
+    ("cache", "result")
+)
+CACHE_EVICTIONS = _metric("Counter", "judgelab_cache_evictions_total", "Entries evicted from on-disk caches", ("cache",))
+TESTDATA_BYTES_SAVED = _metric(
+    "Counter",
+    "judgelab_testdata_cache_bytes_saved_total",
+    "Test data bytes served from the local cache instead of the test data store"
+)
+QUEUE_DEPTH = _metric("Gauge", "judgelab_queue_depth", "Submissions waiting in the broker queue")
+
+_current: contextvars.ContextVar[Optional["PhaseTimer"]] = contextvars.ContextVar("judge_phase_timer", default=None)
+
+
+class PhaseTimer:
+    """
+    Phase durations of one submission. Phases are kept until end(), so
+    they can all be labelled with the verdict; language and problem are
+    filled in once the submission is loaded.
+    """
+
+    def __init__(self):
+        self.language = UNKNOWN
+        self.problem = UNKNOWN
+        self.verdict = "error"  # Unless judging completes
+        self.phases: List[Tuple[str, float]] = []
+        self._started = time.perf_counter()
+        self._lock = threading.Lock()
+        self._token = None
+
+    @classmethod
+    def begin(cls) -> "PhaseTimer":
+        """Start timing a submission judged in the current context."""
+        timer = cls()
+        timer._token = _current.set(timer)
+        SUBMISSIONS_IN_FLIGHT.inc()
+        return timer
+
+    def record(self, phase: str, seconds: float) -> None:
+        with self._lock:
+            self.phases.append((phase, seconds))
+
+    def end(self) -> None:
+        """Observe every phase, and the whole submission as "total"."""
+        self.record("total", time.perf_counter() - self._started)
+        if self._token is not None:
+            _current.reset(self._token)
+            self._token = None
+        SUBMISSIONS_IN_FLIGHT.dec()
+
+        with self._lock:
+            phases, self.phases = self.phases, []
+        for phase, seconds in phases:
+            PHASE_SECONDS.labels(phase, self.language, self.problem, self.verdict).observe(seconds)
+        if self.verdict == REJECTED:
+            # The submission is counted once, by the attempt that judges it
+            SUBMISSIONS_REJECTED.labels(self.language, self.problem).inc()
+        else:
+            SUBMISSIONS.labels(self.language, self.problem, self.verdict).inc()
+
+
+def current_timer() -> Optional[PhaseTimer]:
+    """Timer of the submission judged in this context, if any."""
+    return _current.get()
+
+
+def record_phase(phase: str, seconds: float, timer: Optional[PhaseTimer] = None) -> None:
+    """Add a phase measured elsewhere to the submission judged in this context."""
+    timer = timer or _current.get()
+    if timer is not None:
+        timer.record(phase, seconds)
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    """Time a block as a phase of the submission judged in this context."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_phase(name, time.perf_counter() - started)
+
+
+def start_server(port: int, redis_url: str, queue: str = "celery") -> bool:
+    """Serve /metrics on port. Returns False when metrics are unavailable."""
+    if prometheus_client is None:
+        logger.warning("prometheus-client is not installed, worker metrics are disabled")
+        return False
+
+    QUEUE_DEPTH.set_function(functools.partial(_queue_depth, redis_url, queue))
+    prometheus_client.start_http_server(port)
+    logger.info("Serving worker metrics", port=port)
+    return True
+
+
+@functools.lru_cache(maxsize=None)
+def _redis_client(redis_url: str):
+    return redis.Redis.from_url(redis_url, socket_timeout=1)
+
+
+def _queue_depth(redis_url: str, queue: str) -> float:
+    """Length of the Celery queue in the Redis broker, read on each scrape."""
+    try:
+        return float(_redis_client(redis_url).llen(queue))
+    except Exception:
+        return math.nan
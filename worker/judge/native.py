@@ -0,0 +1,453 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+import structlog
+from config import settings
+from judge import sandbox_init
+from judge.backend import (
+    COMPILE_TIME_LIMIT_MS,
+    OUTPUT_PREVIEW_BYTES,
+    STDERR_MAX_BYTES,
+    STDIN_FIFO,
+    STDOUT_FIFO,
+    ExecutionResult,
+    ExecutorBackend,
+    SandboxProcess,
+)
+from judge.cgroup import CgroupMonitor
+
+logger = structlog.get_logger()
+
+REQUIRED_CONTROLLERS = ("cpu", "memory", "pids")
+
+# Identity of the exported image, written next to the rootfs by export-rootfs.sh
+ROOTFS_ID_FILE = ".judgelab-image"
+
+SANDBOX_UID = 65534  # nobody, inside the user namespace
+SANDBOX_PIDS_LIMIT = 100
+SANDBOX_ENV = {
+    "PATH": "/usr/local/sbin:/usr/local/bin:/usr/sbin:/usr/bin:/sbin:/bin",
+    "HOME": "/tmp",
+    "LANG": "C.UTF-8",
+}
+
+
+class NativeSandbox:
+    """One running sandbox: its init process and cgroup leaf."""
+
+    def __init__(self, process: subprocess.Popen, cgroup_dir: str):
+        self.process = process
+        self.cgroup_dir = cgroup_dir
+
+    def kill(self) -> None:
+        """Kill every process in the sandbox."""
+        try:
+            # cgroup.kill (Linux 5.14+) also reaches processes that left the init's session
+            with open(os.path.join(self.cgroup_dir, "cgroup.kill"), "w") as f:
+                f.write("1")
+        except OSError:
+            self.process.kill()
+
+    def finished(self, timeout: float) -> bool:
+        try:
+            self.process.wait(timeout)
+            return True
+        except subprocess.TimeoutExpired:
+            return False
+
+
+class NativeProcess(SandboxProcess):
+    """A started program in a native sandbox, in its own slot of the workspace."""
+
+    def __init__(self, executor: "NativeExecutor", sandbox: NativeSandbox, slot_dir: str):
+        super().__init__(slot_dir, CgroupMonitor(sandbox.cgroup_dir, sandbox.cgroup_dir, unified=True))
+        self._executor = executor
+        self._sandbox = sandbox
+
+    def kill(self) -> None:
+        self._sandbox.kill()
+
+    def finished(self, timeout: float) -> bool:
+        return self._sandbox.finished(timeout)
+
+    def exit_code(self) -> int:
+        return self._sandbox.process.returncode
+
+    def _release(self) -> None:
+        self._executor._close(self._sandbox)
+        shutil.rmtree(self.workspace, ignore_errors=True)
+
+
+class NativeExecutor(ExecutorBackend):
+    """
+    Runs solutions directly on the host, skipping the Docker daemon.
+    Each run gets fresh user/pid/mount/net namespaces, a cgroup v2 leaf with
+    CPU/memory/pids limits and rlimits, and sees a read-only rootfs exported
+    from the judge image (NATIVE_ROOTFS_DIR/<language>) with the workspace
+    bind-mounted at /workspace. Needs root (to map the sandbox user to
+    NATIVE_SUBID_BASE) and a delegated cgroup v2 subtree at NATIVE_CGROUP_ROOT.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.cgroup_root = settings.NATIVE_CGROUP_ROOT
+        self._check_host()
+
+    def _check_host(self) -> None:
+        if os.geteuid() != 0:
+            raise RuntimeError("Native executor must run as root")
+
+        os.makedirs(self.cgroup_root, exist_ok=True)
+        try:
+            with open(os.path.join(self.cgroup_root, "cgroup.controllers")) as f:
+                available = f.read().split()
+        except OSError:
+            raise RuntimeError(f"{self.cgroup_root} is not a cgroup v2 directory")
+
+        missing = [name for name in REQUIRED_CONTROLLERS if name not in available]
+        if missing:
+            raise RuntimeError(f"cgroup controllers not delegated to {self.cgroup_root}: {missing}")
+
+        # Enable the controllers for the per-run leaves
+        with open(os.path.join(self.cgroup_root, "cgroup.subtree_control"), "w") as f:
+            f.write(" ".join(f"+{name}" for name in REQUIRED_CONTROLLERS))
+
+    def _rootfs(self, lang_config: Dict[str, Any]) -> str:
+        return os.path.join(settings.NATIVE_ROOTFS_DIR, lang_config["rootfs"])
+
+    def _toolchain_digest(self, lang_config: Dict[str, Any]) -> str:
+        rootfs = self._rootfs(lang_config)
+        try:
+            with open(os.path.join(rootfs, ROOTFS_ID_FILE)) as f:
+                return f.read().strip()
+        except OSError:
+            return rootfs
+
+    def _compile_sandboxed(
+        self,
+        work_dir: str,
+        lang_config: Dict[str, Any],
+        memory_limit_mb: int
+    ) -> ExecutionResult:
+        # Compiler output goes to a private directory so it never shadows artifacts
+        log_dir = tempfile.mkdtemp(prefix="compile_", dir=work_dir)
+        os.chmod(log_dir, 0o777)
+        name = os.path.basename(log_dir)
+
+        try:
+            exit_code, limit_rule, time_ms, _ = self._spawn(
+                work_dir,
+                self._rootfs(lang_config),
+                lang_config["compile_cmd"],
+                stdin=None,
+                stdout=f"{name}/stdout.txt",
+                stderr=f"{name}/stderr.txt",
+                time_limit_ms=COMPILE_TIME_LIMIT_MS,
+                memory_limit_mb=memory_limit_mb,
+                output_limit_kb=1024
+            )
+            error = self._read_text(os.path.join(log_dir, "stderr.txt"), STDERR_MAX_BYTES)
+            if limit_rule:
+                error += "\nCompilation time limit exceeded"
+
+            return ExecutionResult(
+                verdict="OK" if exit_code == 0 else "RE",
+                time_ms=time_ms,
+                memory_kb=0,
+                output="",
+                error=error,
+                exit_code=exit_code,
+                limit_rule=limit_rule
+            )
+        finally:
+            shutil.rmtree(log_dir, ignore_errors=True)
+
+    def _run_sandboxed(
+        self,
+        work_dir: str,
+        lang_config: Dict[str, Any],
+        input_path: str,
+        output_path: str,
+        time_limit_ms: int,
+        memory_limit_mb: int,
+        output_limit_kb: int
+    ) -> ExecutionResult:
+        """
+        Run the compiled solution in a private slot directory inside the
+        workspace, mounted as the sandbox's /workspace. Stdout is moved to
+        output_path before the slot is removed.
+        """
+
+        slot_dir = tempfile.mkdtemp(prefix="slot_", dir=work_dir)
+        os.chmod(slot_dir, 0o777)  # Sandbox user must be able to write outputs
+
+        try:
+            for name in lang_config["artifacts"]:
+                self._link_or_copy(os.path.join(work_dir, name), os.path.join(slot_dir, name))
+            self._link_or_copy(input_path, os.path.join(slot_dir, "input.txt"))
+
+            start_time = time.time()
+            exit_code, limit_rule, time_ms, memory_kb = self._spawn(
+                slot_dir,
+                self._rootfs(lang_config),
+                lang_config["run_cmd"],
+                stdin="input.txt",
+                stdout="stdout.txt",
+                stderr="stderr.txt",
+                time_limit_ms=time_limit_ms,
+                memory_limit_mb=memory_limit_mb,
+                output_limit_kb=output_limit_kb,
+                track_dir=work_dir
+            )
+            wall_time_ms = int((time.time() - start_time) * 1000)
+
+            stdout_path = os.path.join(slot_dir, "stdout.txt")
+            if os.path.exists(stdout_path):
+                os.replace(stdout_path, output_path)
+            else:
+                open(output_path, "wb").close()
+
+            return ExecutionResult(
+                verdict="OK" if exit_code == 0 else "RE",
+                time_ms=time_ms,
+                memory_kb=memory_kb,
+                output=self._read_text(output_path, OUTPUT_PREVIEW_BYTES),
+                error=self._read_text(os.path.join(slot_dir, "stderr.txt"), STDERR_MAX_BYTES),
+                exit_code=exit_code,
+                wall_time_ms=wall_time_ms,
+                limit_rule=limit_rule,
+                output_path=output_path,
+                output_bytes=os.path.getsize(output_path)
+            )
+
+        finally:
+            shutil.rmtree(slot_dir, ignore_errors=True)
+
+    def _start_sandboxed(
+        self,
+        work_dir: str,
+        lang_config: Dict[str, Any],
+        time_limit_ms: int,
+        memory_limit_mb: int,
+        files: Optional[Dict[str, str]] = None,
+        stdout_first: bool = False
+    ) -> SandboxProcess:
+        slot_dir = tempfile.mkdtemp(prefix="slot_", dir=work_dir)
+        os.chmod(slot_dir, 0o777)
+
+        try:
+            for name in lang_config["artifacts"]:
+                self._link_or_copy(os.path.join(work_dir, name), os.path.join(slot_dir, name))
+            self._stage_files(slot_dir, files)
+
+            sandbox = self._launch(
+                slot_dir,
+                self._rootfs(lang_config),
+                lang_config["run_cmd"],
+                stdin=STDIN_FIFO,
+                stdout=STDOUT_FIFO,
+                stderr="stderr.txt",
+                time_limit_ms=time_limit_ms,
+                memory_limit_mb=memory_limit_mb,
+                output_limit_kb=STDERR_MAX_BYTES // 1024,
+                stdout_first=stdout_first
+            )
+        except BaseException:
+            shutil.rmtree(slot_dir, ignore_errors=True)
+            raise
+
+        return NativeProcess(self, sandbox, slot_dir)
+
+    def _spawn(
+        self,
+        workspace: str,
+        rootfs: str,
+        command: List[str],
+        stdin: Optional[str],
+        stdout: str,
+        stderr: str,
+        time_limit_ms: int,
+        memory_limit_mb: int,
+        output_limit_kb: int,
+        track_dir: Optional[str] = None
+    ):
+        """
+        Run command in a new sandbox with workspace at /workspace and wait
+        for it under the watchdog. stdin/stdout/stderr are paths relative to
+        the workspace. Returns (exit_code, limit_rule, time_ms, memory_kb).
+        """
+
+        sandbox = self._launch(
+            workspace, rootfs, command, stdin, stdout, stderr,
+            time_limit_ms=time_limit_ms,
+            memory_limit_mb=memory_limit_mb,
+            output_limit_kb=output_limit_kb
+        )
+        cgroup = CgroupMonitor(sandbox.cgroup_dir, sandbox.cgroup_dir, unified=True)
+
+        try:
+            if track_dir:
+                self._track_run(track_dir, sandbox)
+
+            limit_rule = self._watch(
+                sandbox.finished,
+                sandbox.kill,
+                os.path.join(workspace, stdout),
+                time_limit_ms,
+                cgroup=cgroup,
+                output_limit_bytes=output_limit_kb * 1024
+            )
+            if limit_rule is None:
+                sandbox.process.wait()
+
+            init_error = sandbox.process.stderr.read().decode("utf-8", errors="replace").strip()
+            if init_error and sandbox.process.returncode != 0:
+                # Written before stdio was redirected, so the program never ran
+                raise RuntimeError(init_error)
+
+            exit_code = 124 if limit_rule else sandbox.process.returncode
+            return (
+                exit_code,
+                limit_rule,
+                cgroup.cpu_usec() // 1000,
+                cgroup.memory_peak_bytes() // 1024
+            )
+
+        finally:
+            if track_dir:
+                self._untrack_run(track_dir, sandbox)
+            self._close(sandbox)
+
+    def _launch(
+        self,
+        workspace: str,
+        rootfs: str,
+        command: List[str],
+        stdin: Optional[str],
+        stdout: str,
+        stderr: str,
+        time_limit_ms: int,
+        memory_limit_mb: int,
+        output_limit_kb: int,
+        stdout_first: bool = False
+    ) -> NativeSandbox:
+        """
+        Start command in a new sandbox and return once the sandbox user is
+        mapped and the program is on its way. Release it with _close().
+        """
+
+        cgroup_dir = self._create_cgroup(memory_limit_mb)
+        ready_read, ready_write = os.pipe()
+        sync_read, sync_write = os.pipe()
+        sandbox = None
+
+        try:
+            spec = {
+                "rootfs": rootfs,
+                "workspace": workspace,
+                "command": command,
+                "stdin": stdin,
+                "stdout": stdout,
+                "stderr": stderr,
+                "stdout_first": stdout_first,
+                "uid": SANDBOX_UID,
+                "gid": SANDBOX_UID,
+                "env": SANDBOX_ENV,
+                "cgroup_procs": os.path.join(cgroup_dir, "cgroup.procs"),
+                "ready_fd": ready_write,
+                "sync_fd": sync_read,
+                "rlimits": {
+                    # One 512-byte block over the limit, so exceeding it is observable
+                    "RLIMIT_FSIZE": (output_limit_kb * 2 + 1) * 512,
+                    # Backstop for the watchdog's CPU rule
+                    "RLIMIT_CPU": time_limit_ms // 1000 + 2,
+                    "RLIMIT_CORE": 0,
+                    "RLIMIT_NOFILE": 64,
+                    "RLIMIT_STACK": memory_limit_mb * 1024 * 1024,
+                },
+            }
+
+            process = subprocess.Popen(
+                [sys.executable, "-I", sandbox_init.__file__, json.dumps(spec)],
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                pass_fds=(ready_write, sync_read),
+                env={}
+            )
+            sandbox = NativeSandbox(process, cgroup_dir)
+            for fd in (ready_write, sync_read):
+                os.close(fd)
+            ready_write = sync_read = None
+
+            # Once the init has unshared, map sandbox uid/gid 0..65535 to an
+            # unprivileged host range (only a privileged parent can do that)
+            if os.read(ready_read, 1):
+                id_map = f"0 {settings.NATIVE_SUBID_BASE} 65536\n"
+                for name in ("uid_map", "gid_map"):
+                    with open(f"/proc/{process.pid}/{name}", "w") as f:
+                        f.write(id_map)
+                os.write(sync_write, b"1")
+            os.close(sync_write)
+            sync_write = None
+            return sandbox
+
+        except BaseException:
+            if sandbox:
+                self._close(sandbox)
+            else:
+                self._remove_cgroup(cgroup_dir)
+            raise
+
+        finally:
+            for fd in (ready_read, ready_write, sync_read, sync_write):
+                if fd is not None:
+                    os.close(fd)
+
+    def _close(self, sandbox: NativeSandbox) -> None:
+        """Kill whatever is left of a sandbox and remove its cgroup."""
+        if sandbox.process.poll() is None:
+            sandbox.kill()
+            sandbox.process.wait()
+        sandbox.process.stderr.close()
+        self._remove_cgroup(sandbox.cgroup_dir)
+
+    def _create_cgroup(self, memory_limit_mb: int) -> str:
+        path = os.path.join(self.cgroup_root, f"run_{uuid.uuid4().hex[:12]}")
+        os.mkdir(path)
+
+        limits = {
+            "memory.max": str(memory_limit_mb * 1024 * 1024),
+            "memory.swap.max": "0",
+            "pids.max": str(SANDBOX_PIDS_LIMIT),
+            "cpu.max": "100000 100000",  # 100% of one CPU
+        }
+        for name, value in limits.items():
+            try:
+                with open(os.path.join(path, name), "w") as f:
+                    f.write(value)
+            except FileNotFoundError:
+                # memory.swap.max is absent without swap accounting
+                if name != "memory.swap.max":
+                    self._remove_cgroup(path)
+                    raise
+        return path
+
+    def _remove_cgroup(self, path: str) -> None:
+        # A killed cgroup empties asynchronously
+        for _ in range(50):
+            try:
+                os.rmdir(path)
+                return
+            except FileNotFoundError:
+                return
+            except OSError:
+                time.sleep(0.01)
+        logger.warning("Failed to remove sandbox cgroup", path=path)
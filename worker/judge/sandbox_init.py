@@ -0,0 +1,175 @@
+"""
+In-sandbox init for the native backend, executed as a script (stdlib only).
+
+NativeExecutor starts this file as root. It joins the run's cgroup, moves
+into fresh user/pid/mount/net/ipc/uts namespaces, and waits until the
+parent has written the uid/gid maps. Then it forks the sandbox's PID 1,
+which assembles the
+filesystem (read-only rootfs, writable /workspace, private /tmp), applies
+rlimits, redirects stdio, drops to the unprivileged user and execs the
+program. This process reports the program's exit status as its own.
+"""
+
+import ctypes
+import json
+import os
+import resource
+import sys
+
+CLONE_NEWNS = 0x00020000
+CLONE_NEWUTS = 0x04000000
+CLONE_NEWIPC = 0x08000000
+CLONE_NEWUSER = 0x10000000
+CLONE_NEWPID = 0x20000000
+CLONE_NEWNET = 0x40000000
+SANDBOX_NAMESPACES = CLONE_NEWUSER | CLONE_NEWNS | CLONE_NEWPID | CLONE_NEWNET | CLONE_NEWIPC | CLONE_NEWUTS
+
+MS_RDONLY = 0x1
+MS_NOSUID = 0x2
+MS_NODEV = 0x4
+MS_NOEXEC = 0x8
+MS_REMOUNT = 0x20
+MS_BIND = 0x1000
+MS_REC = 0x4000
+MS_PRIVATE = 0x40000
+
+PR_SET_NO_NEW_PRIVS = 38
+
+# Exit status when the sandbox could not be set up (the program never ran)
+SETUP_FAILED_EXIT = 125
+
+DEVICES = ("null", "zero", "random", "urandom")
+
+# libc symbols of this process; ctypes.util.find_library would fork, and the
+# first fork after unshare(CLONE_NEWPID) must be the sandbox's PID 1
+_libc = ctypes.CDLL(None, use_errno=True)
+
+
+def _check(result: int, what: str) -> None:
+    if result != 0:
+        errno = ctypes.get_errno()
+        raise OSError(errno, f"{what}: {os.strerror(errno)}")
+
+
+def unshare(flags: int) -> None:
+    if hasattr(os, "unshare"):  # Python 3.12+
+        os.unshare(flags)
+    else:
+        _check(_libc.unshare(flags), "unshare")
+
+
+def mount(source, target: str, fstype=None, flags: int = 0, data=None) -> None:
+    _check(
+        _libc.mount(
+            source.encode() if source else None,
+            target.encode(),
+            fstype.encode() if fstype else None,
+            ctypes.c_ulong(flags),
+            data.encode() if data else None
+        ),
+        f"mount {target}"
+    )
+
+
+def bind(source: str, target: str, flags: int) -> None:
+    """
+    Bind mount, then remount to apply flags (bind ignores them on creation).
+    Recursive, since a user namespace may not detach mounts below source.
+    """
+    mount(source, target, None, MS_BIND | MS_REC)
+    mount(None, target, None, MS_BIND | MS_REMOUNT | flags)
+
+
+def _build_root(spec: dict) -> None:
+    root = spec["rootfs"]
+
+    # Keep every mount below private to this namespace
+    mount(None, "/", None, MS_REC | MS_PRIVATE)
+
+    bind(root, root, MS_RDONLY | MS_NOSUID | MS_NODEV)
+    bind(spec["workspace"], os.path.join(root, "workspace"), MS_NOSUID | MS_NODEV)
+    mount("tmpfs", os.path.join(root, "tmp"), "tmpfs", MS_NOSUID | MS_NODEV | MS_NOEXEC, "size=100m,mode=1777")
+
+    for name in DEVICES:
+        target = os.path.join(root, "dev", name)
+        if os.path.exists(target):
+            bind(os.path.join("/dev", name), target, MS_NOSUID | MS_NOEXEC)
+
+    try:
+        mount("proc", os.path.join(root, "proc"), "proc", MS_NOSUID | MS_NODEV | MS_NOEXEC)
+    except OSError:
+        # Not permitted when the host's /proc is partly masked (e.g. inside a container)
+        pass
+
+    os.chroot(root)
+    os.chdir("/workspace")
+
+
+def _redirect(spec: dict) -> None:
+    # Opening a FIFO blocks until its other end is opened, so the order is
+    # part of the protocol when stdin and stdout are FIFOs
+    streams = [(0, spec.get("stdin")), (1, spec["stdout"]), (2, spec["stderr"])]
+    if spec.get("stdout_first"):
+        streams[0], streams[1] = streams[1], streams[0]
+
+    for target, name in streams:
+        if not name:
+            continue
+        if target == 0:
+            fd = os.open(name, os.O_RDONLY)
+        else:
+            # O_TRUNC is ignored for FIFOs
+            fd = os.open(name, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        os.dup2(fd, target)
+        os.close(fd)
+
+
+def _sandbox_main(spec: dict) -> None:
+    """PID 1 of the sandbox: set everything up and exec the program."""
+    _build_root(spec)
+    _redirect(spec)
+
+    for name, limit in spec["rlimits"].items():
+        resource.setrlimit(getattr(resource, name), (limit, limit))
+
+    # Leaving uid 0 clears every capability held in the user namespace
+    os.setgroups([])
+    os.setgid(spec["gid"])
+    os.setuid(spec["uid"])
+    _check(_libc.prctl(PR_SET_NO_NEW_PRIVS, 1, 0, 0, 0), "prctl")
+
+    command = spec["command"]
+    os.execvpe(command[0], command, spec["env"])
+
+
+def main() -> None:
+    spec = json.loads(sys.argv[1])
+
+    with open(spec["cgroup_procs"], "w") as f:
+        f.write("0")
+    unshare(SANDBOX_NAMESPACES)
+
+    # The parent writes our uid/gid maps, then unblocks us
+    os.write(spec["ready_fd"], b"1")
+    os.close(spec["ready_fd"])
+    released = os.read(spec["sync_fd"], 1)
+    os.close(spec["sync_fd"])
+    if not released:
+        sys.exit(SETUP_FAILED_EXIT)
+
+    pid = os.fork()
+    if pid == 0:
+        try:
+            _sandbox_main(spec)
+        except BaseException as e:
+            os.write(2, f"Sandbox setup failed: {e}\n".encode())
+        os._exit(SETUP_FAILED_EXIT)
+
+    _, status = os.waitpid(pid, 0)
+    if os.WIFSIGNALED(status):
+        sys.exit(128 + os.WTERMSIG(status))
+    sys.exit(os.WEXITSTATUS(status))
+
+
+if __name__ == "__main__":
+    main()
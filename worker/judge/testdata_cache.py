@@ -0,0 +1,244 @@
+import atexit
+import json
+import os
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+import structlog
+from config import settings
+from judge import metrics
+from judge.checker import Checker, ExpectedDigest, OutputFile
+from judge.testdata_store import TestDataStore
+
+logger = structlog.get_logger()
+
+MANIFEST = "manifest.json"
+
+# (testcase id, input sha256, expected output sha256)
+TestDataRow = Tuple[int, str, str]
+
+
+class TestDataEntry:
+    """Input and expected output files of one cached problem version."""
+
+    def __init__(self, path: str, total_bytes: int, expected: Optional[Dict[str, list]] = None):
+        self.path = path
+        self.total_bytes = total_bytes
+        self._expected = expected or {}
+
+    def input_path(self, testcase_id: int) -> str:
+        return os.path.join(self.path, f"{testcase_id}.in")
+
+    def output_path(self, testcase_id: int) -> str:
+        return os.path.join(self.path, f"{testcase_id}.out")
+
+    def expected_digest(self, testcase_id: int) -> Optional[ExpectedDigest]:
+        """Normalized expected output, computed when the entry was filled."""
+        digest = self._expected.get(str(testcase_id))
+        return ExpectedDigest(*digest) if digest else None
+
+
+class TestDataCache:
+    """
+    Worker-local on-disk cache of test data, keyed by problem id and
+    Problem.version, so tests leave the test data store once per version
+    instead of once per submission. Lives next to the sandbox workspaces
+    (same filesystem), so inputs are hard-linked into sandboxes rather than
+    copied. Filling a new version drops the older ones of that problem, and
+    least recently used versions are evicted past max_bytes unless a
+    submission is judging against them.
+    """
+
+    _shared: Optional["TestDataCache"] = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, root: str, max_bytes: int, store: TestDataStore):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.store = store
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes_saved = 0  # Test data served from disk instead of the store
+        self._lock = threading.Lock()
+        self._fill_locks: Dict[str, threading.Lock] = {}
+        self._pinned: Dict[str, int] = {}
+
+    @classmethod
+    def shared(cls) -> "TestDataCache":
+        """Process-wide cache so counters and pins cover every submission."""
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls(
+                    settings.TESTDATA_CACHE_DIR,
+                    settings.TESTDATA_CACHE_MAX_MB * 1024 * 1024,
+                    TestDataStore.shared()
+                )
+                atexit.register(lambda: logger.info("Test data cache stats", **cls._shared.stats()))
+            return cls._shared
+
+    @contextmanager
+    def entry(
+        self,
+        problem_id: int,
+        version: int,
+        load: Callable[[], Iterable[TestDataRow]]
+    ) -> Iterator[TestDataEntry]:
+        """
+        Yield the cached test data of a problem version, filling it from
+        load() on a miss. The entry is protected from eviction until exit.
+        """
+        key = self._key(problem_id, version)
+        with self._lock:
+            fill_lock = self._fill_locks.setdefault(key, threading.Lock())
+            self._pinned[key] = self._pinned.get(key, 0) + 1
+
+        try:
+            # One fill per version; concurrent submissions wait for it
+            with fill_lock:
+                entry = self.get(problem_id, version)
+                if entry is None:
+                    entry = self.fill(problem_id, version, load())
+            yield entry
+
+        finally:
+            with self._lock:
+                self._pinned[key] -= 1
+                if not self._pinned[key]:
+                    del self._pinned[key]
+                    self._fill_locks.pop(key, None)
+
+    def get(self, problem_id: int, version: int) -> Optional[TestDataEntry]:
+        """Look up a complete entry. Returns None on a miss."""
+        path = os.path.join(self.root, self._key(problem_id, version))
+
+        try:
+            with open(os.path.join(path, MANIFEST)) as f:
+                manifest = json.load(f)
+            total_bytes = manifest["total_bytes"]
+            # Bump mtime so eviction treats the entry as recently used
+            os.utime(path)
+        except (OSError, ValueError, KeyError):
+            with self._lock:
+                self.misses += 1
+            metrics.CACHE_LOOKUPS.labels("testdata", "miss").inc()
+            return None
+
+        with self._lock:
+            self.hits += 1
+            self.bytes_saved += total_bytes
+        metrics.CACHE_LOOKUPS.labels("testdata", "hit").inc()
+        metrics.TESTDATA_BYTES_SAVED.inc(total_bytes)
+        return TestDataEntry(path, total_bytes, manifest.get("expected"))
+
+    def fill(self, problem_id: int, version: int, rows: Iterable[TestDataRow]) -> TestDataEntry:
+        """Write a problem version's test data and publish it atomically."""
+        key = self._key(problem_id, version)
+        path = os.path.join(self.root, key)
+        problem_dir = os.path.dirname(path)
+        os.makedirs(problem_dir, exist_ok=True)
+
+        staging_dir = tempfile.mkdtemp(prefix=".staging_", dir=self.root)
+        os.chmod(staging_dir, 0o755)
+        total_bytes = 0
+        expected = {}
+
+        try:
+            for testcase_id, input_sha256, output_sha256 in rows:
+                for suffix, sha256 in (("in", input_sha256), ("out", output_sha256)):
+                    file_path = os.path.join(staging_dir, f"{testcase_id}.{suffix}")
+                    total_bytes += self.store.copy_to(sha256, file_path)
+                    # Inputs are hard-linked into sandboxes, which must not modify them
+                    os.chmod(file_path, 0o444)
+
+                # Checkers compare against this instead of re-normalizing per submission
+                expected_path = os.path.join(staging_dir, f"{testcase_id}.out")
+                expected[str(testcase_id)] = list(Checker.digest(OutputFile(expected_path)))
+
+            with open(os.path.join(staging_dir, MANIFEST), "w") as f:
+                json.dump({
+                    "problem_id": problem_id,
+                    "version": version,
+                    "total_bytes": total_bytes,
+                    "expected": expected
+                }, f)
+
+            shutil.rmtree(path, ignore_errors=True)
+            os.rename(staging_dir, path)
+
+        except BaseException:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            raise
+
+        logger.info("Cached test data", problem_id=problem_id, version=version, total_bytes=total_bytes)
+        entry = TestDataEntry(path, total_bytes, expected)
+
+        # Older versions of this problem can never be hit again
+        for name in os.listdir(problem_dir):
+            if name != os.path.basename(path) and not self._is_pinned(os.path.join(str(problem_id), name)):
+                shutil.rmtree(os.path.join(problem_dir, name), ignore_errors=True)
+
+        self.evict()
+        return entry
+
+    def evict(self) -> None:
+        """Remove least recently used versions until the cache fits in max_bytes."""
+        entries = []
+        total_bytes = 0
+
+        for problem in self._scandir(self.root):
+            if not problem.is_dir() or problem.name.startswith("."):
+                continue
+            for version in self._scandir(problem.path):
+                try:
+                    with open(os.path.join(version.path, MANIFEST)) as f:
+                        size = json.load(f)["total_bytes"]
+                    entries.append((version.stat().st_mtime, size, f"{problem.name}/{version.name}"))
+                except (OSError, ValueError, KeyError):
+                    continue
+                total_bytes += size
+
+        if total_bytes <= self.max_bytes:
+            return
+
+        entries.sort()
+        for _, size, key in entries:
+            if total_bytes <= self.max_bytes:
+                break
+            if self._is_pinned(key):
+                continue
+            shutil.rmtree(os.path.join(self.root, key), ignore_errors=True)
+            total_bytes -= size
+            with self._lock:
+                self.evictions += 1
+            metrics.CACHE_EVICTIONS.labels("testdata").inc()
+
+    def stats(self) -> Dict[str, float]:
+        """Counters for this process."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "bytes_saved": self.bytes_saved,
+            }
+
+    def _is_pinned(self, key: str) -> bool:
+        with self._lock:
+            return key in self._pinned
+
+    @staticmethod
+    def _key(problem_id: int, version: int) -> str:
+        return f"{problem_id}/v{version}"
+
+    @staticmethod
+    def _scandir(path: str):
+        try:
+            return list(os.scandir(path))
+        except OSError:
+            return []
@@ -0,0 +1,143 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from typing import Any, Dict, Optional
+
+import structlog
+from config import settings
+from judge import metrics
+
+logger = structlog.get_logger()
+
+
+class VerdictCache:
+    """
+    Judged results of earlier submissions, so a byte-identical source
+    resubmitted against an unchanged problem is not compiled and run again.
+    Lives on a volume shared by all workers, one directory per problem
+    version ("<problem id>/v<version>/<key>.json"). Problem.version changes
+    whenever tests, limits or the checker change, so results of older
+    versions are never hit and are removed as soon as a newer version
+    stores one. Entries are published with an atomic rename.
+    """
+
+    _shared: Optional["VerdictCache"] = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, root: str, max_entries_per_version: int):
+        self.root = root
+        self.max_entries_per_version = max_entries_per_version
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def shared(cls) -> "VerdictCache":
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls(settings.VERDICT_CACHE_DIR, settings.VERDICT_CACHE_MAX_PER_VERSION)
+            return cls._shared
+
+    @staticmethod
+    def make_key(language: str, toolchain_digest: str, source_hash: str, judge_config: Dict[str, Any]) -> str:
+        """
+        Build the key of a (language, image, source) judged under
+        judge_config: the effective limits and checker settings, which can
+        change with worker defaults even when the problem version does not.
+        """
+        material = "\0".join([language, toolchain_digest, source_hash, json.dumps(judge_config, sort_keys=True)])
+        return hashlib.sha256(material.encode()).hexdigest()
+
+    def fetch(self, problem_id: int, version: int, key: str) -> Optional[Dict[str, Any]]:
+        """The stored result, or None on a miss."""
+        path = self._entry_path(problem_id, version, key)
+
+        try:
+            with open(path) as f:
+                result = json.load(f)
+            # Bump mtime so eviction treats the entry as recently used
+            os.utime(path)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            metrics.CACHE_LOOKUPS.labels("verdict", "miss").inc()
+            return None
+
+        with self._lock:
+            self.hits += 1
+        metrics.CACHE_LOOKUPS.labels("verdict", "hit").inc()
+        return result
+
+    def store(self, problem_id: int, version: int, key: str, result: Dict[str, Any]) -> None:
+        """Publish a judged result; failures only cost a later cache miss."""
+        path = self._entry_path(problem_id, version, key)
+        version_dir = os.path.dirname(path)
+
+        try:
+            os.makedirs(version_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(prefix=".tmp_", dir=version_dir)
+            try:
+                with os.fdopen(fd, "w") as f:
+                    json.dump(result, f)
+                os.replace(tmp_path, path)
+            except BaseException:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+                raise
+        except OSError as e:
+            logger.warning("Failed to store judged result", problem_id=problem_id, version=version, error=str(e))
+            return
+
+        self.invalidate(problem_id, keep_version=version)
+        self.evict(problem_id, version)
+
+    def invalidate(self, problem_id: int, keep_version: Optional[int] = None) -> None:
+        """Drop the stored results of a problem, except those of keep_version."""
+        problem_dir = os.path.join(self.root, str(problem_id))
+        for entry in self._scandir(problem_dir):
+            if entry.name != f"v{keep_version}":
+                shutil.rmtree(entry.path, ignore_errors=True)
+
+    def evict(self, problem_id: int, version: int) -> None:
+        """Remove least recently used results of a version beyond max_entries_per_version."""
+        entries = []
+        for entry in self._scandir(os.path.join(self.root, str(problem_id), f"v{version}")):
+            if entry.name.startswith("."):
+                continue
+            try:
+                entries.append((entry.stat().st_mtime, entry.path))
+            except OSError:
+                continue
+
+        entries.sort()
+        for _, path in entries[:max(len(entries) - self.max_entries_per_version, 0)]:
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            with self._lock:
+                self.evictions += 1
+            metrics.CACHE_EVICTIONS.labels("verdict").inc()
+
+    def stats(self) -> Dict[str, int]:
+        """Counters for this process."""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+    def _entry_path(self, problem_id: int, version: int, key: str) -> str:
+        if len(key) != 64 or any(c not in "0123456789abcdef" for c in key):
+            raise ValueError(f"Not a verdict cache key: {key!r}")
+        return os.path.join(self.root, str(problem_id), f"v{version}", f"{key}.json")
+
+    @staticmethod
+    def _scandir(path: str):
+        try:
+            return list(os.scandir(path))
+        except OSError:
+            return []
@@ -1,8 +1,11 @@
 import os
 import sys
 from celery import Celery
+from celery.signals import worker_init
 from dotenv import load_dotenv
-from tasks import judge_submission
+from config import settings
+from judge import metrics
+from tasks.judge_submission import judge_submission
 
 # Load environment variables
 load_dotenv()
@@ -22,13 +25,26 @@ app.conf.update(
     result_serializer='json',
     timezone='UTC',
     enable_utc=True,
+    # Submissions share the process-wide judge engine, which bounds the
+    # sandbox runs by host CPU and memory; worker threads mostly wait on it
+    worker_pool='threads',
+    worker_concurrency=8,
     worker_max_tasks_per_child=50,
     task_acks_late=True,
     worker_prefetch_multiplier=1,
 )
 
-# Register tasks
-app.task(judge_submission.judge_submission)
+# Register tasks; submissions rejected by a busy judge host are retried until
+# one admits them
+app.task(judge_submission, max_retries=None)
+
+
+@worker_init.connect
+def start_metrics_server(**kwargs):
+    """Serve Prometheus metrics for the whole worker (all task threads share one process)."""
+    if settings.METRICS_PORT:
+        metrics.start_server(settings.METRICS_PORT, settings.REDIS_URL)
+
 
 if __name__ == '__main__':
     app.start()
\ No newline at end of file
@@ -3,7 +3,7 @@ Minimal model definitions for the worker.
 These should be kept in sync with the main API models.
 """
 
-from sqlalchemy import Column, Integer, String, Text, DateTime, JSON, Enum, ForeignKey
+from sqlalchemy import BigInteger, Column, Float, Integer, String, Text, DateTime, JSON, Enum, ForeignKey
 from sqlalchemy.ext.declarative import declarative_base
 from enum import Enum as PyEnum
 
@@ -36,6 +36,7 @@ class CheckerType(PyEnum):
     TOKEN = "token"
     FLOAT_EPS = "float_eps"
     CUSTOM = "custom"
+    INTERACTIVE = "interactive"
 
 
 class Submission(Base):
@@ -56,6 +57,9 @@ class Submission(Base):
     compile_log = Column(Text, nullable=True)
     first_failed_test = Column(Integer, nullable=True)
     test_results = Column(JSON, nullable=True)
+    score = Column(Float, nullable=True)
+    group_results = Column(JSON, nullable=True)
+    verdict_reused = Column(Integer, default=0)
     
     integrity_flagged = Column(Integer, default=0)
     
@@ -71,9 +75,14 @@ class Problem(Base):
     title = Column(String, nullable=False)
     
     checker_type = Column(Enum(CheckerType), nullable=True)
+    checker_config = Column(JSON, nullable=True)  # Checker options, e.g. {"epsilon": 1e-9}
+    checker_source = Column(Text, nullable=True)  # Custom checker or interactor program
+    checker_lang = Column(Enum(SubmissionLanguage), nullable=True)
     time_limit_ms = Column(Integer, nullable=True)
     memory_limit_mb = Column(Integer, nullable=True)
     output_limit_kb = Column(Integer, nullable=True)
+    
+    version = Column(Integer, default=1)  # Bumped whenever the problem or its tests change
 
 
 class TestCase(Base):
@@ -83,7 +92,13 @@ class TestCase(Base):
     problem_id = Column(Integer, ForeignKey("problems.id"), nullable=False)
     group = Column(String, nullable=True)
     idx = Column(Integer, nullable=False)
-    input_blob = Column(Text, nullable=False)
-    output_blob = Column(Text, nullable=False)
+    # Content lives in the test data store, addressed by sha256
+    input_sha256 = Column(String(64), nullable=False)
+    input_size = Column(BigInteger, nullable=False)
+    input_preview = Column(String, nullable=True)
+    output_sha256 = Column(String(64), nullable=False)
+    output_size = Column(BigInteger, nullable=False)
+    output_preview = Column(String, nullable=True)
     points = Column(Integer, nullable=True)
-    is_sample = Column(Integer, nullable=True)
\ No newline at end of file
+    is_sample = Column(Integer, nullable=True)
+    failures = Column(Integer, default=0)
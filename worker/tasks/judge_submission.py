@@ -1,24 +1,60 @@
+import functools
 import os
+import time
+from collections import deque
+from contextlib import contextmanager
 from datetime import datetime, timezone
-from typing import Dict, Any
+from typing import Dict, Any, Callable, Iterator, List, NamedTuple, Optional, Tuple
 
 import structlog
 from celery import current_task
 
 from database import get_db
-from models import Submission, Problem, TestCase, SubmissionVerdict
-from judge.executor import DockerExecutor
-from judge.checker import Checker, CheckerResult
+from models import CheckerType, Submission, Problem, TestCase, SubmissionVerdict
+from judge import metrics
+from judge.backend import CompileResult, create_executor
+from judge.compile_cache import source_sha256
+from judge.checker import Checker, CheckerResult, OutputFile
+from judge.custom_checker import CheckerCache, CheckerError, CustomCheckerSession, interaction_verdict
+from judge.engine import AdmissionRejected, JudgeEngine
+from judge.testdata_cache import TestDataCache, TestDataEntry
+from judge.testdata_store import TestDataStore
+from judge.verdict_cache import VerdictCache
 from config import settings
 
 logger = structlog.get_logger()
 
+# Group of tests created without one, as the API names it
+DEFAULT_GROUP = "main"
+
+# Checker types judged by a program supplied with the problem
+PROGRAM_CHECKER_TYPES = (CheckerType.CUSTOM, CheckerType.INTERACTIVE)
+
+# Submission columns copied from a cached result onto an identical resubmission
+REUSED_FIELDS = (
+    "time_ms",
+    "memory_kb",
+    "compile_log",
+    "first_failed_test",
+    "test_results",
+    "score",
+    "group_results"
+)
+
+
+class LoadedTestCase(NamedTuple):
+    """A test case with its blobs, read from the test data store just before it runs."""
+    id: int
+    input_blob: str
+    output_blob: str
+
 
 def judge_submission(submission_id: int, source_code: str) -> Dict[str, Any]:
     """
     Judge a submission against test cases.
     This is the main Celery task for judging.
     """
+    timer = metrics.PhaseTimer.begin()
     db_gen = get_db()
     db = next(db_gen)
     
@@ -34,20 +70,29 @@ def judge_submission(submission_id: int, source_code: str) -> Dict[str, Any]:
             logger.error("Problem not found", problem_id=submission.problem_id)
             return {"error": "Problem not found"}
         
-        # Get test cases
-        testcases = db.query(TestCase).filter(
-            TestCase.problem_id == problem.id
-        ).order_by(TestCase.group, TestCase.idx).all()
+        timer.language = submission.lang.value
+        timer.problem = str(problem.id)
+        if submission.created_at:
+            timer.record("queue_wait", _seconds_since(submission.created_at))
+        
+        # Get test case metadata; blobs come from the test data cache or are
+        # read from the store one test at a time while judging
+        with metrics.phase("fetch_tests"):
+            testcases = db.query(TestCase).filter(
+                TestCase.problem_id == problem.id
+            ).order_by(TestCase.group, TestCase.idx).all()
         
         if not testcases:
             logger.error("No test cases found", problem_id=problem.id)
             return {"error": "No test cases found"}
         
         # Store source code
-        source_ref = _store_source_code(submission_id, source_code)
-        submission.source_ref = source_ref
-        submission.verdict = SubmissionVerdict.JUDGING
-        db.commit()
+        with metrics.phase("store_source"):
+            source_hash = source_sha256(source_code)
+            source_ref = _store_source_code(submission_id, source_code, source_hash)
+            submission.source_ref = source_ref
+            submission.verdict = SubmissionVerdict.JUDGING
+            db.commit()
         
         logger.info(
             "Starting to judge submission",
@@ -58,106 +103,60 @@ def judge_submission(submission_id: int, source_code: str) -> Dict[str, Any]:
         )
         
         # Initialize executor
-        executor = DockerExecutor()
+        executor = create_executor()
+        engine = JudgeEngine.shared()
+        memory_limit_mb = problem.memory_limit_mb or settings.DEFAULT_MEMORY_LIMIT_MB
         
-        # Judge each test case
-        results = []
-        total_time = 0
-        max_memory = 0
-        first_failed_test = None
-        overall_verdict = SubmissionVerdict.AC
+        # The same source judged before against this problem version
+        with metrics.phase("verdict_cache"):
+            reuse_key = _verdict_cache_key(executor, problem, submission.lang.value, source_hash)
+            judged = reuse_key and VerdictCache.shared().fetch(problem.id, problem.version or 1, reuse_key)
+        if judged:
+            result = _reuse_verdict(db, submission, judged)
+            timer.verdict = result["verdict"]
+            return result
         
-        for i, testcase in enumerate(testcases):
-            logger.info(f"Running test case {i+1}/{len(testcases)}")
-            
-            # Update task progress
-            if current_task:
-                current_task.update_state(
-                    state='PROGRESS',
-                    meta={'current': i+1, 'total': len(testcases)}
+        with _cached_testdata(db, problem) as testdata:
+            # Compile once; every test case runs the same artifact
+            with metrics.phase("compile"):
+                compiled = engine.call(
+                    executor.compile,
+                    submission.lang.value,
+                    source_code,
+                    memory_limit_mb,
+                    source_hash=source_hash,
+                    memory_mb=memory_limit_mb * 2,  # Compilation gets twice the memory
+                    reject_if_busy=True
                 )
-            
-            # Execute code
-            exec_result = executor.execute(
-                language=submission.lang.value,
-                source_code=source_code,
-                input_data=testcase.input_blob,
-                time_limit_ms=problem.time_limit_ms or settings.DEFAULT_TIME_LIMIT_MS,
-                memory_limit_mb=problem.memory_limit_mb or settings.DEFAULT_MEMORY_LIMIT_MB,
-                output_limit_kb=problem.output_limit_kb or settings.DEFAULT_OUTPUT_LIMIT_KB
-            )
-            
-            # Track stats
-            total_time += exec_result.time_ms
-            max_memory = max(max_memory, exec_result.memory_kb)
-            
-            # Check for execution errors first
-            if exec_result.verdict != "OK":
-                verdict = exec_result.verdict
-            else:
-                # Check output correctness
-                checker_result, message = Checker.check_output(
-                    checker_type=problem.checker_type.value,
-                    expected=testcase.output_blob,
-                    actual=exec_result.output
-                )
-                
-                if checker_result == CheckerResult.AC:
-                    verdict = "AC"
-                else:
-                    verdict = "WA"
-            
-            # Store test result
-            test_result = {
-                "test_id": testcase.id,
-                "verdict": verdict,
-                "time_ms": exec_result.time_ms,
-                "memory_kb": exec_result.memory_kb,
-                "input_preview": testcase.input_blob[:100] + "..." if len(testcase.input_blob) > 100 else testcase.input_blob,
-                "output_preview": exec_result.output[:100] + "..." if len(exec_result.output) > 100 else exec_result.output,
-                "expected_preview": testcase.output_blob[:100] + "..." if len(testcase.output_blob) > 100 else testcase.output_blob
-            }
-            results.append(test_result)
-            
-            # Update overall verdict
-            if verdict != "AC":
-                if overall_verdict == SubmissionVerdict.AC:
-                    overall_verdict = SubmissionVerdict(verdict.lower())
-                    first_failed_test = i + 1
-                
-                # Stop on first failure for most verdicts (except WA, where we might want to run all tests)
-                if verdict in ["TLE", "MLE", "RE", "CE", "OLE"]:
-                    break
+            try:
+                load_blobs = None if testdata else functools.partial(_load_blobs, TestDataStore.shared())
+                with _problem_program(executor, engine, problem, compiled) as program, \
+                        _custom_checker(executor, problem, program, len(testcases)) as custom_checker:
+                    result = _judge_compiled(
+                        db, submission, problem, testcases, executor, compiled,
+                        testdata=testdata,
+                        load_blobs=load_blobs,
+                        custom_checker=custom_checker,
+                        interactor=program if problem.checker_type == CheckerType.INTERACTIVE else None
+                    )
+            finally:
+                executor.cleanup(compiled)
         
-        # Update submission with results
-        submission.verdict = overall_verdict
-        submission.time_ms = total_time
-        submission.memory_kb = max_memory
-        submission.first_failed_test = first_failed_test
-        submission.test_results = results
-        submission.judged_at = datetime.now(timezone.utc)
+        if reuse_key:
+            _cache_verdict(problem, reuse_key, submission, result)
+        timer.verdict = result["verdict"]
+        return result
         
+    except AdmissionRejected as e:
+        # Nothing has run yet: hand the submission back to the broker so a
+        # less busy host can take it
+        logger.info("Judge host busy, requeueing submission", submission_id=submission_id, reason=e.reason)
+        submission.verdict = SubmissionVerdict.PENDING
         db.commit()
-        
-        logger.info(
-            "Judging completed",
-            submission_id=submission_id,
-            verdict=overall_verdict.value,
-            time_ms=total_time,
-            memory_kb=max_memory,
-            tests_run=len(results)
-        )
-        
-        # TODO: Update gamification profile if AC
-        
-        return {
-            "submission_id": submission_id,
-            "verdict": overall_verdict.value,
-            "time_ms": total_time,
-            "memory_kb": max_memory,
-            "tests_run": len(results),
-            "first_failed_test": first_failed_test
-        }
+        timer.verdict = metrics.REJECTED
+        if current_task:
+            raise current_task.retry(countdown=settings.JUDGE_REJECT_RETRY_SEC)
+        raise
         
     except Exception as e:
         logger.error("Judging failed", submission_id=submission_id, error=str(e))
@@ -179,18 +178,666 @@ def judge_submission(submission_id: int, source_code: str) -> Dict[str, Any]:
             db.close()
         except Exception:
             pass
+        timer.end()
 
 
-def _store_source_code(submission_id: int, source_code: str) -> str:
-    """Store source code and return reference."""
-    import hashlib
+def _judge_compiled(
+    db,
+    submission,
+    problem,
+    testcases,
+    executor,
+    compiled,
+    testdata: Optional[TestDataEntry] = None,
+    load_blobs: Optional[Callable[[Any], Any]] = None,
+    custom_checker: Optional[CustomCheckerSession] = None,
+    interactor: Optional[CompileResult] = None
+) -> Dict[str, Any]:
+    """
+    Run every test case against an already compiled submission.
+    Without a test data cache entry, load_blobs(testcase) fetches a test's
+    input and expected output just before it runs. Problems with a custom
+    checker are judged by the custom_checker session; interactive problems
+    run each test against the compiled interactor.
+    
+    Tests are scored by group (subtask): a group earns its tests' points
+    times the lowest test score in it, so the first test scoring nothing
+    ends the group and its remaining tests are skipped, while later groups
+    are still judged. A custom checker's wrong answer with a partial score
+    does not end its group, so the group scores the same in any test order.
+    With FAIL_FAST_ORDER the tests that failed most often run
+    first; first_failed_test is still the lowest-index failing test.
+    """
+    submission_id = submission.id
+    
+    logger.info(
+        "Compilation finished",
+        submission_id=submission_id,
+        success=compiled.success,
+        cached=compiled.cached,
+        compile_time_ms=compiled.time_ms
+    )
+    
+    if not compiled.success:
+        submission.verdict = SubmissionVerdict.CE
+        submission.compile_log = compiled.error
+        submission.time_ms = 0
+        submission.memory_kb = 0
+        submission.score = 0.0
+        submission.judged_at = datetime.now(timezone.utc)
+        db.commit()
+        
+        return {
+            "submission_id": submission_id,
+            "verdict": SubmissionVerdict.CE.value,
+            "compile_time_ms": compiled.time_ms,
+            "time_ms": 0,
+            "memory_kb": 0,
+            "tests_run": 0,
+            "first_failed_test": None,
+            "score": 0.0,
+            "system_error": compiled.system_error
+        }
+    
+    # Judge each test case
+    results = {}  # Position in test order -> result
+    failed = {}  # Position in test order -> verdict
+    total_time = 0
+    max_memory = 0
+    groups = _group_results(testcases)
+    failed_groups = set()
+    system_errors = set()  # Positions of runs the judge failed or cancelled
+    run_tests = functools.partial(
+        _run_tests, JudgeEngine.shared(), executor, compiled, problem,
+        window=_test_window(),
+        testdata=testdata,
+        load_blobs=load_blobs,
+        custom_checker=custom_checker,
+        interactor=interactor
+    )
+    
+    def record(position: int, test_result: Dict[str, Any]):
+        nonlocal total_time, max_memory
+        if test_result.pop("system_error"):
+            system_errors.add(position)
+        results[position] = test_result
+        
+        # Update task progress
+        if current_task:
+            current_task.update_state(
+                state='PROGRESS',
+                meta={'current': len(results), 'total': len(testcases)}
+            )
+        
+        # Track stats
+        total_time += test_result["time_ms"]
+        max_memory = max(max_memory, test_result["memory_kb"])
+        
+        group = groups[test_result["group"]]
+        group["tests_run"] += 1
+        group["min_score"] = min(group["min_score"], test_result["score"])
+        
+        if test_result["verdict"] != "AC":
+            failed[position] = test_result["verdict"]
+        if not test_result["score"]:
+            # The group cannot score any more; skip the rest of it
+            failed_groups.add(test_result["group"])
+    
+    # Fail-fast order runs the tests that failed most often first
+    order = _fail_fast_order(testcases) if settings.FAIL_FAST_ORDER else list(range(len(testcases)))
+    outcomes = run_tests([testcases[i] for i in order], skip=lambda testcase: _group(testcase) in failed_groups)
+    
+    try:
+        # Outcomes arrive in run order regardless of execution mode
+        for j, test_result in outcomes:
+            record(order[j], test_result)
+    finally:
+        outcomes.close()
+    
+    if failed:
+        # Out of test order the first failure found need not be the lowest-index
+        # one: run the skipped tests before it, in order, up to the first failure
+        earlier = [i for i in range(min(failed)) if i not in results]
+        outcomes = run_tests([testcases[i] for i in earlier])
+        try:
+            for j, test_result in outcomes:
+                record(earlier[j], test_result)
+                if test_result["verdict"] != "AC":
+                    break
+        finally:
+            outcomes.close()
+    
+    # Update overall and group verdicts from the lowest-index failures
+    first_failed_test = None
+    overall_verdict = SubmissionVerdict.AC
+    for position in sorted(failed):
+        if first_failed_test is None:
+            overall_verdict = SubmissionVerdict(failed[position].lower())
+            first_failed_test = position + 1
+        group = groups[_group(testcases[position])]
+        if group["verdict"] == "AC":
+            group["verdict"] = failed[position]
+    
+    results = [results[position] for position in sorted(results)]
+    # Failures of the judge itself say nothing about how hard a test is
+    _count_failures(db, [testcases[position].id for position in failed if position not in system_errors])
+    
+    group_results = [_group_score(group) for group in groups.values()]
+    score = sum(group["score"] for group in group_results)
+    
+    # Update submission with results
+    submission.verdict = overall_verdict
+    submission.time_ms = total_time
+    submission.memory_kb = max_memory
+    submission.first_failed_test = first_failed_test
+    submission.test_results = results
+    submission.score = score
+    submission.group_results = group_results
+    submission.judged_at = datetime.now(timezone.utc)
+    
+    with metrics.phase("commit"):
+        db.commit()
+    
+    logger.info(
+        "Judging completed",
+        submission_id=submission_id,
+        verdict=overall_verdict.value,
+        compile_time_ms=compiled.time_ms,
+        time_ms=total_time,
+        memory_kb=max_memory,
+        tests_run=len(results),
+        tests_skipped=len(testcases) - len(results),
+        score=score
+    )
+    
+    # TODO: Update gamification profile if AC
+    
+    return {
+        "submission_id": submission_id,
+        "verdict": overall_verdict.value,
+        "compile_time_ms": compiled.time_ms,
+        "time_ms": total_time,
+        "memory_kb": max_memory,
+        "tests_run": len(results),
+        "first_failed_test": first_failed_test,
+        "score": score,
+        "system_error": bool(system_errors)
+    }
+
+
+def _run_testcase(
+    executor,
+    compiled,
+    problem,
+    testcase,
+    index: int,
+    total: int,
+    testdata: Optional[TestDataEntry] = None,
+    custom_checker: Optional[CustomCheckerSession] = None,
+    interactor: Optional[CompileResult] = None,
+    group: str = DEFAULT_GROUP,
+    run_key: Any = None
+) -> Dict[str, Any]:
+    """
+    Run and check a single test case. With a test data cache entry the
+    input and expected output are read from its files, not from the row.
+    The run can be killed with executor.cancel_run(compiled, run_key).
+    """
+    logger.info(f"Running test case {index+1}/{total}")
+    
+    if testdata:
+        input_path = testdata.input_path(testcase.id)
+        expected_path = testdata.output_path(testcase.id)
+        input_preview = _preview(_read_head(input_path))
+        expected_preview = _preview(_read_head(expected_path))
+    else:
+        input_path = expected_path = None
+        input_preview = _preview(testcase.input_blob)
+        expected_preview = _preview(testcase.output_blob)
+    
+    # Execute code
+    time_limit_ms = problem.time_limit_ms or settings.DEFAULT_TIME_LIMIT_MS
+    memory_limit_mb = problem.memory_limit_mb or settings.DEFAULT_MEMORY_LIMIT_MB
+    with metrics.phase("run"):
+        if interactor:
+            interaction = executor.run_interactive(
+                compiled,
+                interactor,
+                input_data=None if input_path else testcase.input_blob,
+                answer_data=None if expected_path else testcase.output_blob,
+                time_limit_ms=time_limit_ms,
+                memory_limit_mb=memory_limit_mb,
+                interactor_time_limit_ms=settings.CUSTOM_CHECKER_TIME_LIMIT_MS,
+                interactor_memory_limit_mb=settings.CUSTOM_CHECKER_MEMORY_LIMIT_MB,
+                input_path=input_path,
+                answer_path=expected_path,
+                run_key=run_key
+            )
+            exec_result = interaction.solution
+        else:
+            exec_result = executor.run(
+                compiled,
+                input_data=None if input_path else testcase.input_blob,
+                time_limit_ms=time_limit_ms,
+                memory_limit_mb=memory_limit_mb,
+                output_limit_kb=problem.output_limit_kb or settings.DEFAULT_OUTPUT_LIMIT_KB,
+                input_path=input_path,
+                run_key=run_key
+            )
+    
+    score = 0.0
+    try:
+        if interactor:
+            # The interactor judged the exchange as it happened
+            verdict, score = interaction_verdict(interaction)
+        # Check for execution errors first
+        elif exec_result.verdict != "OK":
+            verdict = exec_result.verdict
+        else:
+            with metrics.phase("check"):
+                # Checkers stream files in chunks rather than loading them
+                actual = OutputFile(exec_result.output_path) if exec_result.output_path else exec_result.output
+                expected = OutputFile(expected_path) if expected_path else testcase.output_blob
+                checker_type = problem.checker_type.value
+                
+                if custom_checker:
+                    checker_result, score, _ = custom_checker.check(
+                        OutputFile(input_path) if input_path else testcase.input_blob,
+                        expected,
+                        actual
+                    )
+                # Hash of the normalized output against the cached expected form;
+                # the full checker only runs (and reads the expected output) on a mismatch
+                elif Checker.matches_digest(checker_type, testdata.expected_digest(testcase.id) if testdata else None, actual):
+                    checker_result = CheckerResult.AC
+                else:
+                    checker_result, message = Checker.check_output(
+                        checker_type=checker_type,
+                        expected=expected,
+                        actual=actual,
+                        **_checker_options(problem)
+                    )
+            
+            if checker_result == CheckerResult.AC:
+                verdict = "AC"
+                # Custom checkers may award part of a test; built-in ones all or nothing
+                score = score if custom_checker else 1.0
+            else:
+                verdict = "WA"
+    finally:
+        if exec_result.output_path:
+            try:
+                os.remove(exec_result.output_path)
+            except OSError:
+                pass
+    
+    return {
+        "test_id": testcase.id,
+        "group": group,
+        "verdict": verdict,
+        "time_ms": exec_result.time_ms,
+        "memory_kb": exec_result.memory_kb,
+        "limit_rule": exec_result.limit_rule,
+        "score": score,
+        "input_preview": input_preview,
+        "output_preview": _preview(exec_result.output),
+        "expected_preview": expected_preview,
+        "system_error": exec_result.system_error  # Dropped before the result is stored
+    }
+
+
+def _run_tests(
+    engine,
+    executor,
+    compiled,
+    problem,
+    testcases,
+    window: int,
+    testdata: Optional[TestDataEntry] = None,
+    load_blobs: Optional[Callable[[Any], Any]] = None,
+    custom_checker: Optional[CustomCheckerSession] = None,
+    interactor: Optional[CompileResult] = None,
+    skip: Optional[Callable[[Any], bool]] = None
+) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """
+    Run test cases on the judge engine with up to `window` of them in
+    flight, yielding (index, result) in test order. The engine admits each
+    run against the host's CPU, memory and disk budget, shared by every
+    submission in this process. Closing the generator (e.g. when judging
+    fails) drops queued tests and kills the runs still in flight.
+    
+    Tests for which skip(testcase) becomes true are neither loaded nor
+    run; those already submitted are dropped from the queue and runs of
+    them still in progress are killed (executor.cancel_run), keeping their
+    slot in the window until they have settled. Once only skipped tests
+    are left the generator ends as if closed.
+    
+    Blobs are loaded with load_blobs as tests are about to be submitted,
+    at most TESTDATA_PREFETCH_WINDOW tests ahead, so memory scales with the
+    largest tests rather than the whole problem.
+    """
+    memory_mb = problem.memory_limit_mb or settings.DEFAULT_MEMORY_LIMIT_MB
+    if interactor:
+        memory_mb += settings.CUSTOM_CHECKER_MEMORY_LIMIT_MB  # Both sides run at once
+    # Stdout is the only thing a run writes to the workspace
+    disk_mb = -(-(problem.output_limit_kb or settings.DEFAULT_OUTPUT_LIMIT_KB) // 1024)
+    skip = skip or (lambda testcase: False)
+    remaining = enumerate(testcases)
+    prefetched = deque()
+    pending = deque()  # (index, job, run_key)
+    dropped = []  # Jobs of skipped tests, until they settle
+    
+    def prefetch(count: int):
+        while len(prefetched) < count:
+            item = next(remaining, None)
+            if item is None:
+                return
+            i, testcase = item
+            if not skip(testcase):
+                prefetched.append((i, load_blobs(testcase) if load_blobs else testcase))
+    
+    def submit_next() -> bool:
+        while True:
+            prefetch(1)
+            if not prefetched:
+                return False
+            i, testcase = prefetched.popleft()
+            if not skip(testcases[i]):
+                break
+        run_key = object()
+        pending.append((i, engine.submit(
+            _run_testcase, executor, compiled, problem, testcase, i, len(testcases),
+            testdata, custom_checker, interactor, _group(testcases[i]), run_key,
+            memory_mb=memory_mb,
+            disk_mb=disk_mb
+        ), run_key))
+        return True
+    
+    try:
+        while True:
+            for item in [item for item in pending if skip(testcases[item[0]])]:
+                pending.remove(item)
+                _, job, run_key = item
+                job.cancel()
+                executor.cancel_run(compiled, run_key)
+                dropped.append(job)
+            dropped[:] = [job for job in dropped if not job.settled.is_set()]
+            while len(pending) + len(dropped) < window:
+                if not submit_next():
+                    break
+            if not pending:
+                if len(dropped) < window:
+                    return
+                # Only killed runs are in flight; their slots free up shortly
+                dropped[0].settled.wait()
+                continue
+            # Load upcoming tests while the submitted ones run
+            prefetch(settings.TESTDATA_PREFETCH_WINDOW)
+            
+            i, job, _ = pending.popleft()
+            yield i, job.result()
+    finally:
+        unsettled = [job for _, job, _ in pending] + [job for job in dropped if not job.settled.is_set()]
+        if unsettled:
+            for job in unsettled:
+                job.cancel()
+            executor.cancel(compiled)
+            # The workspace is removed after this; wait for runs still using it
+            for job in unsettled:
+                job.settled.wait()
+            # A later pass over the same artifact (e.g. earlier tests in
+            # fail-fast order) must not inherit the cancellation
+            executor.resume(compiled)
+
+
+def _load_blobs(store, testcase) -> LoadedTestCase:
+    """
+    Fetch one test's input and expected output from the test data store.
+    Blobs are arbitrary bytes, so anything that is not UTF-8 is replaced
+    (as in previews) rather than failing every submission to the problem.
+    """
+    return LoadedTestCase(
+        testcase.id,
+        store.read(testcase.input_sha256).decode("utf-8", errors="replace"),
+        store.read(testcase.output_sha256).decode("utf-8", errors="replace")
+    )
+
+
+@contextmanager
+def _cached_testdata(db, problem) -> Iterator[Optional[TestDataEntry]]:
+    """Test data cache entry for the problem's current version (None when disabled)."""
+    if not settings.TESTDATA_CACHE_ENABLED:
+        yield None
+        return
+    
+    def load():
+        # Blobs are streamed from the store into the cache one file at a time
+        return db.query(TestCase.id, TestCase.input_sha256, TestCase.output_sha256).filter(
+            TestCase.problem_id == problem.id
+        ).all()
+    
+    cache = TestDataCache.shared()
+    started = time.perf_counter()
+    with cache.entry(problem.id, problem.version or 1, load) as entry:
+        metrics.record_phase("testdata", time.perf_counter() - started)
+        yield entry
+    
+    logger.info("Test data cache", problem_id=problem.id, version=problem.version, **cache.stats())
+
+
+@contextmanager
+def _problem_program(executor, engine, problem, compiled) -> Iterator[Optional[CompileResult]]:
+    """
+    The problem's compiled custom checker or interactor (None for the
+    built-in checkers, or when the submission did not compile). It is
+    compiled once per problem version and shared by later submissions.
+    """
+    if problem.checker_type not in PROGRAM_CHECKER_TYPES or not compiled.success:
+        yield None
+        return
+    if not problem.checker_source:
+        raise CheckerError(f"Problem has checker type {problem.checker_type.value} but no checker source")
+    
+    language = problem.checker_lang.value if problem.checker_lang else "cpp"
+    memory_limit_mb = settings.CUSTOM_CHECKER_MEMORY_LIMIT_MB
+    
+    def compile_program():
+        return engine.call(
+            executor.compile,
+            language,
+            problem.checker_source,
+            memory_limit_mb,
+            memory_mb=memory_limit_mb * 2
+        )
+    
+    started = time.perf_counter()
+    with CheckerCache.shared().lease(problem.id, problem.version or 1, compile_program, executor.cleanup) as program:
+        metrics.record_phase("checker_compile", time.perf_counter() - started)
+        yield program
+
+
+@contextmanager
+def _custom_checker(executor, problem, program, test_count: int) -> Iterator[Optional[CustomCheckerSession]]:
+    """Warm checker session for a problem with a custom checker, else None."""
+    if program is None or problem.checker_type != CheckerType.CUSTOM:
+        yield None
+        return
+    
+    session = CustomCheckerSession(
+        executor,
+        program,
+        max_processes=_test_window(),
+        time_limit_ms=settings.CUSTOM_CHECKER_TIME_LIMIT_MS,
+        memory_limit_mb=settings.CUSTOM_CHECKER_MEMORY_LIMIT_MB,
+        lifetime_limit_ms=settings.CUSTOM_CHECKER_TIME_LIMIT_MS * test_count
+    )
+    try:
+        yield session
+    finally:
+        session.close()
+        logger.info("Custom checker session", problem_id=problem.id, processes_started=session.started)
+
+
+def _verdict_cache_key(executor, problem, language: str, source_hash: str) -> Optional[str]:
+    """Verdict cache key of a submission (None when reuse is disabled)."""
+    if not settings.VERDICT_CACHE_ENABLED:
+        return None
     
+    # Everything besides the problem version that can change a verdict
+    judge_config = {
+        "time_limit_ms": problem.time_limit_ms or settings.DEFAULT_TIME_LIMIT_MS,
+        "memory_limit_mb": problem.memory_limit_mb or settings.DEFAULT_MEMORY_LIMIT_MB,
+        "output_limit_kb": problem.output_limit_kb or settings.DEFAULT_OUTPUT_LIMIT_KB,
+        "checker_type": problem.checker_type.value,
+        "checker_options": _checker_options(problem),
+        "checker_time_limit_ms": settings.CUSTOM_CHECKER_TIME_LIMIT_MS,
+        "checker_memory_limit_mb": settings.CUSTOM_CHECKER_MEMORY_LIMIT_MB
+    }
+    return VerdictCache.make_key(language, executor.toolchain_digest(language), source_hash, judge_config)
+
+
+def _judged_record(submission, result: Dict[str, Any]) -> Dict[str, Any]:
+    """What the verdict cache keeps of a judged submission."""
+    record = {field: getattr(submission, field) for field in REUSED_FIELDS}
+    record.update(
+        submission_id=submission.id,
+        verdict=submission.verdict.value,
+        compile_time_ms=result["compile_time_ms"],
+        tests_run=result["tests_run"]
+    )
+    return record
+
+
+def _cache_verdict(problem, reuse_key: str, submission, result: Dict[str, Any]) -> None:
+    """Keep a judged result for identical resubmissions, unless the judge itself failed."""
+    if result["system_error"]:
+        # A failed or cancelled compile or run says nothing about the source
+        logger.info("Not caching a result with system errors", submission_id=submission.id)
+        return
+    VerdictCache.shared().store(problem.id, problem.version or 1, reuse_key, _judged_record(submission, result))
+
+
+def _reuse_verdict(db, submission, judged: Dict[str, Any]) -> Dict[str, Any]:
+    """Record an earlier identical submission's result as this one's, without judging."""
+    submission.verdict = SubmissionVerdict(judged["verdict"])
+    for field in REUSED_FIELDS:
+        setattr(submission, field, judged[field])
+    submission.verdict_reused = 1
+    submission.judged_at = datetime.now(timezone.utc)
+    db.commit()
+    
+    logger.info(
+        "Reused judged result",
+        submission_id=submission.id,
+        reused_from=judged["submission_id"],
+        verdict=judged["verdict"],
+        **VerdictCache.shared().stats()
+    )
+    
+    return {
+        "submission_id": submission.id,
+        "verdict": judged["verdict"],
+        "compile_time_ms": judged["compile_time_ms"],
+        "time_ms": judged["time_ms"],
+        "memory_kb": judged["memory_kb"],
+        "tests_run": judged["tests_run"],
+        "first_failed_test": judged["first_failed_test"],
+        "score": judged["score"],
+        "system_error": False,
+        "reused_from": judged["submission_id"]
+    }
+
+
+def _seconds_since(created_at: datetime) -> float:
+    """Time since a database timestamp (naive ones are UTC)."""
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    return max((datetime.now(timezone.utc) - created_at).total_seconds(), 0.0)
+
+
+def _test_window() -> int:
+    """Tests of one submission kept in flight at once."""
+    return max(settings.MAX_CONCURRENT_JOBS, 1)
+
+
+def _fail_fast_order(testcases) -> List[int]:
+    """Test positions with the most often failed tests first, ties in test order."""
+    return sorted(range(len(testcases)), key=lambda i: (-(testcases[i].failures or 0), i))
+
+
+def _count_failures(db, testcase_ids: List[int]) -> None:
+    """Add a judged submission's failed tests to their failure counts (committed with it)."""
+    if testcase_ids:
+        db.query(TestCase).filter(TestCase.id.in_(testcase_ids)).update(
+            {TestCase.failures: TestCase.failures + 1},
+            synchronize_session=False
+        )
+
+
+def _group(testcase) -> str:
+    return testcase.group or DEFAULT_GROUP
+
+
+def _group_results(testcases) -> Dict[str, Dict[str, Any]]:
+    """Empty score breakdown of each test group, in test order."""
+    groups = {}
+    for testcase in testcases:
+        name = _group(testcase)
+        group = groups.setdefault(name, {
+            "group": name,
+            "verdict": "AC",
+            "max_score": 0,
+            "tests": 0,
+            "tests_run": 0,
+            "min_score": 1.0
+        })
+        group["max_score"] += 1 if testcase.points is None else testcase.points
+        group["tests"] += 1
+    return groups
+
+
+def _group_score(group: Dict[str, Any]) -> Dict[str, Any]:
+    """A group's entry in Submission.group_results; skipped tests score nothing."""
+    complete = group["tests_run"] == group["tests"]
+    return {
+        "group": group["group"],
+        "verdict": group["verdict"],
+        "score": round(group["max_score"] * group["min_score"], 6) if complete else 0.0,
+        "max_score": group["max_score"],
+        "tests_run": group["tests_run"],
+        "tests_skipped": group["tests"] - group["tests_run"]
+    }
+
+
+def _checker_options(problem) -> Dict[str, Any]:
+    """Checker keyword arguments from the problem's checker_config, with worker defaults."""
+    config = problem.checker_config or {}
+    defaults = {
+        "epsilon": settings.DEFAULT_FLOAT_EPSILON,
+        "relative_epsilon": settings.DEFAULT_FLOAT_RELATIVE_EPSILON,
+    }
+    # The API stores unset options as null
+    return {name: default if config.get(name) is None else config[name] for name, default in defaults.items()}
+
+
+def _read_head(path: str, max_bytes: int = 4 * 100 + 1) -> str:
+    """Enough of a file to build its preview (UTF-8 is at most 4 bytes per character)."""
+    with open(path, 'rb') as f:
+        return f.read(max_bytes).decode('utf-8', errors='replace')
+
+
+def _preview(text: str) -> str:
+    return text[:100] + "..." if len(text) > 100 else text
+
+
+def _store_source_code(submission_id: int, source_code: str, source_hash: str) -> str:
+    """Store source code and return reference."""
     # Create artifacts directory if it doesn't exist
     artifacts_dir = "/judge_artifacts"
     os.makedirs(artifacts_dir, exist_ok=True)
     
     # Generate hash-based filename
-    code_hash = hashlib.sha256(source_code.encode()).hexdigest()[:16]
+    code_hash = source_hash[:16]
     filename = f"{submission_id}_{code_hash}.txt"
     filepath = os.path.join(artifacts_dir, filename)
     
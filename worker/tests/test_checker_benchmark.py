@@ -0,0 +1,75 @@
+"""
+Checker throughput and memory on a 10^7-token output. Generating the files
+takes a while, so the benchmark only runs when asked for:
+
+    RUN_BENCHMARKS=1 python -m pytest tests/test_checker_benchmark.py -s
+"""
+
+import os
+import resource
+import time
+
+import pytest
+
+from judge.checker import Checker, CheckerResult, OutputFile
+
+TOKENS = 10 ** 7
+TOKENS_PER_LINE = 10
+
+pytestmark = pytest.mark.skipif(not os.environ.get("RUN_BENCHMARKS"), reason="set RUN_BENCHMARKS=1 to run")
+
+
+def write_output(path, tokens, last="7"):
+    """Lines of TOKENS_PER_LINE small integers, written without building the whole text."""
+    line = " ".join(["123456"] * TOKENS_PER_LINE) + "\n"
+    block = line * 10_000
+    lines = tokens // TOKENS_PER_LINE
+    with open(path, "w") as f:
+        for _ in range(lines // 10_000 - 1):
+            f.write(block)
+        f.write(line * (lines % 10_000 + 9_999))
+        f.write(" ".join(["123456"] * (TOKENS_PER_LINE - 1) + [last]) + "\n")
+
+
+@pytest.fixture(scope="module")
+def outputs(tmp_path_factory):
+    root = tmp_path_factory.mktemp("checker_benchmark")
+    expected, same, differs_last = root / "expected.txt", root / "same.txt", root / "differs_last.txt"
+    write_output(expected, TOKENS)
+    write_output(same, TOKENS)
+    write_output(differs_last, TOKENS, last="8")
+    return OutputFile(str(expected)), OutputFile(str(same)), OutputFile(str(differs_last))
+
+
+def measure(name, check, *args):
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    result = check(*args)
+    elapsed = time.perf_counter() - start
+    rss_growth_mb = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before) / 1024
+    print(f"\n{name}: {elapsed:.2f}s, peak RSS +{rss_growth_mb:.0f} MB")
+    # Streaming: memory must not scale with the ~70 MB output
+    assert rss_growth_mb < 64
+    return result
+
+
+@pytest.mark.parametrize("checker_type", ["diff", "token", "float_eps"])
+def test_full_checker(outputs, checker_type):
+    """Test a full pass (the worst case: the only mismatch is the last token)."""
+    expected, same, differs_last = outputs
+    
+    assert measure(f"{checker_type} AC", Checker.check_output, checker_type, expected, same)[0] == CheckerResult.AC
+    result, message = measure(f"{checker_type} WA", Checker.check_output, checker_type, expected, differs_last)
+    
+    assert result == CheckerResult.WA
+    assert str(TOKENS // TOKENS_PER_LINE) in message  # Reported on the last line
+
+
+@pytest.mark.parametrize("checker_type", ["diff", "token"])
+def test_digest_fast_path(outputs, checker_type):
+    """Test the hash fast path against a precomputed expected digest."""
+    expected, same, differs_last = outputs
+    digest = Checker.digest(expected)
+    
+    assert measure(f"{checker_type} digest AC", Checker.matches_digest, checker_type, digest, same)
+    assert not measure(f"{checker_type} digest WA", Checker.matches_digest, checker_type, digest, differs_last)
@@ -0,0 +1,211 @@
+import concurrent.futures
+import shutil
+import threading
+import time
+from unittest.mock import Mock, patch
+
+import pytest
+
+from judge import metrics
+from judge.engine import AdmissionRejected, JudgeEngine
+
+
+class Probe:
+    """Blocking call that records how many copies run at once."""
+
+    def __init__(self):
+        self.running = 0
+        self.peak = 0
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, delay_sec=0.05):
+        with self.lock:
+            self.running += 1
+            self.calls += 1
+            self.peak = max(self.peak, self.running)
+        time.sleep(delay_sec)
+        with self.lock:
+            self.running -= 1
+        return "done"
+
+
+@pytest.fixture
+def engine():
+    engine = JudgeEngine(cpu_slots=2, memory_budget_mb=1000)
+    yield engine
+    engine.close()
+
+
+@pytest.fixture
+def make_engine():
+    engines = []
+
+    def make(**kwargs):
+        engines.append(JudgeEngine(**{"cpu_slots": 2, "memory_budget_mb": 1000, **kwargs}))
+        return engines[-1]
+
+    yield make
+    for engine in engines:
+        engine.close()
+
+
+class Gate:
+    """Calls that block until opened, and calls that record the order they started in."""
+
+    def __init__(self):
+        self.opened = threading.Event()
+        self.started = []
+
+    def hold(self):
+        self.opened.wait(5)
+
+    def mark(self, name):
+        self.started.append(name)
+
+
+def test_cpu_slots_bound_concurrency(engine):
+    """Test no more runs execute at once than there are CPU slots."""
+    probe = Probe()
+
+    jobs = [engine.submit(probe, memory_mb=10) for _ in range(8)]
+
+    assert [job.result() for job in jobs] == ["done"] * 8
+    assert probe.peak == 2
+
+
+def test_memory_budget_bounds_concurrency(engine):
+    """Test runs whose memory limits exceed the budget together are serialized."""
+    probe = Probe()
+
+    jobs = [engine.submit(probe, memory_mb=600) for _ in range(3)]
+    for job in jobs:
+        job.result()
+
+    assert probe.peak == 1
+    assert engine.call(probe, 0, memory_mb=5000) == "done"  # Larger than the budget still runs
+
+
+def test_cancel_drops_queued_jobs(engine):
+    """Test cancelled jobs never start and settle without leaking resources."""
+    probe = Probe()
+
+    running = [engine.submit(probe, 0.2, memory_mb=10) for _ in range(2)]
+    queued = [engine.submit(probe, memory_mb=10) for _ in range(4)]
+    for job in queued:
+        job.cancel()
+
+    for job in running:
+        job.result()
+    for job in queued:
+        assert job.settled.wait(1)
+
+    assert probe.calls == 2
+    assert engine.cores.available == 2
+    assert engine.memory.available == 1000
+
+
+def test_calls_time_phases_of_the_submitting_context(engine):
+    """Test phases timed inside engine calls count towards the submitter's timer only."""
+    def timed_call():
+        with metrics.phase("exec"):
+            time.sleep(0.01)
+
+    timer = metrics.PhaseTimer.begin()
+    try:
+        engine.call(timed_call, memory_mb=10)
+        # Another thread's calls are not attributed to this submission
+        other = threading.Thread(target=lambda: engine.call(timed_call, memory_mb=10))
+        other.start()
+        other.join()
+    finally:
+        phases = [name for name, _ in timer.phases]
+        timer.end()
+
+    assert phases == ["admission", "exec"]
+    assert metrics.current_timer() is None
+
+
+@pytest.mark.parametrize("verdict, judged", [("ac", 1), (metrics.REJECTED, 0)])
+def test_rejected_attempts_not_counted_as_judged(verdict, judged):
+    """Test a requeued attempt is counted apart, so the attempt that judges it counts it once."""
+    submissions, rejected = Mock(), Mock()
+    with patch.object(metrics, "SUBMISSIONS", submissions), patch.object(metrics, "SUBMISSIONS_REJECTED", rejected):
+        timer = metrics.PhaseTimer.begin()
+        timer.verdict = verdict
+        timer.end()
+
+    assert submissions.labels.call_count == judged
+    assert rejected.labels.call_count == 1 - judged
+
+
+def test_smaller_calls_go_ahead_of_a_call_that_does_not_fit(engine):
+    """Test a call waiting for memory does not hold back later calls that fit."""
+    gate = Gate()
+
+    engine.submit(gate.hold, memory_mb=600)
+    large = engine.submit(gate.mark, "large", memory_mb=600)
+    small = engine.submit(gate.mark, "small", memory_mb=100)
+
+    small.result(timeout=1)
+    assert gate.started == ["small"]
+    gate.opened.set()
+    large.result(timeout=1)
+    assert gate.started == ["small", "large"]
+
+
+def test_calls_waiting_past_aging_keep_their_turn(make_engine):
+    """Test once the oldest call has waited long enough, later calls queue behind it."""
+    engine = make_engine(aging_sec=0)
+    gate = Gate()
+
+    engine.submit(gate.hold, memory_mb=600)
+    large = engine.submit(gate.mark, "large", memory_mb=600)
+    small = engine.submit(gate.mark, "small", memory_mb=100)
+
+    with pytest.raises(concurrent.futures.TimeoutError):
+        small.result(timeout=0.2)
+    gate.opened.set()
+    large.result(timeout=1)
+    small.result(timeout=1)
+    assert sorted(gate.started) == ["large", "small"]
+
+
+def test_full_queue_rejects_new_submissions_only(make_engine):
+    """Test a saturated host refuses calls that may be rejected and queues the rest."""
+    engine = make_engine(cpu_slots=1, queue_limit=1)
+    gate = Gate()
+
+    engine.submit(gate.hold, memory_mb=10)
+    queued = engine.submit(gate.mark, "queued", memory_mb=10)
+    with pytest.raises(AdmissionRejected) as rejected:
+        engine.call(gate.mark, "new", memory_mb=10, reject_if_busy=True)
+    more = engine.submit(gate.mark, "more", memory_mb=10)
+
+    gate.opened.set()
+    queued.result(timeout=1)
+    more.result(timeout=1)
+    assert rejected.value.reason == "queue_full"
+    assert gate.started == ["queued", "more"]
+    assert more.settled.wait(1)
+    assert (engine.cores.available, engine.memory.available) == (1, 1000)
+
+
+def test_disk_short_of_the_reserve(make_engine, tmp_path):
+    """Test runs wait for disk while others run, and new submissions are rejected."""
+    free_mb = shutil.disk_usage(tmp_path).free // (1024 * 1024)
+    engine = make_engine(work_dir=str(tmp_path), disk_reserve_mb=free_mb + 100)
+    gate = Gate()
+
+    holding = engine.submit(gate.hold, memory_mb=10)  # Nothing running yet: admitted anyway
+    with pytest.raises(AdmissionRejected) as rejected:
+        engine.call(gate.mark, "new", memory_mb=10, reject_if_busy=True)
+    run = engine.submit(gate.mark, "run", memory_mb=10, disk_mb=1)
+
+    with pytest.raises(concurrent.futures.TimeoutError):
+        run.result(timeout=0.2)
+    gate.opened.set()
+    holding.result(timeout=1)
+    run.result(timeout=1)
+    assert rejected.value.reason == "disk"
+    assert gate.started == ["run"]
@@ -1,10 +1,80 @@
+import hashlib
 import pytest
+import shutil
+import subprocess
+import sys
 import tempfile
+import threading
+import time
 import os
 from unittest.mock import Mock, patch
 
-from judge.executor import DockerExecutor
-from judge.checker import Checker, CheckerResult
+from config import settings
+from judge.backend import STDIN_FIFO, STDOUT_FIFO, ExecutorBackend, SandboxProcess, create_executor
+from judge.executor import CompileResult, DockerExecutor, ExecutionResult
+from judge.native import NativeExecutor
+from judge.checker import Checker, CheckerResult, OutputFile
+from judge.compile_cache import CompileCache
+from judge.verdict_cache import VerdictCache
+from judge.custom_checker import CheckerCache, CheckerError, CustomCheckerSession, interaction_verdict
+from judge import metrics, testdata_cache, testdata_store
+from judge.container_pool import ContainerPool
+from judge.cgroup import CgroupMonitor
+
+
+def sandbox_client(exit_code=0, stdout=b"", stderr=b""):
+    """Docker client mock whose containers run programs via exec."""
+    mock_client = Mock()
+    mock_container = Mock(id="c0ffee")
+    mock_client.containers.run.return_value = mock_container
+    mock_container.exec_run.return_value = (0, b"")
+    mock_client.api.exec_create.return_value = {"Id": "exec1"}
+    mock_client.api.exec_start.side_effect = lambda exec_id: write_streams(mock_client, stdout, stderr)
+    mock_client.api.exec_inspect.return_value = {"ExitCode": exit_code}
+    return mock_client, mock_container
+
+
+def write_streams(mock_client, stdout=b"", stderr=b""):
+    """Play the sandboxed program: write its redirected stdout/stderr files."""
+    slot_dir = next(iter(mock_client.containers.run.call_args.kwargs["volumes"]))
+    with open(os.path.join(slot_dir, "stdout.txt"), "wb") as f:
+        f.write(stdout)
+    with open(os.path.join(slot_dir, "stderr.txt"), "wb") as f:
+        f.write(stderr)
+
+
+def attach_sandbox(executor, mock_client, tmp_path):
+    """Point the executor at mock_client with a cold (size 0) sandbox pool."""
+    executor.client = mock_client
+    executor.pool = ContainerPool(
+        mock_client,
+        size=0,
+        max_uses=1,
+        slot_root=str(tmp_path / "slots"),
+        container_config=executor._container_config
+    )
+
+
+def write_cgroup(root, container_id, usage_usec, peak_bytes):
+    """Fake a cgroup v2 directory for container_id under root."""
+    cgroup_dir = root / "system.slice" / f"docker-{container_id}.scope"
+    cgroup_dir.mkdir(parents=True, exist_ok=True)
+    (cgroup_dir / "cpu.stat").write_text(f"usage_usec {usage_usec}\nuser_usec {usage_usec}\nsystem_usec 0\n")
+    (cgroup_dir / "memory.peak").write_text(f"{peak_bytes}\n")
+    return str(cgroup_dir)
+
+
+def fake_compile(**kwargs):
+    """containers.run side effect that 'compiles' into the mounted workspace."""
+    container = Mock(id="c0ffee")
+    container.exec_run.return_value = (0, b"")
+    if "g++" in kwargs["command"]:
+        work_dir = next(iter(kwargs["volumes"]))
+        with open(os.path.join(work_dir, "solution"), "wb") as f:
+            f.write(b"\x7fELF")
+        container.wait.return_value = {"StatusCode": 0}
+        container.logs.return_value = b""
+    return container
 
 
 class TestDockerExecutor:
@@ -38,69 +108,548 @@ class TestDockerExecutor:
         assert "g++" in cpp_config["compile_cmd"]
     
     @patch('docker.from_env')
-    def test_execute_python_success(self, mock_docker, executor):
+    def test_execute_python_success(self, mock_docker, executor, tmp_path):
         """Test successful Python code execution."""
         # Mock Docker client and container
-        mock_client = Mock()
-        mock_container = Mock()
-        
+        mock_client, mock_container = sandbox_client(stdout=b"Hello, World!")
         mock_docker.return_value = mock_client
-        mock_client.containers.run.return_value = mock_container
+        attach_sandbox(executor, mock_client, tmp_path)
         
-        # Mock container behavior
-        mock_container.wait.return_value = {"StatusCode": 0}
-        mock_container.logs.side_effect = [b"Hello, World!", b""]
-        mock_container.stats.return_value = {
-            "memory_stats": {"usage": 1024000}  # 1MB
-        }
+        # CPU time and peak memory come from the container's cgroup
+        cgroup_dir = write_cgroup(tmp_path, mock_container.id, usage_usec=5000, peak_bytes=1024000)
         
-        executor.client = mock_client
+        def run_program(exec_id):
+            write_cgroup(tmp_path, mock_container.id, usage_usec=47000, peak_bytes=1024000)
+            write_streams(mock_client, stdout=b"Hello, World!")
+        
+        mock_client.api.exec_start.side_effect = run_program
+        
+        with patch.object(settings, "CGROUP_ROOT", str(tmp_path)):
+            result = executor.execute(
+                language="python",
+                source_code="print('Hello, World!')",
+                input_data="",
+                time_limit_ms=2000,
+                memory_limit_mb=256,
+                output_limit_kb=64
+            )
+        
+        assert result.verdict == "OK"
+        assert result.output == "Hello, World!"
+        assert result.exit_code == 0
+        assert result.time_ms == 42
+        assert result.memory_kb == 1000
+        assert os.path.isdir(cgroup_dir)
+        mock_container.stats.assert_not_called()
+    
+    @patch('docker.from_env')
+    def test_execute_timeout(self, mock_docker, executor, tmp_path):
+        """Test execution timeout handling."""
+        mock_client, mock_container = sandbox_client()
+        mock_docker.return_value = mock_client
+        attach_sandbox(executor, mock_client, tmp_path)
+        
+        # Mock timeout scenario: the exec only returns once the container is killed
+        killed = threading.Event()
+        mock_client.api.exec_start.side_effect = lambda exec_id: killed.wait(5)
+        mock_container.kill.side_effect = killed.set
         
         result = executor.execute(
             language="python",
-            source_code="print('Hello, World!')",
+            source_code="import time; time.sleep(10)",
             input_data="",
-            time_limit_ms=2000,
+            time_limit_ms=100,
             memory_limit_mb=256,
             output_limit_kb=64
         )
         
-        assert result.verdict == "OK"
-        assert result.output == "Hello, World!"
-        assert result.exit_code == 0
-        assert result.memory_kb == 1000
+        assert result.verdict == "TLE"
+        assert result.exit_code == 124
+        assert result.limit_rule == "wall_time"
+        assert result.wall_time_ms < 1000  # Killed at 2x the limit, not limit + 1s
+        mock_container.kill.assert_called_once()
     
     @patch('docker.from_env')
-    def test_execute_timeout(self, mock_docker, executor):
-        """Test execution timeout handling."""
-        mock_client = Mock()
-        mock_container = Mock()
+    def test_execute_killed_at_cpu_limit(self, mock_docker, executor, tmp_path):
+        """Test the watchdog kills a CPU-bound run as soon as it crosses the limit."""
+        mock_client, mock_container = sandbox_client()
+        mock_docker.return_value = mock_client
+        attach_sandbox(executor, mock_client, tmp_path)
+        write_cgroup(tmp_path, mock_container.id, usage_usec=0, peak_bytes=0)
+        
+        killed = threading.Event()
+        mock_container.kill.side_effect = killed.set
+        
+        def spin(exec_id):
+            write_cgroup(tmp_path, mock_container.id, usage_usec=1_050_000, peak_bytes=4096)
+            killed.wait(5)
         
+        mock_client.api.exec_start.side_effect = spin
+        
+        with patch.object(settings, "CGROUP_ROOT", str(tmp_path)):
+            result = executor.execute(
+                language="python",
+                source_code="while True: pass",
+                input_data="",
+                time_limit_ms=1000,
+                memory_limit_mb=256,
+                output_limit_kb=64
+            )
+        
+        assert result.verdict == "TLE"
+        assert result.limit_rule == "cpu_time"
+        assert result.time_ms == 1050
+        assert result.wall_time_ms < 1000
+        mock_container.kill.assert_called_once()
+    
+    @patch('docker.from_env')
+    def test_execute_memory_limit(self, mock_docker, executor, tmp_path):
+        """Test an OOM-killed run is reported as MLE from the cgroup peak."""
+        mock_client, mock_container = sandbox_client(exit_code=137)
         mock_docker.return_value = mock_client
-        mock_client.containers.run.return_value = mock_container
+        attach_sandbox(executor, mock_client, tmp_path)
+        write_cgroup(tmp_path, mock_container.id, usage_usec=0, peak_bytes=0)
         
-        # Mock timeout scenario
-        mock_container.wait.side_effect = Exception("Timeout")
-        mock_container.logs.side_effect = [b"", b""]
-        mock_container.kill = Mock()
+        def run_program(exec_id):
+            write_cgroup(tmp_path, mock_container.id, usage_usec=1000, peak_bytes=64 * 1024 * 1024)
+            write_streams(mock_client, stderr=b"Killed")
         
-        executor.client = mock_client
+        mock_client.api.exec_start.side_effect = run_program
+        
+        with patch.object(settings, "CGROUP_ROOT", str(tmp_path)):
+            result = executor.execute(
+                language="python",
+                source_code="x = [0] * 10 ** 9",
+                input_data="",
+                time_limit_ms=2000,
+                memory_limit_mb=64,
+                output_limit_kb=64
+            )
+        
+        assert result.verdict == "MLE"
+        assert result.memory_kb == 64 * 1024
+    
+    @patch('docker.from_env')
+    def test_output_is_file_backed(self, mock_docker, executor, tmp_path):
+        """Test stdio is redirected to files and OLE is judged from the file size."""
+        mock_client, _ = sandbox_client(stdout=b"x" * (2 * 1024 + 1))
+        mock_docker.return_value = mock_client
+        attach_sandbox(executor, mock_client, tmp_path)
+        
+        compiled = executor.compile("python", "print('x' * 10 ** 9)", memory_limit_mb=256)
+        try:
+            result = executor.run(compiled, "", time_limit_ms=1000, memory_limit_mb=256, output_limit_kb=2)
+            
+            assert result.verdict == "OLE"
+            assert result.output_bytes == 2 * 1024 + 1
+            assert os.path.getsize(result.output_path) == result.output_bytes
+            assert os.path.dirname(result.output_path) == compiled.work_dir
+        finally:
+            executor.cleanup(compiled)
+        
+        script = mock_client.api.exec_create.call_args.args[1][2]
+        assert "ulimit -f 5" in script
+        assert "< input.txt > stdout.txt 2> stderr.txt" in script
+        mock_client.api.exec_start.assert_called_once_with("exec1")
+    
+    @patch('docker.from_env')
+    def test_runaway_output_killed_early(self, mock_docker, executor, tmp_path):
+        """Test a run is killed with OLE as soon as stdout passes the limit."""
+        mock_client, mock_container = sandbox_client()
+        mock_docker.return_value = mock_client
+        attach_sandbox(executor, mock_client, tmp_path)
+        
+        killed = threading.Event()
+        mock_container.kill.side_effect = killed.set
+        
+        def flood(exec_id):
+            write_streams(mock_client, stdout=b"y\n" * 4096)
+            killed.wait(5)
+        
+        mock_client.api.exec_start.side_effect = flood
         
         result = executor.execute(
             language="python",
-            source_code="import time; time.sleep(10)",
+            source_code="while True: print('y')",
             input_data="",
             time_limit_ms=1000,
             memory_limit_mb=256,
-            output_limit_kb=64
+            output_limit_kb=4
         )
         
-        assert result.verdict == "RE"  # Runtime error due to timeout
+        assert result.verdict == "OLE"
+        assert result.limit_rule == "output"
+        assert result.wall_time_ms < 1000
         mock_container.kill.assert_called_once()
+    
+    def test_compile_once_run_many(self, executor, tmp_path):
+        """Test a compiled workspace is reused across runs."""
+        mock_client, _ = sandbox_client()
+        mock_client.containers.run.side_effect = fake_compile
+        attach_sandbox(executor, mock_client, tmp_path)
+        executor.compile_cache = None
+        
+        compiled = executor.compile("cpp", "int main() {}", memory_limit_mb=256)
+        try:
+            assert compiled.success
+            assert os.path.exists(os.path.join(compiled.work_dir, "solution.cpp"))
+            
+            for _ in range(3):
+                result = executor.run(compiled, "", time_limit_ms=2000, memory_limit_mb=256, output_limit_kb=64)
+                assert result.verdict == "OK"
+                os.remove(result.output_path)
+            
+            commands = [call.kwargs["command"] for call in mock_client.containers.run.call_args_list]
+            assert sum(1 for cmd in commands if "g++" in cmd) == 1
+            exec_commands = [call.args[1] for call in mock_client.api.exec_create.call_args_list]
+            assert [cmd[-1] for cmd in exec_commands] == ["./solution"] * 3
+            assert sorted(os.listdir(compiled.work_dir)) == ["solution", "solution.cpp"]
+        finally:
+            executor.cleanup(compiled)
+        
+        assert not os.path.exists(compiled.work_dir)
+    
+    def test_cancel_run_kills_only_that_run(self, executor, tmp_path):
+        """Test cancel_run() kills the sandbox of one run, leaves the others, and refuses that run later."""
+        compiled = CompileResult(success=True, language="python", work_dir=str(tmp_path), time_ms=0, error="", exit_code=0)
+        sandboxes = {}
+        release = threading.Event()
+        
+        def run_sandboxed(work_dir, lang_config, input_path, output_path, **limits):
+            sandbox = Mock()
+            executor._track_run(work_dir, sandbox)
+            with open(input_path) as f:
+                sandboxes[f.read()] = sandbox
+            release.wait(5)
+            executor._untrack_run(work_dir, sandbox)
+            return ExecutionResult(verdict="OK", time_ms=1, memory_kb=1, output="", error="", exit_code=0)
+        
+        def run(run_key):
+            return executor.run(compiled, run_key, time_limit_ms=1000, memory_limit_mb=256, output_limit_kb=64, run_key=run_key)
+        
+        with patch.object(executor, "_run_sandboxed", side_effect=run_sandboxed):
+            threads = [threading.Thread(target=run, args=(run_key,)) for run_key in ("a", "b")]
+            for thread in threads:
+                thread.start()
+            while len(sandboxes) < 2:
+                time.sleep(0.01)
+            
+            executor.cancel_run(compiled, "a")
+            release.set()
+            for thread in threads:
+                thread.join()
+            
+            sandboxes["a"].kill.assert_called_once()
+            sandboxes["b"].kill.assert_not_called()
+            assert run("a").error == "Run cancelled"
+            assert run("c").verdict == "OK"
+        
+        executor.cleanup(compiled)
+        assert not executor._cancelled_runs and not executor._keyed_runs
+    
+    def test_compile_error(self, executor):
+        """Test compilation failures are reported with their log."""
+        mock_client = Mock()
+        mock_container = Mock()
+        mock_client.containers.run.return_value = mock_container
+        mock_container.wait.return_value = {"StatusCode": 1}
+        mock_container.logs.side_effect = [b"", b"error: expected ';'"]
+        mock_container.stats.return_value = {"memory_stats": {"usage": 0}}
+        executor.client = mock_client
+        executor.compile_cache = None
+        
+        result = executor.execute(
+            language="cpp",
+            source_code="int main() {",
+            input_data="",
+            time_limit_ms=2000,
+            memory_limit_mb=256,
+            output_limit_kb=64
+        )
+        
+        assert result.verdict == "CE"
+        assert "expected ';'" in result.error
+        assert mock_client.containers.run.call_count == 1
+    
+    def test_compile_cache_hit_skips_compiler(self, executor):
+        """Test an identical source is compiled only once across submissions."""
+        mock_client = Mock()
+        mock_client.images.get.return_value.id = "sha256:gcc13"
+        mock_client.containers.run.side_effect = fake_compile
+        executor.client = mock_client
+        
+        with tempfile.TemporaryDirectory() as cache_dir:
+            executor.compile_cache = CompileCache(cache_dir, max_bytes=1024 * 1024)
+            
+            first = executor.compile("cpp", "int main() {}", memory_limit_mb=256)
+            second = executor.compile("cpp", "int main() {}", memory_limit_mb=256)
+            try:
+                assert not first.cached
+                assert second.cached
+                assert mock_client.containers.run.call_count == 1
+                with open(os.path.join(second.work_dir, "solution"), "rb") as f:
+                    assert f.read() == b"\x7fELF"
+                assert executor.compile_cache.stats() == {"hits": 1, "misses": 1, "evictions": 0}
+            finally:
+                executor.cleanup(first)
+                executor.cleanup(second)
+
+
+class TestCompileCache:
+    
+    def _write_artifact(self, work_dir, size):
+        with open(os.path.join(work_dir, "solution"), "wb") as f:
+            f.write(b"x" * size)
+    
+    def test_key_depends_on_every_component(self):
+        """Test the cache key changes with language, image, flags and source."""
+        base = CompileCache.make_key("cpp", "sha256:a", ["g++", "-O2"], "abc")
+        assert base == CompileCache.make_key("cpp", "sha256:a", ["g++", "-O2"], "abc")
+        assert base != CompileCache.make_key("cpp", "sha256:b", ["g++", "-O2"], "abc")
+        assert base != CompileCache.make_key("cpp", "sha256:a", ["g++", "-O0"], "abc")
+        assert base != CompileCache.make_key("cpp", "sha256:a", ["g++", "-O2"], "abd")
+    
+    def test_lru_eviction(self):
+        """Test least recently used entries are evicted once over the size budget."""
+        with tempfile.TemporaryDirectory() as cache_dir, tempfile.TemporaryDirectory() as work_dir:
+            cache = CompileCache(cache_dir, max_bytes=250)
+            self._write_artifact(work_dir, 100)
+            
+            cache.store("aa" + "0" * 62, work_dir, ["solution"])
+            cache.store("bb" + "0" * 62, work_dir, ["solution"])
+            os.utime(os.path.join(cache_dir, "aa", "aa" + "0" * 62), (0, 0))
+            cache.store("cc" + "0" * 62, work_dir, ["solution"])
+            
+            assert not cache.fetch("aa" + "0" * 62, work_dir, ["solution"])
+            assert cache.fetch("bb" + "0" * 62, work_dir, ["solution"])
+            assert cache.fetch("cc" + "0" * 62, work_dir, ["solution"])
+            assert cache.stats() == {"hits": 2, "misses": 1, "evictions": 1}
+    
+    def test_store_scans_only_when_over_budget(self):
+        """Test stores keep a running size and walk the cache dir only once it may be over budget."""
+        with tempfile.TemporaryDirectory() as cache_dir, tempfile.TemporaryDirectory() as work_dir:
+            cache = CompileCache(cache_dir, max_bytes=250)
+            self._write_artifact(work_dir, 100)
+            
+            with patch.object(cache, "evict", wraps=cache.evict) as evict:
+                cache.store("aa" + "0" * 62, work_dir, ["solution"])  # First store learns the size
+                cache.store("bb" + "0" * 62, work_dir, ["solution"])
+                assert evict.call_count == 1
+                
+                cache.store("cc" + "0" * 62, work_dir, ["solution"])
+                assert evict.call_count == 2
+            
+            assert cache.stats()["evictions"] == 1
+
+
+class TestVerdictCache:
+    
+    CONFIG = {"time_limit_ms": 1000, "checker_type": "token"}
+    
+    def test_key_depends_on_every_component(self):
+        """Test the key changes with language, image, source and judge settings."""
+        base = VerdictCache.make_key("cpp", "sha256:a", "abc", self.CONFIG)
+        assert base == VerdictCache.make_key("cpp", "sha256:a", "abc", dict(reversed(list(self.CONFIG.items()))))
+        assert base != VerdictCache.make_key("python", "sha256:a", "abc", self.CONFIG)
+        assert base != VerdictCache.make_key("cpp", "sha256:b", "abc", self.CONFIG)
+        assert base != VerdictCache.make_key("cpp", "sha256:a", "abd", self.CONFIG)
+        assert base != VerdictCache.make_key("cpp", "sha256:a", "abc", {**self.CONFIG, "time_limit_ms": 2000})
+    
+    def test_new_version_invalidates_old_results(self, tmp_path):
+        """Test results are stored per problem version and older versions are dropped."""
+        cache = VerdictCache(str(tmp_path), max_entries_per_version=10)
+        key = VerdictCache.make_key("cpp", "sha256:a", "abc", self.CONFIG)
+        
+        cache.store(1, 1, key, {"verdict": "wa"})
+        assert cache.fetch(1, 1, key) == {"verdict": "wa"}
+        assert cache.fetch(1, 2, key) is None
+        
+        cache.store(1, 2, key, {"verdict": "ac"})
+        assert cache.fetch(1, 1, key) is None
+        assert cache.fetch(1, 2, key) == {"verdict": "ac"}
+        assert os.listdir(tmp_path / "1") == ["v2"]
+        assert cache.stats() == {"hits": 2, "misses": 2, "evictions": 0}
+    
+    def test_lru_eviction_per_version(self, tmp_path):
+        """Test least recently used results are evicted past the per-version limit."""
+        cache = VerdictCache(str(tmp_path), max_entries_per_version=2)
+        keys = [VerdictCache.make_key("cpp", "sha256:a", source, self.CONFIG) for source in "abc"]
+        
+        cache.store(1, 1, keys[0], {})
+        cache.store(1, 1, keys[1], {})
+        os.utime(tmp_path / "1" / "v1" / f"{keys[0]}.json", (0, 0))
+        cache.store(1, 1, keys[2], {})
+        
+        assert [cache.fetch(1, 1, key) is not None for key in keys] == [False, True, True]
+        assert cache.stats()["evictions"] == 1
+
+
+class TestTestDataStore:
+    
+    def test_content_addressed_roundtrip(self, tmp_path):
+        """Test blobs are named by their sha256, stored once, and read back intact."""
+        store = testdata_store.TestDataStore(testdata_store.LocalStoreBackend(str(tmp_path)))
+        
+        blob = store.put("1 2\n")
+        again = store.put(b"1 2\n")
+        
+        assert blob == again
+        assert blob.sha256 == hashlib.sha256(b"1 2\n").hexdigest()
+        assert (blob.size, blob.preview) == (4, "1 2\n")
+        assert os.listdir(tmp_path / blob.sha256[:2]) == [blob.sha256]
+        assert store.read_text(blob.sha256) == "1 2\n"
+    
+    def test_same_as_api_copy(self):
+        """Test this module matches the API's copy apart from imports, so both name and frame blobs alike."""
+        api_copy = os.path.join(os.path.dirname(__file__), "..", "..", "apps", "api", "core", "testdata_store.py")
+        if not os.path.exists(api_copy):
+            pytest.skip("API sources are not in this checkout")
+        
+        def code(path):
+            with open(path) as f:
+                return [line for line in f if not line.startswith(("import ", "from "))]
+        
+        assert code(testdata_store.__file__) == code(api_copy)
+    
+    def test_put_stream_and_copy_to(self, tmp_path):
+        """Test streamed puts hash the whole content and keep a short preview."""
+        store = testdata_store.TestDataStore(testdata_store.LocalStoreBackend(str(tmp_path / "store")))
+        data = b"7 " * 3_000_000
+        
+        with open(tmp_path / "big.in", "wb") as f:
+            f.write(data)
+        with open(tmp_path / "big.in", "rb") as f:
+            blob = store.put_stream(f)
+        
+        assert blob == store.put(data)
+        assert blob.preview == "7 " * 50 + "..."
+        assert store.copy_to(blob.sha256, str(tmp_path / "copy.in")) == len(data)
+        assert (tmp_path / "copy.in").read_bytes() == data
+    
+    def test_zstd_compression(self, tmp_path):
+        """Test compressed blobs are written with a .zst suffix and readable either way."""
+        pytest.importorskip("zstandard")
+        backend = testdata_store.LocalStoreBackend(str(tmp_path))
+        compressed = testdata_store.TestDataStore(backend, compression="zstd")
+        plain = testdata_store.TestDataStore(backend)
+        
+        blob = compressed.put("0\n" * 100_000)
+        
+        path = tmp_path / blob.sha256[:2] / (blob.sha256 + ".zst")
+        assert path.stat().st_size < 1000
+        assert plain.read(blob.sha256) == b"0\n" * 100_000
+        assert plain.put("0\n" * 100_000) == blob  # Already stored, not rewritten
+        assert os.listdir(path.parent) == [path.name]
+    
+    def test_missing_blob(self, tmp_path):
+        """Test reading an unknown hash raises FileNotFoundError."""
+        store = testdata_store.TestDataStore(testdata_store.LocalStoreBackend(str(tmp_path)))
+        
+        with pytest.raises(FileNotFoundError):
+            store.read("0" * 64)
+        with pytest.raises(ValueError):
+            store.read("../../etc/passwd")
+
+
+class TestTestDataCache:
+    
+    @pytest.fixture
+    def store(self, tmp_path):
+        return testdata_store.TestDataStore(testdata_store.LocalStoreBackend(str(tmp_path / "store")))
+    
+    def _cache(self, tmp_path, store, max_bytes):
+        return testdata_cache.TestDataCache(str(tmp_path / "cache"), max_bytes, store)
+    
+    def _rows(self, store, input_data, output_data, testcase_id=1):
+        return [(testcase_id, store.put(input_data).sha256, store.put(output_data).sha256)]
+    
+    def test_fill_once_then_hit(self, tmp_path, store):
+        """Test the loader runs only on a miss and hits count the bytes not fetched."""
+        cache = self._cache(tmp_path, store, max_bytes=10_000)
+        loads = []
+        
+        def load():
+            loads.append(1)
+            return self._rows(store, "1 2\n", "3\n", testcase_id=7)
+        
+        for _ in range(3):
+            with cache.entry(1, 1, load) as entry:
+                with open(entry.input_path(7)) as f:
+                    assert f.read() == "1 2\n"
+                assert os.stat(entry.input_path(7)).st_mode & 0o777 == 0o444
+        
+        assert len(loads) == 1
+        stats = cache.stats()
+        assert (stats["hits"], stats["misses"], stats["bytes_saved"]) == (2, 1, 12)
+    
+    def test_lookups_exported_as_metrics(self, tmp_path, store):
+        """Test hits, misses and bytes saved reach the Prometheus counters."""
+        cache = self._cache(tmp_path, store, max_bytes=10_000)
+        lookups, bytes_saved = Mock(), Mock()
+        
+        with patch.object(metrics, "CACHE_LOOKUPS", lookups), patch.object(metrics, "TESTDATA_BYTES_SAVED", bytes_saved):
+            for _ in range(2):
+                with cache.entry(1, 1, lambda: self._rows(store, "1 2\n", "3\n")):
+                    pass
+        
+        assert [c.args for c in lookups.labels.call_args_list] == [("testdata", "miss"), ("testdata", "hit")]
+        bytes_saved.inc.assert_called_once_with(6)
+    
+    def test_new_version_replaces_old(self, tmp_path, store):
+        """Test a version bump refills and drops the previous version."""
+        cache = self._cache(tmp_path, store, max_bytes=10_000)
+        
+        with cache.entry(1, 1, lambda: self._rows(store, "old", "old", testcase_id=7)):
+            pass
+        with cache.entry(1, 2, lambda: self._rows(store, "new", "new", testcase_id=7)) as entry:
+            with open(entry.output_path(7)) as f:
+                assert f.read() == "new"
+        
+        assert os.listdir(tmp_path / "cache" / "1") == ["v2"]
+    
+    def test_lru_eviction_skips_entries_in_use(self, tmp_path, store):
+        """Test eviction removes least recently used versions, never pinned ones."""
+        cache = self._cache(tmp_path, store, max_bytes=250)
+        rows = lambda: self._rows(store, "i" * 50, "o" * 50)  # noqa: E731
+        
+        with cache.entry(1, 1, rows):
+            with cache.entry(2, 1, rows):
+                pass
+            os.utime(tmp_path / "cache" / "2" / "v1", (0, 0))
+            # Problem 1 is the oldest entry once 3 arrives, but it is pinned
+            os.utime(tmp_path / "cache" / "1" / "v1", (0, 0))
+            with cache.entry(3, 1, rows):
+                pass
+            
+            assert cache.get(1, 1) is not None
+            assert cache.get(2, 1) is None
+        
+        assert cache.stats()["evictions"] == 1
+    
+    def test_expected_digest_stored_with_entry(self, tmp_path, store):
+        """Test expected outputs are normalized once on fill and reloaded with the entry."""
+        cache = self._cache(tmp_path, store, max_bytes=10_000)
+        
+        with cache.entry(1, 1, lambda: self._rows(store, "1 2\n", "3 \n4\n", testcase_id=7)) as entry:
+            assert entry.expected_digest(7) == Checker.digest(b"3 \n4\n")
+        
+        assert cache.get(1, 1).expected_digest(7) == Checker.digest(b"3 \n4\n")
+        assert cache.get(1, 1).expected_digest(8) is None
 
 
 class TestChecker:
     
+    def test_digest_fast_path(self):
+        """Test normalized hashes accept equivalent outputs and defer everything else."""
+        digest = Checker.digest("1 2\n3 é\n\n".encode())
+        
+        assert Checker.matches_digest("diff", digest, "1 2\n3 é   \n".encode())
+        assert not Checker.matches_digest("diff", digest, "1 2 3 é\n".encode())
+        assert Checker.matches_digest("token", digest, "1\n2 3\té".encode())
+        assert not Checker.matches_digest("token", digest, "1 2 3 é 4".encode())
+        assert not Checker.matches_digest("float_eps", digest, "1 2\n3 é\n".encode())
+        assert not Checker.matches_digest("diff", None, "1 2\n3 é\n".encode())
+    
     def test_check_diff_exact_match(self):
         """Test exact diff checking with matching output."""
         expected = "42\n"
@@ -173,6 +722,65 @@ class TestChecker:
         assert result == CheckerResult.AC
         assert message == "Accepted"
     
+    def test_read_output_small_and_mapped(self, tmp_path):
+        """Test output files are read whole or memory-mapped depending on size."""
+        small = tmp_path / "small.txt"
+        small.write_bytes("héllo\n".encode())
+        assert Checker.read_output(str(small)) == "héllo\n"
+        
+        large = tmp_path / "large.txt"
+        large.write_bytes(b"1 2 3\n" * 300000)
+        assert Checker.read_output(str(large)) == "1 2 3\n" * 300000
+    
+    @pytest.mark.parametrize("chunk_bytes", [1, 3, 1024])
+    def test_streaming_across_chunk_boundaries(self, tmp_path, chunk_bytes):
+        """Test file-backed outputs give the same verdicts whatever the chunk size."""
+        expected = tmp_path / "expected.txt"
+        expected.write_bytes("1.5 héllo\n2 3\n\n".encode())
+        actual = tmp_path / "actual.txt"
+        
+        with patch("judge.checker.CHUNK_BYTES", chunk_bytes):
+            actual.write_bytes("1.5  héllo\n2 3".encode())
+            assert Checker.check_diff(OutputFile(str(expected)), OutputFile(str(actual)))[0] == CheckerResult.WA
+            assert Checker.check_token(OutputFile(str(expected)), OutputFile(str(actual)))[0] == CheckerResult.AC
+            assert Checker.check_float_eps(OutputFile(str(expected)), OutputFile(str(actual)))[0] == CheckerResult.AC
+            
+            actual.write_bytes("1.5 héllo\n2 3 \n\t".encode())
+            assert Checker.check_diff(OutputFile(str(expected)), OutputFile(str(actual)))[0] == CheckerResult.AC
+            assert Checker.digest(OutputFile(str(expected))) == Checker.digest(expected.read_bytes())
+    
+    def test_check_float_relative_epsilon(self):
+        """Test large values are compared against a tolerance relative to the expected value."""
+        expected = "1000000.0 0.5 word\n"
+        
+        assert Checker.check_float_eps(expected, "1000000.5 0.5 word", epsilon=1e-6)[0] == CheckerResult.WA
+        assert Checker.check_float_eps(
+            expected, "1000000.5 0.5 word", epsilon=1e-6, relative_epsilon=1e-6
+        )[0] == CheckerResult.AC
+        # Small values still need the absolute tolerance
+        result, message = Checker.check_float_eps(expected, "1000000 0.5001 word", epsilon=1e-6, relative_epsilon=1e-6)
+        assert (result, message) == (CheckerResult.WA, "Value mismatch at line 1, token 2")
+    
+    def test_check_float_reports_first_mismatch_across_windows(self):
+        """Test bulk-parsed windows still report the first mismatching line and token."""
+        expected = "".join(f"{i}.25 {i}.5 x\n" for i in range(3000))
+        actual = expected.replace("1234.5 x", "1234.5 y").replace("2000.25", "2000.3")
+        
+        with patch("judge.checker.CHUNK_BYTES", 1000):
+            result, message = Checker.check_float_eps(expected, actual, epsilon=1e-3)
+        
+        assert (result, message) == (CheckerResult.WA, "Token mismatch at line 1235, token 3")
+    
+    def test_mismatch_positions(self):
+        """Test checkers stop at the first mismatch and report where it is."""
+        assert Checker.check_diff("a\nb\nc\n", "a\nb\nd\n")[1] == "Output doesn't match expected at line 3"
+        assert Checker.check_token("1 2 3\n4 5", "1 2 3\n4 6 7")[1] == (
+            "Tokens don't match expected at token 5 (line 2): expected '5', got '6'"
+        )
+        assert "output ended after 4 tokens" in Checker.check_token("1 2 3\n4 5", "1 2 3 4")[1]
+        assert Checker.check_float_eps("1 2\n3", "1\n2 3")[1] == "Different number of tokens on line 1"
+        assert Checker.check_float_eps("1\n2", "1\n")[1] == "Different number of lines"
+    
     def test_check_output_dispatch(self):
         """Test the main check_output function dispatches correctly."""
         expected = "42"
@@ -192,4 +800,475 @@ class TestChecker:
         
         # Test unknown checker defaults to diff
         result, message = Checker.check_output("unknown", expected, actual)
-        assert result == CheckerResult.AC
\ No newline at end of file
+        assert result == CheckerResult.AC
+
+
+CHECKER_SOURCE = """
+import sys, time
+for line in sys.stdin:
+    _, answer, output = (open(name).read().split() for name in line.split())
+    if output == answer:
+        print("ok")
+    elif output == ["sleep"]:
+        time.sleep(10)
+    elif output[:1] == answer[:1]:
+        print("ok 0.5 first token right")
+    else:
+        print("wa 0 expected", answer[0])
+    sys.stdout.flush()
+"""
+
+
+class LocalProcess(SandboxProcess):
+    def __init__(self, workspace, process):
+        super().__init__(workspace)
+        self.process = process
+    
+    def kill(self):
+        self.process.kill()
+    
+    def finished(self, timeout):
+        try:
+            self.process.wait(timeout)
+            return True
+        except subprocess.TimeoutExpired:
+            return False
+    
+    def exit_code(self):
+        return self.process.returncode
+    
+    def cpu_usec(self):
+        # utime + stime of the program itself (sh execs it), in clock ticks
+        try:
+            with open(f"/proc/{self.process.pid}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+        except OSError:
+            return 0
+        return (int(fields[11]) + int(fields[12])) * 1000000 // os.sysconf("SC_CLK_TCK")
+    
+    def _release(self):
+        shutil.rmtree(self.workspace, ignore_errors=True)
+
+
+class LocalExecutor(ExecutorBackend):
+    """Starts programs as plain host processes (no sandbox), to exercise the FIFO protocol."""
+    
+    def _toolchain_digest(self, lang_config):
+        return "local"
+    
+    def _compile_sandboxed(self, work_dir, lang_config, memory_limit_mb):
+        raise NotImplementedError
+    
+    def _run_sandboxed(self, *args, **kwargs):
+        raise NotImplementedError
+    
+    def _start_sandboxed(self, work_dir, lang_config, time_limit_ms, memory_limit_mb, files=None, stdout_first=False):
+        slot_dir = tempfile.mkdtemp(prefix="slot_", dir=work_dir)
+        self._stage_files(slot_dir, files)
+        redirects = f"> {STDOUT_FIFO} < {STDIN_FIFO}" if stdout_first else f"< {STDIN_FIFO} > {STDOUT_FIFO}"
+        process = subprocess.Popen(
+            ["sh", "-c", f'exec "$@" {redirects} 2> stderr.txt', "sh",
+             sys.executable, os.path.join(work_dir, "solution.py")],
+            cwd=slot_dir
+        )
+        return LocalProcess(slot_dir, process)
+
+
+class TestCustomChecker:
+    
+    @pytest.fixture
+    def executor(self, tmp_path):
+        with patch.object(settings, "JUDGE_WORK_DIR", str(tmp_path)), \
+                patch.object(settings, "COMPILE_CACHE_ENABLED", False):
+            yield LocalExecutor()
+    
+    @pytest.fixture
+    def session(self, executor):
+        compiled = executor.compile("python", CHECKER_SOURCE, 64)
+        session = CustomCheckerSession(
+            executor, compiled, max_processes=2, time_limit_ms=2000, memory_limit_mb=64, lifetime_limit_ms=60000
+        )
+        yield session
+        session.close()
+        executor.cleanup(compiled)
+    
+    def test_verdicts_from_one_warm_process(self, session, tmp_path):
+        """Test every test is judged by the same running checker, which sees files."""
+        output_file = tmp_path / "output.txt"
+        output_file.write_text("1 2 3\n")
+        
+        assert session.check("in", "1 2 3", OutputFile(str(output_file))) == (CheckerResult.AC, 1.0, "Accepted")
+        assert session.check("in", "1 2 3", "1 5") == (CheckerResult.AC, 0.5, "first token right")
+        assert session.check("in", "1 2 3", "4") == (CheckerResult.WA, 0.0, "expected 1")
+        assert session.started == 1
+        # Test files are removed from the checker's workspace after each check
+        assert output_file.exists()
+        assert sorted(os.listdir(session._idle[0].workspace)) == sorted([STDIN_FIFO, STDOUT_FIFO, "stderr.txt"])
+    
+    def test_concurrent_checks_get_separate_processes(self, session):
+        """Test tests in flight at once each get a process, up to max_processes."""
+        barrier = threading.Barrier(3)
+        
+        def check():
+            barrier.wait()
+            return session.check("in", "1", "1")
+        
+        threads = [threading.Thread(target=check) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        assert 1 <= session.started <= 2
+        assert len(session._idle) == session.started
+    
+    def test_timeout_replaces_process(self, session):
+        """Test a checker that stops answering fails the check and is replaced."""
+        session.time_limit_ms = 300
+        
+        with pytest.raises(CheckerError, match="did not answer"):
+            session.check("in", "1", "sleep")
+        
+        assert session.check("in", "1", "1").result == CheckerResult.AC
+        assert session.started == 2
+    
+    def test_cache_compiles_once_per_version(self):
+        """Test a problem version compiles once and older versions are dropped."""
+        cache = CheckerCache(max_entries=4)
+        cleaned = []
+        
+        def compile_checker():
+            return Mock(success=True)
+        
+        for version in (1, 1, 2):
+            with cache.lease(1, version, compile_checker, cleaned.append):
+                pass
+        
+        assert cache.compiles == 2
+        assert len(cleaned) == 1
+        assert list(cache._entries) == [(1, 2)]
+        
+        failed = Mock(success=False, error="syntax error")
+        with pytest.raises(CheckerError, match="syntax error"):
+            with cache.lease(2, 1, lambda: failed, cleaned.append):
+                pass
+        assert cleaned[-1] is failed
+
+
+INTERACTOR_SOURCE = """
+import sys
+count = int(open("input.txt").read())
+for i in range(count):
+    print(i, flush=True)
+    if sys.stdin.readline().strip() != str(2 * i):
+        sys.exit(1)
+print(-1, flush=True)
+"""
+
+DOUBLING_SOLUTION = """
+import sys
+for line in sys.stdin:
+    if line.strip() == "-1":
+        break
+    sys.stdout.write(f"{2 * int(line)}\\n")
+    sys.stdout.flush()
+"""
+
+
+class TestInteractive:
+    
+    @pytest.fixture
+    def executor(self, tmp_path):
+        with patch.object(settings, "JUDGE_WORK_DIR", str(tmp_path)), \
+                patch.object(settings, "COMPILE_CACHE_ENABLED", False), \
+                patch.object(settings, "INTERACTIVE_IDLE_MS", 300):
+            yield LocalExecutor()
+    
+    def interact(self, executor, solution_source, interactor_source=INTERACTOR_SOURCE, input_data="3"):
+        solution = executor.compile("python", solution_source, 64)
+        interactor = executor.compile("python", interactor_source, 64)
+        try:
+            return executor.run_interactive(
+                solution, interactor,
+                input_data=input_data,
+                answer_data="",
+                time_limit_ms=5000,
+                memory_limit_mb=64,
+                interactor_time_limit_ms=5000,
+                interactor_memory_limit_mb=64
+            )
+        finally:
+            executor.cleanup(solution)
+            executor.cleanup(interactor)
+    
+    def test_many_exchanges(self, executor):
+        """Test the two programs talk directly, fast enough for thousands of rounds."""
+        result = self.interact(executor, DOUBLING_SOLUTION, input_data="20000")
+        
+        assert (result.solution.verdict, result.interactor.exit_code) == ("OK", 0)
+        assert interaction_verdict(result) == ("AC", 1.0)
+    
+    def test_wrong_answer(self, executor):
+        """Test the interactor's exit code decides the verdict."""
+        result = self.interact(executor, DOUBLING_SOLUTION.replace("2 * int(line)", "3 * int(line)"))
+        
+        assert result.interactor.exit_code == 1
+        assert interaction_verdict(result) == ("WA", 0.0)
+    
+    def test_deadlock_detected(self, executor):
+        """Test both sides waiting to read is cut short as an idleness TLE."""
+        interactor = "import sys\nsys.stdin.readline()\n"
+        result = self.interact(executor, "input()", interactor_source=interactor)
+        
+        assert (result.solution.verdict, result.solution.limit_rule) == ("TLE", "idle")
+        assert interaction_verdict(result) == ("TLE", 0.0)
+    
+    def test_interactor_failure(self, executor):
+        """Test an interactor that fails is a judge error, not a verdict."""
+        result = self.interact(executor, DOUBLING_SOLUTION, interactor_source="import sys\nprint(-1)\nsys.exit(3)")
+        
+        with pytest.raises(CheckerError, match="exit code 3"):
+            interaction_verdict(result)
+
+
+class TestContainerPool:
+    
+    @pytest.fixture
+    def executor(self):
+        return DockerExecutor()
+    
+    @pytest.fixture
+    def pool(self, executor):
+        with tempfile.TemporaryDirectory() as slot_root:
+            mock_client = Mock()
+            mock_client.containers.run.side_effect = lambda **kwargs: Mock(id=kwargs["name"])
+            pool = ContainerPool(
+                mock_client,
+                size=2,
+                max_uses=3,
+                slot_root=slot_root,
+                container_config=executor._container_config
+            )
+            yield pool
+    
+    def _exec_ok(self, pooled):
+        pooled.container.exec_run.return_value = (0, b"")
+    
+    def test_first_lease_warms_pool(self, pool):
+        """Test the first lease pre-creates the configured number of containers."""
+        pooled = pool.lease("gcc:13", 256)
+        
+        assert pool.client.containers.run.call_count == 2
+        config = pool.client.containers.run.call_args.kwargs
+        assert config["command"] == ["sleep", "infinity"]
+        assert config["network_mode"] == "none"
+        assert config["cap_drop"] == ["ALL"]
+        assert config["read_only"] is True
+        assert config["pids_limit"] == 100
+        assert os.path.isdir(pooled.slot_dir)
+    
+    def test_release_resets_and_reuses(self, pool):
+        """Test a released container is wiped and handed out again."""
+        pooled = pool.lease("gcc:13", 256)
+        self._exec_ok(pooled)
+        with open(os.path.join(pooled.slot_dir, "output.txt"), "w") as f:
+            f.write("leftover")
+        
+        pool.release(pooled)
+        
+        assert os.listdir(pooled.slot_dir) == []
+        pooled.container.exec_run.assert_called_once()
+        assert pool.lease("gcc:13", 256) is pooled
+        assert pool.client.containers.run.call_count == 2
+    
+    def test_recycle_after_max_uses_and_anomaly(self, pool):
+        """Test containers are destroyed when worn out or unhealthy."""
+        pooled = pool.lease("gcc:13", 256)
+        self._exec_ok(pooled)
+        pooled.uses = pool.max_uses
+        pool.release(pooled)
+        pooled.container.remove.assert_called_once_with(force=True)
+        assert not os.path.exists(pooled.slot_dir)
+        
+        other = pool.lease("gcc:13", 256)
+        pool.release(other, healthy=False)
+        other.container.remove.assert_called_once_with(force=True)
+    
+    def test_memory_limit_updated_on_lease(self, pool):
+        """Test a leased container is resized to the run's memory limit."""
+        pool.lease("gcc:13", 256)
+        pooled = pool.lease("gcc:13", 512)
+        
+        pooled.container.update.assert_called_once_with(mem_limit="512m", memswap_limit="512m")
+    
+    def test_failed_memory_update_destroys_container(self, pool):
+        """Test a container that cannot be resized is removed instead of leaking out of the pool."""
+        pool.lease("gcc:13", 256)
+        pooled = pool._idle["gcc:13"][-1]
+        pooled.container.update.side_effect = RuntimeError("update failed")
+        
+        with pytest.raises(RuntimeError):
+            pool.lease("gcc:13", 512)
+        
+        pooled.container.remove.assert_called_once_with(force=True)
+        assert not os.path.exists(pooled.slot_dir)
+        assert pooled not in pool._idle["gcc:13"]
+    
+    def test_executor_runs_through_pool(self, executor, pool):
+        """Test runs exec into a pooled container instead of starting a new one."""
+        executor.pool = pool
+        executor.client = pool.client
+        pool.client.api.exec_create.return_value = {"Id": "exec1"}
+        
+        def run_program(exec_id):
+            container_id = pool.client.api.exec_create.call_args.args[0]
+            with open(os.path.join(pool.slot_root, container_id, "stdout.txt"), "wb") as f:
+                f.write(b"42\n")
+        
+        pool.client.api.exec_start.side_effect = run_program
+        pool.client.api.exec_inspect.return_value = {"ExitCode": 0}
+        
+        compiled = executor.compile("python", "print(42)", memory_limit_mb=256)
+        try:
+            for container in (pool.lease("python:3.12-slim", 256), pool.lease("python:3.12-slim", 256)):
+                self._exec_ok(container)
+                pool.release(container)
+            
+            result = executor.run(compiled, "", time_limit_ms=1000, memory_limit_mb=256, output_limit_kb=64)
+        finally:
+            executor.cleanup(compiled)
+        
+        assert result.verdict == "OK"
+        assert result.output == "42\n"
+        command = pool.client.api.exec_create.call_args.args[1]
+        assert command[-2:] == ["python3", "solution.py"]
+        assert "< input.txt" in command[2]
+        assert pool.client.containers.run.call_count == 2
+    
+    @pytest.mark.parametrize("exit_code, peak_bytes, peak_resets, reused", [
+        (0, 1024, True, True),
+        (0, 1024, False, False),  # Its lifetime peak would leak into the next run
+        (137, 1024, True, False),  # OOM-killed without a limit rule
+        (1, 256 * 1024 * 1024, True, False)  # Reached the memory limit
+    ])
+    def test_containers_with_untrustworthy_peak_not_reused(
+        self, executor, pool, tmp_path, exit_code, peak_bytes, peak_resets, reused
+    ):
+        """Test a container goes back to the pool only if its next run's memory peak is its own."""
+        executor.pool = pool
+        executor.client = pool.client
+        containers = {}
+        
+        def create(**kwargs):
+            write_cgroup(tmp_path, kwargs["name"], usage_usec=0, peak_bytes=0)
+            containers[kwargs["name"]] = Mock(id=kwargs["name"])
+            containers[kwargs["name"]].exec_run.return_value = (0, b"")
+            return containers[kwargs["name"]]
+        
+        def run_program(exec_id):
+            write_cgroup(tmp_path, pool.client.api.exec_create.call_args.args[0], usage_usec=1000, peak_bytes=peak_bytes)
+        
+        pool.client.containers.run.side_effect = create
+        pool.client.api.exec_create.return_value = {"Id": "exec1"}
+        pool.client.api.exec_start.side_effect = run_program
+        pool.client.api.exec_inspect.return_value = {"ExitCode": exit_code}
+        
+        compiled = executor.compile("python", "print(42)", memory_limit_mb=256)
+        try:
+            with patch.object(settings, "CGROUP_ROOT", str(tmp_path)), \
+                    patch.object(CgroupMonitor, "peak_is_per_run", peak_resets):
+                executor.run(compiled, "", time_limit_ms=1000, memory_limit_mb=256, output_limit_kb=64)
+        finally:
+            executor.cleanup(compiled)
+        
+        used = containers[pool.client.api.exec_create.call_args.args[0]]
+        assert used.remove.called != reused
+
+
+class TestNativeExecutor:
+    """Real runs; skipped unless the host can run the native sandbox."""
+    
+    @pytest.fixture
+    def executor(self):
+        for language in ("python", "cpp"):
+            if not os.path.isdir(os.path.join(settings.NATIVE_ROOTFS_DIR, language)):
+                pytest.skip(f"No exported {language} rootfs in {settings.NATIVE_ROOTFS_DIR}")
+        try:
+            executor = NativeExecutor()
+        except (RuntimeError, OSError) as e:
+            pytest.skip(f"Native sandbox unavailable: {e}")
+        executor.compile_cache = None
+        return executor
+    
+    def execute(self, executor, language, source_code, input_data="", time_limit_ms=1000, memory_limit_mb=64):
+        return executor.execute(
+            language=language,
+            source_code=source_code,
+            input_data=input_data,
+            time_limit_ms=time_limit_ms,
+            memory_limit_mb=memory_limit_mb,
+            output_limit_kb=64
+        )
+    
+    def test_python_success(self, executor):
+        """Test a program reads stdin and is measured by its cgroup."""
+        result = self.execute(executor, "python", "a, b = map(int, input().split())\nprint(a + b)", "1 2\n")
+        
+        assert result.verdict == "OK"
+        assert result.output == "3\n"
+        assert result.time_ms > 0
+    
+    def test_cpp_compile_and_run(self, executor):
+        """Test the compiled artifact runs, and compiler errors surface as CE."""
+        source = "#include <cstdio>\nint main() { int a, b; scanf(\"%d %d\", &a, &b); printf(\"%d\\n\", a + b); }"
+        result = self.execute(executor, "cpp", source, "20 22\n")
+        assert result.verdict == "OK"
+        assert result.output == "42\n"
+        
+        result = self.execute(executor, "cpp", "int main() {")
+        assert result.verdict == "CE"
+        assert "error" in result.error
+    
+    def test_limits(self, executor):
+        """Test CPU, wall, memory and output limits."""
+        result = self.execute(executor, "python", "while True: pass", time_limit_ms=300)
+        assert (result.verdict, result.limit_rule) == ("TLE", "cpu_time")
+        
+        result = self.execute(executor, "python", "import time\ntime.sleep(5)", time_limit_ms=300)
+        assert (result.verdict, result.limit_rule) == ("TLE", "wall_time")
+        
+        result = self.execute(executor, "python", "x = bytearray(200 * 1024 * 1024)")
+        assert result.verdict == "MLE"
+        
+        result = self.execute(executor, "python", "while True: print('x' * 1000)")
+        assert result.verdict == "OLE"
+    
+    def test_isolation(self, executor):
+        """Test the program runs unprivileged, without network, on a read-only root."""
+        source = (
+            "import os, socket\n"
+            "print(os.getuid(), os.getpid())\n"
+            "for path in ('/usr/x', '/workspace/x'):\n"
+            "    try:\n"
+            "        open(path, 'w').close(); print('writable')\n"
+            "    except OSError:\n"
+            "        print('read-only')\n"
+            "try:\n"
+            "    socket.create_connection(('1.1.1.1', 80), timeout=1); print('online')\n"
+            "except OSError:\n"
+            "    print('offline')\n"
+        )
+        result = self.execute(executor, "python", source)
+        
+        assert result.verdict == "OK"
+        assert result.output.split("\n")[:4] == ["65534 1", "read-only", "writable", "offline"]
+
+
+def test_create_executor_selects_backend():
+    """Test EXECUTOR_BACKEND picks the executor implementation."""
+    with patch.object(settings, "EXECUTOR_BACKEND", "docker"):
+        assert isinstance(create_executor(), DockerExecutor)
+    
+    with patch.object(settings, "EXECUTOR_BACKEND", "native"), \
+            patch.object(NativeExecutor, "_check_host"):
+        assert isinstance(create_executor(), NativeExecutor)
@@ -0,0 +1,478 @@
+import threading
+from types import SimpleNamespace
+from typing import Any, Dict
+from unittest.mock import Mock, patch
+
+import pytest
+
+from config import settings
+from judge import testdata_cache, testdata_store
+from judge.checker import Checker, CheckerResult
+from judge.custom_checker import CheckerVerdict
+from judge.backend import InteractiveResult
+from judge.engine import JudgeEngine
+from judge.executor import CompileResult, ExecutionResult
+from models import CheckerType, SubmissionVerdict
+from judge.verdict_cache import VerdictCache
+from tasks.judge_submission import _cache_verdict, _judge_compiled, _judged_record, _load_blobs, _reuse_verdict
+
+
+class FakeExecutor:
+    """Executor stand-in: the input is "<verdict> <output> <delay_ms>"."""
+
+    def __init__(self):
+        self.started = []
+        self.killed = []  # Inputs of runs stopped by cancel_run()
+        self.events = []  # ("killed" or "done", input) as runs end
+        self.cancelled = False
+        self.refusing = False  # Between cancel() and resume(), as the real backends
+        self.running = 0
+        self.peak_running = 0
+        self.lock = threading.Lock()
+        self.runs: Dict[Any, threading.Event] = {}
+
+    def run(self, compiled, input_data, time_limit_ms, memory_limit_mb, output_limit_kb, input_path=None, run_key=None):
+        if input_path:
+            with open(input_path) as f:
+                input_data = f.read()
+        if self.refusing:
+            return ExecutionResult(verdict="RE", time_ms=0, memory_kb=0, output="", error="Run cancelled", exit_code=1)
+        verdict, output, delay_ms = input_data.split()
+        with self.lock:
+            self.started.append(input_data)
+            kill = self.runs.setdefault(run_key, threading.Event()) if run_key is not None else threading.Event()
+            self.running += 1
+            self.peak_running = max(self.peak_running, self.running)
+        try:
+            if kill.wait(int(delay_ms) / 1000):
+                with self.lock:
+                    self.killed.append(input_data)
+                    self.events.append(("killed", input_data))
+                return ExecutionResult(verdict="RE", time_ms=0, memory_kb=0, output="", error="Killed", exit_code=137)
+        finally:
+            with self.lock:
+                self.running -= 1
+        with self.lock:
+            self.events.append(("done", input_data))
+        if verdict == "SYSTEM":
+            return ExecutionResult(
+                verdict="RE", time_ms=0, memory_kb=0, output="", error="System error: boom", exit_code=1, system_error=True
+            )
+        return ExecutionResult(
+            verdict=verdict,
+            time_ms=int(delay_ms),
+            memory_kb=100,
+            output=output,
+            error="",
+            exit_code=0 if verdict == "OK" else 1
+        )
+
+    def cancel(self, compiled):
+        self.cancelled = True
+        self.refusing = True
+        with self.lock:
+            for kill in self.runs.values():
+                kill.set()
+
+    def resume(self, compiled):
+        self.refusing = False
+
+    def cancel_run(self, compiled, run_key):
+        with self.lock:
+            self.runs.setdefault(run_key, threading.Event()).set()
+
+
+def make_testcases(*specs, group="main", points=1, first_id=1):
+    return [
+        SimpleNamespace(id=first_id + i, input_blob=spec, output_blob="ok", group=group, points=points)
+        for i, spec in enumerate(specs)
+    ]
+
+
+@pytest.fixture
+def problem():
+    return SimpleNamespace(
+        id=1,
+        checker_type=CheckerType.TOKEN,
+        checker_config=None,
+        time_limit_ms=1000,
+        memory_limit_mb=256,
+        output_limit_kb=64
+    )
+
+
+@pytest.fixture
+def compiled():
+    return CompileResult(success=True, language="python", work_dir="/tmp", time_ms=5, error="", exit_code=0)
+
+
+def judge(problem, compiled, testcases, executor, parallel, testdata=None, load_blobs=None):
+    submission = SimpleNamespace(id=7, compile_log=None)
+    with patch.object(settings, "MAX_CONCURRENT_JOBS", 4 if parallel else 1):
+        result = _judge_compiled(
+            Mock(), submission, problem, testcases, executor, compiled,
+            testdata=testdata,
+            load_blobs=load_blobs
+        )
+    return result, submission
+
+
+@pytest.mark.parametrize("parallel", [False, True])
+def test_verdict_is_first_failure_by_index(problem, compiled, parallel):
+    """Test both modes report the lowest-index failure and judge the following groups."""
+    testcases = [
+        *make_testcases("OK ok 30", "OK bad 5", "OK ok 1", group="g1"),
+        *make_testcases("OK ok 1", "OK bad 1", group="g2", first_id=4)
+    ]
+
+    result, submission = judge(problem, compiled, testcases, FakeExecutor(), parallel)
+
+    assert result["verdict"] == "wa"
+    assert result["first_failed_test"] == 2
+    assert result["tests_run"] == 4
+    assert [r["test_id"] for r in submission.test_results] == [1, 2, 4, 5]
+    assert result["compile_time_ms"] == 5
+
+
+@pytest.mark.parametrize("parallel", [False, True])
+def test_group_scoring_skips_rest_of_failed_group(problem, compiled, parallel):
+    """Test a failed group scores nothing and skips its tests while other groups score."""
+    testcases = [
+        *make_testcases("OK ok 1", "OK ok 1", group="samples", points=0),
+        *make_testcases("OK ok 1", "TLE x 1", *["OK ok 40"] * 6, group="small", points=5, first_id=3),
+        *make_testcases("OK ok 1", "OK ok 1", group="large", points=10, first_id=11)
+    ]
+    executor = FakeExecutor()
+
+    result, submission = judge(problem, compiled, testcases, executor, parallel)
+
+    assert result["verdict"] == "tle"
+    assert result["first_failed_test"] == 4
+    assert result["score"] == submission.score == 20
+    assert [r["test_id"] for r in submission.test_results] == [1, 2, 3, 4, 11, 12]
+    assert [(g["group"], g["verdict"], g["score"], g["max_score"], g["tests_skipped"]) for g in submission.group_results] == [
+        ("samples", "AC", 0, 0, 0),
+        ("small", "TLE", 0, 40, 6),
+        ("large", "AC", 20, 20, 0)
+    ]
+    # Only tests submitted before the failure was seen ever started
+    assert len(executor.started) < len(testcases)
+
+
+def test_parallel_stops_on_fatal_verdict(problem, compiled):
+    """Test a fatal verdict discards later results and cancels outstanding runs."""
+    testcases = make_testcases("OK ok 20", "TLE x 1", *["OK ok 50"] * 20)
+    executor = FakeExecutor()
+
+    result, submission = judge(problem, compiled, testcases, executor, parallel=True)
+
+    assert result["verdict"] == SubmissionVerdict.TLE.value
+    assert result["first_failed_test"] == 2
+    assert result["tests_run"] == 2
+    assert result["score"] == 0
+    assert executor.cancelled
+    assert len(executor.started) < len(testcases)
+
+
+@pytest.fixture
+def wide_engine():
+    """Engine with more CPU slots than the test window, so only the window limits runs."""
+    engine = JudgeEngine(cpu_slots=8, memory_budget_mb=8 * 256)
+    with patch.object(JudgeEngine, "shared", return_value=engine):
+        yield engine
+    engine.close()
+
+
+def test_skipped_runs_are_killed_and_hold_their_window_slot(problem, compiled, wide_engine):
+    """Test runs of a failed group are killed at once and count against the window until they settle."""
+    testcases = [
+        *make_testcases("TLE x 1", *["OK ok 2000"] * 3, group="a"),
+        *make_testcases(*["OK ok 20"] * 6, group="b", first_id=5)
+    ]
+    executor = FakeExecutor()
+    
+    result, submission = judge(problem, compiled, testcases, executor, parallel=True)
+    
+    assert executor.peak_running <= 4
+    assert executor.killed == ["OK ok 2000"] * 3
+    assert [r["test_id"] for r in submission.test_results] == [1, 5, 6, 7, 8, 9, 10]
+    assert [(g["group"], g["verdict"], g["tests_skipped"]) for g in submission.group_results] == [
+        ("a", "TLE", 3),
+        ("b", "AC", 0)
+    ]
+
+
+def test_fatal_verdict_kills_group_runs_in_flight(problem, compiled, wide_engine):
+    """Test a fatal verdict kills the failed group's runs in flight before later groups finish."""
+    testcases = [
+        *make_testcases("OK ok 1", "RE x 30", "OK slow 3000", "OK slow 3000", group="a"),
+        *make_testcases("OK ok 200", "OK ok 200", group="b", first_id=5)
+    ]
+    executor = FakeExecutor()
+    
+    result, submission = judge(problem, compiled, testcases, executor, parallel=True)
+    
+    assert result["verdict"] == "re"
+    assert result["first_failed_test"] == 2
+    assert executor.killed == ["OK slow 3000"] * 2
+    # Killed as soon as the group failed, not when judging ended
+    last_kill = max(n for n, (event, _) in enumerate(executor.events) if event == "killed")
+    assert last_kill < executor.events.index(("done", "OK ok 200"))
+    assert [(g["group"], g["verdict"], g["score"]) for g in submission.group_results] == [("a", "RE", 0), ("b", "AC", 2)]
+    assert wide_engine.cores.available == 8
+
+
+@pytest.mark.parametrize("parallel", [False, True])
+def test_fail_fast_order_still_reports_lowest_index_failure(problem, compiled, parallel):
+    """Test the most often failed test runs first and earlier tests then run up to the first failure."""
+    testcases = make_testcases("OK ok 1", "OK ok 1", "TLE x 1", "OK ok 1", "OK bad 1", "OK ok 1")
+    for testcase, failures in zip(testcases, [0, 0, 1, 0, 9, 0]):
+        testcase.failures = failures
+    executor = FakeExecutor()
+    db = Mock()
+    
+    submission = SimpleNamespace(id=7)
+    with patch.object(settings, "FAIL_FAST_ORDER", True), \
+            patch.object(settings, "MAX_CONCURRENT_JOBS", 4 if parallel else 1):
+        result = _judge_compiled(db, submission, problem, testcases, executor, compiled)
+    
+    assert executor.started[0] == "OK bad 1"
+    assert result["verdict"] == "tle"
+    assert result["first_failed_test"] == 3
+    assert [r["test_id"] for r in submission.test_results] == [1, 2, 3, 5]
+    # Failed tests are counted in one statement, committed with the submission
+    update = db.query.return_value.filter.return_value.update
+    assert update.call_count == 1
+
+
+def test_fail_fast_order_with_parallel_runs_after_cancelling(problem, compiled):
+    """Test earlier tests still run after the failed group's in-flight runs were cancelled."""
+    testcases = make_testcases("OK ok 1", "OK bad 1", "OK ok 200", "OK ok 200")
+    for testcase, failures in zip(testcases, [0, 5, 3, 2]):
+        testcase.failures = failures
+    executor = FakeExecutor()
+    
+    with patch.object(settings, "FAIL_FAST_ORDER", True):
+        result, submission = judge(problem, compiled, testcases, executor, parallel=True)
+    
+    assert executor.cancelled
+    assert result["verdict"] == "wa"
+    assert result["first_failed_test"] == 2
+    assert [(r["test_id"], r["verdict"]) for r in submission.test_results] == [(1, "AC"), (2, "WA")]
+
+
+def test_compile_error_skips_tests(problem):
+    """Test a failed compilation is recorded without running any test."""
+    failed = CompileResult(success=False, language="cpp", work_dir="/tmp", time_ms=9, error="boom", exit_code=1)
+    executor = FakeExecutor()
+
+    result, submission = judge(problem, failed, make_testcases("OK ok 1"), executor, parallel=False)
+
+    assert result["verdict"] == "ce"
+    assert submission.compile_log == "boom"
+    assert executor.started == []
+
+
+def test_cached_testdata_replaces_blobs(problem, compiled, tmp_path):
+    """Test inputs and expected outputs come from the cache entry, not the store."""
+    store = testdata_store.TestDataStore(testdata_store.LocalStoreBackend(str(tmp_path / "store")))
+    cache = testdata_cache.TestDataCache(str(tmp_path / "cache"), 1024 * 1024, store)
+    rows = [
+        (testcase_id, store.put(input_data).sha256, store.put(output_data).sha256)
+        for testcase_id, input_data, output_data in [(1, "OK ok 1", "ok"), (2, "OK ok 1", "different")]
+    ]
+    testcases = [SimpleNamespace(id=testcase_id, group="main", points=1) for testcase_id, _, _ in rows]
+    
+    with cache.entry(problem.id, 3, lambda: rows) as entry, \
+            patch.object(Checker, "check_output", wraps=Checker.check_output) as check_output:
+        result, submission = judge(problem, compiled, testcases, FakeExecutor(), False, testdata=entry)
+    
+    # Test 1 matches the cached expected digest; only the mismatch runs the full checker
+    assert check_output.call_count == 1
+    assert result["verdict"] == "wa"
+    assert result["first_failed_test"] == 2
+    assert submission.test_results[1]["expected_preview"] == "different"
+    assert submission.test_results[0]["input_preview"] == "OK ok 1"
+
+
+def test_float_epsilon_from_checker_config(problem, compiled):
+    """Test the problem's checker_config tolerance reaches the float checker."""
+    problem.checker_type = CheckerType.FLOAT_EPS
+    testcases = make_testcases("OK 1.04 1")
+    testcases[0].output_blob = "1.0"
+    
+    result, _ = judge(problem, compiled, testcases, FakeExecutor(), False)
+    assert result["verdict"] == "wa"
+    
+    problem.checker_config = {"epsilon": 0.05, "relative_epsilon": None}
+    result, _ = judge(problem, compiled, testcases, FakeExecutor(), False)
+    assert result["verdict"] == "ac"
+
+
+def test_custom_checker_judges_and_scores(problem, compiled):
+    """Test a custom checker session decides verdicts and per-test scores."""
+    problem.checker_type = CheckerType.CUSTOM
+    checker = Mock()
+    checker.check.side_effect = lambda input_data, expected, actual: {
+        "full": CheckerVerdict(CheckerResult.AC, 1.0, "Accepted"),
+        "half": CheckerVerdict(CheckerResult.AC, 0.5, "Partial"),
+        "none": CheckerVerdict(CheckerResult.WA, 0.0, "Wrong answer"),
+    }[actual]
+    testcases = [*make_testcases("OK full 1", "OK half 1", group="a"), *make_testcases("OK none 1", group="b", first_id=3)]
+    
+    submission = SimpleNamespace(id=7)
+    result = _judge_compiled(Mock(), submission, problem, testcases, FakeExecutor(), compiled, custom_checker=checker)
+    
+    assert result["verdict"] == "wa"
+    assert [r["score"] for r in submission.test_results] == [1.0, 0.5, 0.0]
+    # A group earns its points times its lowest test score
+    assert result["score"] == 1.0
+    assert checker.check.call_args_list[0].args == ("OK full 1", "ok", "full")
+
+
+@pytest.mark.parametrize("fail_fast", [False, True])
+@pytest.mark.parametrize("parallel", [False, True])
+def test_partial_wrong_answer_scores_whole_group(problem, compiled, fail_fast, parallel):
+    """Test a wrong answer with a partial score keeps its group running, whatever the test order."""
+    problem.checker_type = CheckerType.CUSTOM
+    checker = Mock()
+    checker.check.side_effect = lambda input_data, expected, actual: {
+        "full": CheckerVerdict(CheckerResult.AC, 1.0, "Accepted"),
+        "part": CheckerVerdict(CheckerResult.WA, 0.5, "Partly wrong"),
+        "quarter": CheckerVerdict(CheckerResult.AC, 0.25, "Partial"),
+    }[actual]
+    testcases = make_testcases("OK full 1", "OK part 1", "OK quarter 1", points=4)
+    testcases[2].failures = 5
+    for testcase in testcases[:2]:
+        testcase.failures = 0
+    
+    submission = SimpleNamespace(id=7)
+    with patch.object(settings, "FAIL_FAST_ORDER", fail_fast), \
+            patch.object(settings, "MAX_CONCURRENT_JOBS", 4 if parallel else 1):
+        result = _judge_compiled(Mock(), submission, problem, testcases, FakeExecutor(), compiled, custom_checker=checker)
+    
+    assert result["verdict"] == "wa"
+    assert result["first_failed_test"] == 2
+    assert [(r["test_id"], r["score"]) for r in submission.test_results] == [(1, 1.0), (2, 0.5), (3, 0.25)]
+    assert result["score"] == 3.0  # 12 points times the lowest test score
+    assert submission.group_results[0]["tests_skipped"] == 0
+
+
+def test_interactive_tests_run_against_the_interactor(problem, compiled):
+    """Test interactive problems run each test through run_interactive and its interactor."""
+    problem.checker_type = CheckerType.INTERACTIVE
+    interactor = CompileResult(success=True, language="cpp", work_dir="/tmp/i", time_ms=0, error="", exit_code=0)
+    executor = FakeExecutor()
+    
+    def run_interactive(compiled, interactor, input_data, answer_data, **limits):
+        interactor_exit_code = int(input_data)
+        return InteractiveResult(
+            ExecutionResult(verdict="OK", time_ms=3, memory_kb=100, output="", error="", exit_code=0),
+            ExecutionResult(verdict="OK", time_ms=1, memory_kb=50, output="", error="", exit_code=interactor_exit_code)
+        )
+    
+    executor.run_interactive = Mock(side_effect=run_interactive)
+    testcases = [*make_testcases("0", group="a"), *make_testcases("1", group="b", first_id=2)]
+    
+    submission = SimpleNamespace(id=7)
+    result = _judge_compiled(Mock(), submission, problem, testcases, executor, compiled, interactor=interactor)
+    
+    assert result["verdict"] == "wa"
+    assert [r["verdict"] for r in submission.test_results] == ["AC", "WA"]
+    assert executor.run_interactive.call_args.args[1] is interactor
+    assert executor.started == []
+
+
+def test_reused_verdict_copies_the_judged_result(problem, compiled, tmp_path):
+    """Test a cached result is copied onto an identical resubmission and flagged."""
+    testcases = [*make_testcases("OK ok 1", group="a", points=3), *make_testcases("OK bad 1", group="b", first_id=2)]
+    cache = VerdictCache(str(tmp_path), max_entries_per_version=10)
+    key = VerdictCache.make_key("python", "sha256:a", "abc", {})
+    
+    result, judged = judge(problem, compiled, testcases, FakeExecutor(), False)
+    judged.verdict = SubmissionVerdict(result["verdict"])
+    cache.store(problem.id, 1, key, _judged_record(judged, result))
+    
+    resubmission = SimpleNamespace(id=8)
+    with patch.object(VerdictCache, "_shared", cache):
+        reused = _reuse_verdict(Mock(), resubmission, cache.fetch(problem.id, 1, key))
+    
+    assert resubmission.verdict == SubmissionVerdict.WA
+    assert resubmission.verdict_reused == 1
+    assert (resubmission.score, resubmission.first_failed_test, resubmission.time_ms) == (3, 2, 2)
+    assert resubmission.test_results == judged.test_results
+    assert resubmission.group_results == judged.group_results
+    assert reused == {**result, "submission_id": 8, "reused_from": 7}
+
+
+@pytest.mark.parametrize("failing", ["run", "compile"])
+def test_system_errors_are_not_cached(problem, compiled, tmp_path, failing):
+    """Test results with a failed or cancelled compile or run are never reused."""
+    testcases = make_testcases("OK ok 1", "SYSTEM x 1" if failing == "run" else "OK ok 1")
+    if failing == "compile":
+        compiled = CompileResult(
+            success=False, language="cpp", work_dir="/tmp", time_ms=0, error="System error: boom", exit_code=1,
+            system_error=True
+        )
+    cache = VerdictCache(str(tmp_path), max_entries_per_version=10)
+    key = VerdictCache.make_key("python", "sha256:a", "abc", {})
+    
+    result, submission = judge(problem, compiled, testcases, FakeExecutor(), False)
+    submission.verdict = SubmissionVerdict(result["verdict"])
+    with patch.object(VerdictCache, "_shared", cache):
+        _cache_verdict(problem, key, submission, result)
+    
+    assert result["system_error"]
+    assert cache.fetch(problem.id, 1, key) is None
+    assert all("system_error" not in r for r in getattr(submission, "test_results", []))
+
+
+def test_system_errors_do_not_count_as_test_failures(problem, compiled):
+    """Test runs the judge failed are left out of the failure counts behind fail-fast order."""
+    testcases = [
+        *make_testcases("OK bad 1", group="a"),
+        *make_testcases("SYSTEM x 1", group="b", first_id=2),
+        *make_testcases("TLE x 1", group="c", first_id=3)
+    ]
+    
+    with patch("tasks.judge_submission._count_failures") as count_failures:
+        result, _ = judge(problem, compiled, testcases, FakeExecutor(), False)
+    
+    assert result["system_error"]
+    assert count_failures.call_args.args[1] == [1, 3]
+
+
+def test_load_blobs_reads_the_store(tmp_path):
+    """Test uncached test data is read from the store by hash."""
+    store = testdata_store.TestDataStore(testdata_store.LocalStoreBackend(str(tmp_path)))
+    testcase = SimpleNamespace(id=4, input_sha256=store.put("1 2\n").sha256, output_sha256=store.put("3\n").sha256)
+    
+    assert _load_blobs(store, testcase) == (4, "1 2\n", "3\n")
+
+
+def test_load_blobs_tolerates_binary_test_data(tmp_path):
+    """Test a test that is not UTF-8 is loaded with replacement characters instead of raising."""
+    store = testdata_store.TestDataStore(testdata_store.LocalStoreBackend(str(tmp_path)))
+    testcase = SimpleNamespace(id=4, input_sha256=store.put(b"1 \xff\n").sha256, output_sha256=store.put(b"\xc3\n").sha256)
+    
+    assert _load_blobs(store, testcase) == (4, "1 \ufffd\n", "\ufffd\n")
+
+
+@pytest.mark.parametrize("parallel", [False, True])
+def test_blobs_loaded_just_in_time(problem, compiled, parallel):
+    """Test blobs are fetched per test, at most the prefetch window ahead of the runs."""
+    testcases = make_testcases("OK ok 1", "TLE x 1", *["OK ok 1"] * 20)
+    metadata = [SimpleNamespace(id=testcase.id, group=testcase.group, points=1) for testcase in testcases]
+    loaded = []
+    
+    def load_blobs(testcase):
+        loaded.append(testcase.id)
+        return testcases[testcase.id - 1]
+    
+    with patch.object(settings, "TESTDATA_PREFETCH_WINDOW", 2):
+        result, _ = judge(problem, compiled, metadata, FakeExecutor(), parallel, load_blobs=load_blobs)
+    
+    assert result["first_failed_test"] == 2
+    in_flight = 4 if parallel else 1
+    assert loaded == list(range(1, len(loaded) + 1))
+    assert len(loaded) <= result["tests_run"] + in_flight + 2